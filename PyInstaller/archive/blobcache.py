@@ -0,0 +1,125 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Content-addressed cache of compressed CArchive entries.
+
+Compressing the binaries and data files of a onefile executable at the
+highest level takes a lot of time, although most of these files never
+change between two builds. The compressed payloads are therefore kept in
+the cache directory, keyed by the digest of the uncompressed data, the
+codec and the compression level, and copied into the next archive as-is.
+"""
+
+import hashlib
+import os
+
+from .. import log as logging
+from ..utils.misc import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+class CompressedBlobCache(object):
+    """
+    Directory of compressed payloads with size-bounded LRU eviction.
+
+    Every payload is stored in the file `<codec>-<level>/<xx>/<digest>`,
+    where `digest` is the SHA-256 digest of the uncompressed data and `xx`
+    its first two characters. The modification time of a file is updated on
+    every hit and used to evict the least recently used payloads once the
+    cache grows beyond `max_size` bytes.
+
+    New payloads are written by atomic_write(), so several builds may share
+    the cache.
+    """
+    # Default size limit of the cache: 1 GiB.
+    MAX_SIZE = 1024 * 1024 * 1024
+
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = self.MAX_SIZE if max_size is None else max_size
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(fh, postfix=b''):
+        """
+        Return the hex digest of the data in the open file followed by
+        `postfix`. The file is rewound to the start afterwards.
+        """
+        hasher = hashlib.sha256()
+        while 1:
+            buf = fh.read(64 * 1024)
+            if not buf:
+                break
+            hasher.update(buf)
+        hasher.update(postfix)
+        fh.seek(0)
+        return hasher.hexdigest()
+
+    def _path(self, digest, codec, level):
+        return os.path.join(self.directory, '%s-%d' % (codec, level),
+                            digest[:2], digest)
+
+    def get(self, digest, codec, level):
+        """
+        Return the path of the cached payload or None if there is none.
+        """
+        path = self._path(digest, codec, level)
+        try:
+            # Mark the payload as recently used.
+            os.utime(path, None)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, digest, codec, level, dump):
+        """
+        Add the payload written by `dump(fp)` to the file object `fp` to the
+        cache.
+        """
+        atomic_write(self._path(digest, codec, level), dump)
+
+    def trim(self):
+        """
+        Remove the least recently used payloads until the size of the cache
+        does not exceed `max_size` bytes.
+        """
+        logger.info('Compressed blob cache: %d hits, %d misses',
+                    self.hits, self.misses)
+        blobs = []
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                # Payloads still being written by another build.
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((st.st_mtime, path, st.st_size))
+                total += st.st_size
+        if total <= self.max_size:
+            return
+        blobs.sort()
+        for _, path, size in blobs:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        logger.debug('Trimmed compressed blob cache to %d bytes', total)
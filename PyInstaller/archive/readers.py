@@ -14,11 +14,13 @@ This CArchiveReader is used only by the archieve_viewer utility.
 
 # TODO clean up this module
 
+import bisect
 import struct
 
 
 from PyInstaller.loader.pyimod02_archive import (
-    ArchiveReader, PYZ_TYPE_MODULE, PYZ_TYPE_PKG, PYZ_TYPE_DATA)
+    ArchiveReader, PYZ_TYPE_MODULE, PYZ_TYPE_PKG, PYZ_TYPE_DATA,
+    COMPRESSION_STORED, COMPRESSION_ZLIB, COMPRESSION_LZ4, PYZ_HEADER_VERSION)
 
 
 class NotAnArchiveError(Exception):
@@ -33,19 +35,29 @@ class CTOCReader(object):
     """
     ENTRYSTRUCT = '!iiiiBB'  # (structlen, dpos, dlen, ulen, flag, typcd) followed by name
     ENTRYLEN = struct.calcsize(ENTRYSTRUCT)
+    # Trailer of the name index, see CTOC.index_tobinary().
+    INDEXMAGIC = b'MEI\014\013IDX'
+    INDEXVERSION = 1
+    INDEXCOOKIE = '!8sii'
+    INDEXCOOKIELEN = struct.calcsize(INDEXCOOKIE)
 
     def __init__(self):
         self.data = []
+        # Tuple (sorted encoded names, indexes of the entries) if the archive
+        # has a name index.
+        self._index = None
 
-    def frombinary(self, s):
+    def frombinary(self, s, index=None):
         """
         Decode the binary string into an in memory list.
 
-        S is a binary string.
+        S is a binary string. INDEX is the binary name index or None.
         """
         p = 0
+        offsets = {}
 
         while p < len(s):
+            offsets[p] = len(self.data)
             (slen, dpos, dlen, ulen, flag, typcd) = struct.unpack(self.ENTRYSTRUCT,
                                                         s[p:p + self.ENTRYLEN])
             nmlen = slen - self.ENTRYLEN
@@ -58,6 +70,11 @@ class CTOCReader(object):
             typcd = chr(typcd)
             self.data.append((dpos, dlen, ulen, flag, typcd, nm))
 
+        if index is not None:
+            ndxs = [offsets[pos] for pos in
+                    struct.unpack('!%di' % (len(index) // 4), index)]
+            names = [self.data[ndx][-1].encode('utf-8') for ndx in ndxs]
+            self._index = (names, ndxs)
 
     def get(self, ndx):
         """
@@ -74,6 +91,13 @@ class CTOCReader(object):
 
         Return -1 for failure.
         """
+        if self._index is not None:
+            names, ndxs = self._index
+            key = name.encode('utf-8')
+            i = bisect.bisect_left(names, key)
+            if i < len(names) and names[i] == key:
+                return ndxs[i]
+            return -1
         for i, nm in enumerate(self.data):
             if nm[-1] == name:
                 return i
@@ -161,6 +185,20 @@ class CArchiveReader(ArchiveReader):
         if not pylib_name:
             raise RuntimeError('Python library filename not defined in archive.')
         self.tocpos, self.toclen = tocpos, toclen
+        # The name index is between the table of contents and the cookie.
+        self.indexlen = 0
+        indexend = self.pkg_start + totallen - self._cookie_size
+        if indexend - CTOCReader.INDEXCOOKIELEN >= \
+                self.pkg_start + tocpos + toclen:
+            self.lib.seek(indexend - CTOCReader.INDEXCOOKIELEN)
+            (magic, version, count) = struct.unpack(
+                CTOCReader.INDEXCOOKIE,
+                self.lib.read(CTOCReader.INDEXCOOKIELEN))
+            if magic == CTOCReader.INDEXMAGIC and \
+                    version == CTOCReader.INDEXVERSION and \
+                    indexend - CTOCReader.INDEXCOOKIELEN - count * 4 == \
+                    self.pkg_start + tocpos + toclen:
+                self.indexlen = count * 4
 
     def loadtoc(self):
         """
@@ -169,7 +207,10 @@ class CArchiveReader(ArchiveReader):
         self.toc = CTOCReader()
         self.lib.seek(self.pkg_start + self.tocpos)
         tocstr = self.lib.read(self.toclen)
-        self.toc.frombinary(tocstr)
+        index = None
+        if self.indexlen:
+            index = self.lib.read(self.indexlen)
+        self.toc.frombinary(tocstr, index)
 
     def extract(self, name):
         """
@@ -193,9 +234,16 @@ class CArchiveReader(ArchiveReader):
             self.lib.seek(self.pkg_start + dpos)
             rslt = self.lib.read(dlen)
 
-        if flag == 1:
+        if flag == COMPRESSION_ZLIB:
             import zlib
             rslt = zlib.decompress(rslt)
+        elif flag == COMPRESSION_LZ4:
+            try:
+                import lz4.block
+            except ImportError:
+                raise ImportError('Python package "lz4" is required to read '
+                                  'LZ4 compressed entries.')
+            rslt = lz4.block.decompress(rslt, uncompressed_size=ulen)
         if typcd == 'M':
             return (1, rslt)
 
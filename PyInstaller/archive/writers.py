@@ -21,17 +21,35 @@ files into the executable.
 # See pyi_carchive.py for a more general archive (contains anything)
 # that can be understood by a C program.
 
+import hashlib
 import os
 import sys
 import struct
 from types import CodeType
 import marshal
 import zlib
+from multiprocessing.pool import ThreadPool
 
-from .readers import CArchiveReader, PYZ_TYPE_MODULE, PYZ_TYPE_PKG, PYZ_TYPE_DATA
+from .readers import CArchiveReader, PYZ_TYPE_MODULE, PYZ_TYPE_PKG, \
+    PYZ_TYPE_DATA, COMPRESSION_STORED, COMPRESSION_ZLIB, COMPRESSION_LZ4, \
+    PYZ_HEADER_VERSION
 from ..compat import BYTECODE_MAGIC
 
 
+def _lz4_compress(data, level):
+    """
+    Compress `data` into a single LZ4 block without the size prefix, as
+    expected by the bootloader.
+    """
+    try:
+        import lz4.block
+    except ImportError:
+        raise ImportError('Python package "lz4" is required for LZ4 '
+                          'compression of CArchive entries.')
+    return lz4.block.compress(data, mode='high_compression',
+                              compression=level, store_size=False)
+
+
 class ArchiveWriter(object):
     """
     A base class for a repository of python code objects.
@@ -171,19 +189,55 @@ class ZlibArchiveWriter(ArchiveWriter):
     HDRLEN = ArchiveWriter.HDRLEN + 5
     COMPRESSION_LEVEL = 6  # Default level of the 'zlib' module from Python.
 
-    def __init__(self, archive_path, logical_toc, code_dict=None, cipher=None):
+    def __init__(self, archive_path, logical_toc, code_dict=None, cipher=None,
+                 jobs=1, compression=COMPRESSION_ZLIB):
         """
         code_dict      dict containing module code objects from ModuleGraph.
+        jobs           number of threads compressing the entries. The
+                       archive is the same for any number of threads.
+        compression    COMPRESSION_ZLIB or COMPRESSION_STORED. The entries
+                       are decompressed by pure Python code at runtime, so
+                       other codecs are not supported here.
         """
+        assert compression in (COMPRESSION_STORED, COMPRESSION_ZLIB)
         # Keep references to module code objects constructed by ModuleGraph
         # to avoid writting .pyc/pyo files to hdd.
         self.code_dict = code_dict or {}
         self.cipher = cipher or None
+        self.jobs = jobs
+        self.compression = compression
 
         super(ZlibArchiveWriter, self).__init__(archive_path, logical_toc)
 
+    def _add_from_table_of_contents(self, toc):
+        """
+        Add entries from a logical TOC.
+
+        With more than one job the entries are marshalled, compressed and
+        encrypted by a pool of threads (zlib releases the GIL while
+        compressing), while this thread writes the results in the order of
+        the TOC. This keeps the archive byte-identical to the one written
+        sequentially.
+        """
+        if self.jobs <= 1:
+            return super(ZlibArchiveWriter, self)._add_from_table_of_contents(
+                toc)
+        pool = ThreadPool(self.jobs)
+        try:
+            for name, typ, obj in pool.imap(self._compress, toc):
+                self._write(name, typ, obj)
+        finally:
+            pool.terminate()
+            pool.join()
 
     def add(self, entry):
+        self._write(*self._compress(entry))
+
+    def _compress(self, entry):
+        """
+        Return the tuple (name, typ, obj) where `obj` is the compressed and
+        optionally encrypted data to be stored for the entry.
+        """
         name, path, typ = entry
         if typ == 'PYMODULE':
             typ = PYZ_TYPE_MODULE
@@ -205,21 +259,28 @@ class ZlibArchiveWriter(ArchiveWriter):
             # No need to use forward slash as path-separator here since
             # pkg_resources on Windows back slash as path-separator.
 
-        obj = zlib.compress(data, self.COMPRESSION_LEVEL)
+        if self.compression == COMPRESSION_ZLIB:
+            obj = zlib.compress(data, self.COMPRESSION_LEVEL)
+        else:
+            obj = data
 
         # First compress then encrypt.
         if self.cipher:
             obj = self.cipher.encrypt(obj)
 
+        return name, typ, obj
+
+    def _write(self, name, typ, obj):
         self.toc.append((name, (typ, self.lib.tell(), len(obj))))
         self.lib.write(obj)
 
     def update_headers(self, tocpos):
         """
-        add level
+        add level, header version and compression
         """
         ArchiveWriter.update_headers(self, tocpos)
-        self.lib.write(struct.pack('!B', self.cipher is not None))
+        self.lib.write(struct.pack('!BBB', self.cipher is not None,
+                                   PYZ_HEADER_VERSION, self.compression))
 
 
 
@@ -231,6 +292,11 @@ class CTOC(object):
     """
     ENTRYSTRUCT = '!iiiiBB'  # (structlen, dpos, dlen, ulen, flag, typcd) followed by name
     ENTRYLEN = struct.calcsize(ENTRYSTRUCT)
+    # The name index follows the table of contents and ends with this
+    # trailer: (magic, version, count of entries).
+    INDEXMAGIC = b'MEI\014\013IDX'
+    INDEXVERSION = 1
+    INDEXCOOKIE = '!8sii'
 
     def __init__(self):
         self.data = []
@@ -239,6 +305,31 @@ class CTOC(object):
         """
         Return self as a binary string.
         """
+        return b''.join(entry for (nm, entry) in self._tobinary_entries())
+
+    def index_tobinary(self):
+        """
+        Return the name index of the table of contents as a binary string.
+
+        The index holds the offsets of the entries in the binary table of
+        contents sorted by the UTF-8 encoded name, so readers can find an
+        entry by binary search. Entries with equal names keep their order.
+        """
+        offsets = []
+        pos = 0
+        for (nm, entry) in self._tobinary_entries():
+            offsets.append((nm, pos))
+            pos += len(entry)
+        offsets.sort()
+        return (struct.pack('!%di' % len(offsets),
+                            *[pos for (nm, pos) in offsets]) +
+                struct.pack(self.INDEXCOOKIE, self.INDEXMAGIC,
+                            self.INDEXVERSION, len(offsets)))
+
+    def _tobinary_entries(self):
+        """
+        Return the list of the tuples (encoded name, binary entry).
+        """
         rslt = []
         for (dpos, dlen, ulen, flag, typcd, nm) in self.data:
             # Encode all names using UTF-8. This should be save as
@@ -255,11 +346,10 @@ class CTOC(object):
                 padlen = 16 - (toclen % 16)
                 pad = b'\0' * padlen
                 nmlen = nmlen + padlen
-            rslt.append(struct.pack(self.ENTRYSTRUCT + '%is' % nmlen,
-                                    nmlen + self.ENTRYLEN, dpos, dlen, ulen,
-                                    flag, ord(typcd), nm + pad))
-
-        return b''.join(rslt)
+            rslt.append((nm, struct.pack(self.ENTRYSTRUCT + '%is' % nmlen,
+                                         nmlen + self.ENTRYLEN, dpos, dlen,
+                                         ulen, flag, ord(typcd), nm + pad)))
+        return rslt
 
     def add(self, dpos, dlen, ulen, flag, typcd, nm):
         """
@@ -296,6 +386,8 @@ class CArchiveWriter(ArchiveWriter):
     MAGIC = b'MEI\014\013\012\013\016'
     HDRLEN = 0
     LEVEL = 9
+    # Names of the codecs selected by the 'flag' of an entry.
+    _CODECS = {COMPRESSION_ZLIB: 'zlib', COMPRESSION_LZ4: 'lz4'}
 
     # Cookie - holds some information for the bootloader. C struct format
     # definition. '!' at the beginning means network byte order.
@@ -313,7 +405,7 @@ class CArchiveWriter(ArchiveWriter):
     _cookie_format = '!8siiii64s'
     _cookie_size = struct.calcsize(_cookie_format)
 
-    def __init__(self, archive_path, logical_toc, pylib_name):
+    def __init__(self, archive_path, logical_toc, pylib_name, blob_cache=None):
         """
         Constructor.
 
@@ -321,8 +413,11 @@ class CArchiveWriter(ArchiveWriter):
         start        is the seekposition within PATH.
         len          is the length of the CArchive (if 0, then read till EOF).
         pylib_name   name of Python DLL which bootloader will use.
+        blob_cache   optional CompressedBlobCache with compressed entries
+                     from previous builds.
         """
         self._pylib_name = pylib_name
+        self._blob_cache = blob_cache
 
         # A CArchive created from scratch starts at 0, no leading bootloader.
         super(CArchiveWriter, self).__init__(archive_path, logical_toc)
@@ -342,8 +437,8 @@ class CArchiveWriter(ArchiveWriter):
         ENTRY must have:
           entry[0] is name (under which it will be saved).
           entry[1] is fullpathname of the file.
-          entry[2] is a flag for it's storage format (0==uncompressed,
-          1==compressed)
+          entry[2] is a flag for it's storage format (COMPRESSION_STORED,
+          COMPRESSION_ZLIB or COMPRESSION_LZ4)
           entry[3] is the entry's type code.
           Version 5:
             If the type code is 'o':
@@ -380,20 +475,16 @@ class CArchiveWriter(ArchiveWriter):
             raise
 
         where = self.lib.tell()
-        assert flag in range(3)
+        assert flag in self._CODECS or flag == COMPRESSION_STORED
         if not fh:
             # no need to write anything
             pass
-        elif flag == 1:
+        elif flag != COMPRESSION_STORED:
             assert fh
-            comprobj = zlib.compressobj(self.LEVEL)
-            while 1:
-                buf = fh.read(16*1024)
-                if not buf:
-                    break
-                self.lib.write(comprobj.compress(buf))
-            self.lib.write(comprobj.compress(postfix))
-            self.lib.write(comprobj.flush())
+            if self._blob_cache is not None:
+                self._add_compressed_cached(fh, postfix, flag)
+            else:
+                self._add_compressed(fh, postfix, flag, self.lib.write)
         else:
             assert fh
             while 1:
@@ -411,6 +502,71 @@ class CArchiveWriter(ArchiveWriter):
         # Record the entry in the CTOC
         self.toc.add(where, dlen, ulen, flag, typcd, nm)
 
+    def _add_compressed(self, fh, postfix, flag, write):
+        """
+        Compress the data of the open file followed by `postfix` with the
+        codec selected by `flag` and pass the compressed data to the function
+        `write`.
+        """
+        if flag == COMPRESSION_LZ4:
+            # LZ4 blocks cannot be streamed, the bootloader decompresses the
+            # whole entry at once anyway.
+            write(_lz4_compress(fh.read() + postfix, self.LEVEL))
+            return
+        comprobj = zlib.compressobj(self.LEVEL)
+        while 1:
+            buf = fh.read(16*1024)
+            if not buf:
+                break
+            write(comprobj.compress(buf))
+        write(comprobj.compress(postfix))
+        write(comprobj.flush())
+
+    def _add_compressed_cached(self, fh, postfix, flag):
+        """
+        Like `_add_compressed()`, but copy the compressed data from the blob
+        cache if the same data was compressed before, or else store the
+        compressed data in the cache.
+        """
+        cache = self._blob_cache
+        codec = self._CODECS[flag]
+        digest = cache.digest(fh, postfix)
+        cached = cache.get(digest, codec, self.LEVEL)
+        if cached is not None:
+            with open(cached, 'rb') as blob:
+                while 1:
+                    buf = blob.read(16*1024)
+                    if not buf:
+                        break
+                    self.lib.write(buf)
+            return
+
+        def dump(blob):
+            def write(data):
+                self.lib.write(data)
+                blob.write(data)
+            self._add_compressed(fh, postfix, flag, write)
+        cache.put(digest, codec, self.LEVEL, dump)
+
+    def _archive_digest(self, tocpos):
+        """
+        Return the SHA-256 hex digest of the data of all entries, of the table
+        of contents and of the name of the Python library.
+        """
+        self.lib.flush()
+        hasher = hashlib.sha256()
+        with open(self.lib.name, 'rb') as fh:
+            fh.seek(self.start)
+            remaining = tocpos - self.start
+            while remaining > 0:
+                buf = fh.read(min(remaining, 64*1024))
+                if not buf:
+                    break
+                hasher.update(buf)
+                remaining -= len(buf)
+        hasher.update(self.toc.tobinary())
+        hasher.update(self._pylib_name.encode('ascii'))
+        return hasher.hexdigest()
 
     def save_trailer(self, tocpos):
         """
@@ -420,12 +576,22 @@ class CArchiveWriter(ArchiveWriter):
         CArchives can be opened from the end - the cookie points
         back to the start.
         """
+        # Onefile executables with the runtime option 'pyi-extraction-cache'
+        # keep the extracted files in a directory named after the digest.
+        if any(typcd == 'o' and nm.split(' ')[0] == 'pyi-extraction-cache'
+               for (_, _, _, _, typcd, nm) in self.toc.data):
+            self.toc.add(tocpos, 0, 0, 0, 'o', 'pyi-archive-digest %s'
+                         % self._archive_digest(tocpos))
         tocstr = self.toc.tobinary()
         self.lib.write(tocstr)
         toclen = len(tocstr)
+        # The name index is not part of the TOC, so bootloaders without
+        # support for the index just skip it.
+        indexstr = self.toc.index_tobinary()
+        self.lib.write(indexstr)
 
         # now save teh cookie
-        total_len = tocpos + toclen + self._cookie_size
+        total_len = tocpos + toclen + len(indexstr) + self._cookie_size
         pyvers = sys.version_info[0] * 10 + sys.version_info[1]
         # Before saving cookie we need to convert it to corresponding
         # C representation.
@@ -24,13 +24,16 @@ from operator import itemgetter
 
 from PyInstaller import is_win, is_darwin, HOMEPATH, PLATFORM
 from PyInstaller.archive.writers import ZlibArchiveWriter, CArchiveWriter
+from PyInstaller.archive.blobcache import CompressedBlobCache
 from PyInstaller.building.utils import _check_guts_toc_mtime, _check_guts_toc, add_suffix_to_extensions, \
-    checkCache, _check_path_overlap, _rmtree
+    checkCache, populateCache, _check_path_overlap, _rmtree
 from PyInstaller.compat import is_cygwin
 from PyInstaller.depend import bindepend
 from PyInstaller.depend.analysis import get_bootstrap_modules
 from PyInstaller.depend.utils import is_path_to_egg
 from PyInstaller.building.datastruct import TOC, Target, logger, _check_guts_eq
+from PyInstaller.building import materialize
+from PyInstaller.building.distsync import DistSync
 from PyInstaller.utils import misc
 from PyInstaller.utils.misc import save_py_data_struct
 from .. import log as logging
@@ -65,6 +68,9 @@ class PYZ(Target):
                 name will do fine.
             cipher
                 The block cipher that will be used to encrypt Python bytecode.
+            compression
+                COMPRESSED (default) to compress the modules with zlib or
+                UNCOMPRESSED to store them as they are.
 
         """
 
@@ -72,6 +78,7 @@ class PYZ(Target):
         Target.__init__(self)
         name = kwargs.get('name', None)
         cipher = kwargs.get('cipher', None)
+        self.compression = kwargs.get('compression', COMPRESSED)
         self.toc = TOC()
         # If available, use code objects directly from ModuleGraph to
         # speed up PyInstaller.
@@ -96,10 +103,13 @@ class PYZ(Target):
         # Compile the top-level modules so that they end up in the CArchive and can be
         # imported by the bootstrap script.
         self.dependencies = misc.compile_py_files(self.dependencies, CONF['workpath'])
+        # Number of threads compressing the modules.
+        self.jobs = CONF.get('jobs', 1)
         self.__postinit__()
 
     _GUTS = (# input parameters
             ('name', _check_guts_eq),
+            ('compression', _check_guts_eq),
             ('toc', _check_guts_toc),  # todo: pyc=1
             # no calculated/analysed values
             )
@@ -171,7 +181,9 @@ class PYZ(Target):
                 self.code_dict[entry[0]] = self.__get_code(entry[0], entry[1])
         # sort content alphabetically to support reproducible builds
         toc.sort()
-        pyz = ZlibArchiveWriter(self.name, toc, code_dict=self.code_dict, cipher=self.cipher)
+        pyz = ZlibArchiveWriter(self.name, toc, code_dict=self.code_dict,
+                                cipher=self.cipher, jobs=self.jobs,
+                                compression=self.compression)
 
 
 class PKG(Target):
@@ -203,7 +215,9 @@ class PKG(Target):
                 Dictionary that specifies compression by typecode. For Example,
                 PYZ is left uncompressed so that it can be accessed inside the
                 PKG. The default uses sensible values. If zlib is not available,
-                no compression is used.
+                no compression is used. Values are UNCOMPRESSED, COMPRESSED
+                (zlib) or COMPRESSED_LZ4, which trades some size for faster
+                extraction, e.g. {'BINARY': COMPRESSED_LZ4}.
         exclude_binaries
                 If True, EXTENSIONs and BINARYs will be left out of the PKG,
                 and forwarded to its container (usually a COLLECT).
@@ -250,6 +264,7 @@ class PKG(Target):
         return False
 
     def assemble(self):
+        from ..config import CONF
         logger.info("Building PKG (CArchive) %s", os.path.basename(self.name))
         trash = []
         mytoc = []
@@ -258,6 +273,16 @@ class PKG(Target):
         seenFnms = {}
         seenFnms_typ = {}
         toc = add_suffix_to_extensions(self.toc)
+        # Strip and compress the binaries in parallel, the loop below then
+        # finds them in the cache.
+        if self.exclude_binaries:
+            binaries = toc.by_typecode('DEPENDENCY')
+        else:
+            binaries = toc.by_typecode('BINARY', 'EXTENSION', 'DEPENDENCY')
+        populateCache([(fnm, inm) for inm, fnm, typ in binaries],
+                      strip=self.strip_binaries,
+                      upx=(self.upx_binaries and (is_win or is_cygwin)),
+                      jobs=CONF.get('jobs', 1))
         # 'inm'  - relative filename inside a CArchive
         # 'fnm'  - absolute filename as it is on the file system.
         for inm, fnm, typ in toc:
@@ -316,8 +341,12 @@ class PKG(Target):
         mytoc.sort(key=itemgetter(3, 0))
         # Do *not* sort modules and scripts, as their order is important.
         # TODO: Think about having all modules first and then all scripts.
+        # Compressed entries from previous builds.
+        blob_cache = CompressedBlobCache(
+            os.path.join(CONF['cachedir'], 'blobcache'))
         archive = CArchiveWriter(self.name, srctoc + mytoc,
-                                 pylib_name=pylib_name)
+                                 pylib_name=pylib_name, blob_cache=blob_cache)
+        blob_cache.trim()
 
         for item in trash:
             os.remove(item)
@@ -493,6 +522,15 @@ class EXE(Target):
         if data['icon'] and not (is_win or is_darwin):
             logger.warn('ignoring icon, platform not capable')
 
+        if last_build.digests is not None:
+            # The executable and the PKG built into it, see _guts_files().
+            for fnm in (self.name, self.pkg.name):
+                if last_build.changed(fnm):
+                    logger.info("Rebuilding %s because %s changed",
+                                self.tocbasename, os.path.basename(fnm))
+                    return True
+            return False
+
         mtm = data['mtm']
         if mtm != misc.mtime(self.name):
             logger.info("Rebuilding %s because mtimes don't match", self.tocbasename)
@@ -502,6 +540,9 @@ class EXE(Target):
             return True
         return False
 
+    def _guts_files(self):
+        return [self.name, self.pkg.name] + super(EXE, self)._guts_files()
+
     def _bootloader_file(self, exe, extension=None):
         """
         Pick up the right bootloader file - debug, console, windowed.
@@ -596,7 +637,7 @@ class EXE(Target):
             self.copy(self.pkg.name, outf)
         else:
             logger.info("Copying archive to %s", self.pkgname)
-            shutil.copy2(self.pkg.name, self.pkgname)
+            materialize.copy(self.pkg.name, self.pkgname)
         outf.close()
 
         if is_darwin:
@@ -614,12 +655,7 @@ class EXE(Target):
 
 
     def copy(self, fnm, outf):
-        inf = open(fnm, 'rb')
-        while 1:
-            data = inf.read(64 * 1024)
-            if not data:
-                break
-            outf.write(data)
+        materialize.append_file(fnm, outf)
 
 
 class COLLECT(Target):
@@ -653,6 +689,19 @@ class COLLECT(Target):
         # The 'name' directory is created in DISTPATH and necessary files are
         # then collected to this directory.
         self.name = os.path.join(CONF['distpath'], os.path.basename(self.name))
+        # Number of threads stripping and compressing the binaries.
+        self.jobs = CONF.get('jobs', 1)
+        # Update the output directory instead of building it anew, see
+        # PyInstaller.building.distsync.
+        self.incremental = CONF.get('incremental_collect', False)
+        self.manifestfilename = os.path.splitext(self.tocfilename)[0] + \
+            '-manifest.dat'
+        # Hard-link the binaries from the cache of processed binaries
+        # instead of copying them. Not on Mac OS X, where checkCache()
+        # rewrites the install names of the cached binaries in place, which
+        # would modify the linked copies of earlier builds.
+        self.link_cached_binaries = CONF.get('link_cached_binaries', False) \
+            and not is_darwin
 
         self.toc = TOC()
         for arg in args:
@@ -682,11 +731,31 @@ class COLLECT(Target):
         return 1
 
     def assemble(self):
-        if _check_path_overlap(self.name) and os.path.isdir(self.name):
-            _rmtree(self.name)
+        _check_path_overlap(self.name)
+        if self.incremental:
+            sync = DistSync(self.name, self.manifestfilename)
+            try:
+                self._assemble(sync.staging, sync)
+            except:
+                sync.abort()
+                raise
+            sync.commit()
+        else:
+            if os.path.isdir(self.name):
+                _rmtree(self.name)
+            os.makedirs(self.name)
+            self._assemble(self.name)
+
+    def _assemble(self, outdir, sync=None):
         logger.info("Building COLLECT %s", self.tocbasename)
-        os.makedirs(self.name)
         toc = add_suffix_to_extensions(self.toc)
+        # Strip and compress the binaries in parallel, the loop below then
+        # finds them in the cache.
+        populateCache([(fnm, inm) for inm, fnm, typ in
+                       toc.by_typecode('EXTENSION', 'BINARY')],
+                      strip=self.strip_binaries,
+                      upx=(self.upx_binaries and (is_win or is_cygwin)),
+                      jobs=self.jobs)
         for inm, fnm, typ in toc:
             if not os.path.exists(fnm) or not os.path.isfile(fnm) and is_path_to_egg(fnm):
                 # file is contained within python egg, it is added with the egg
@@ -694,20 +763,23 @@ class COLLECT(Target):
             if os.pardir in os.path.normpath(inm) or os.path.isabs(inm):
                 raise SystemExit('Security-Alert: try to store file outside '
                                  'of dist-directory. Aborting. %r' % inm)
-            tofnm = os.path.join(self.name, inm)
+            tofnm = os.path.join(outdir, inm)
             todir = os.path.dirname(tofnm)
             if not os.path.exists(todir):
                 os.makedirs(todir)
+            srcfnm = fnm
             if typ in ('EXTENSION', 'BINARY'):
                 fnm = checkCache(fnm, strip=self.strip_binaries,
                                  upx=(self.upx_binaries and (is_win or is_cygwin)),
                                  dist_nm=inm)
             if typ != 'DEPENDENCY':
-                shutil.copy(fnm, tofnm)
-                try:
-                    shutil.copystat(fnm, tofnm)
-                except OSError:
-                    logger.warn("failed to copy flags of %s", fnm)
+                # Processed binaries from the cache may be hard-linked.
+                link = self.link_cached_binaries and \
+                    typ in ('EXTENSION', 'BINARY') and fnm != srcfnm
+                if sync is not None:
+                    sync.copy(fnm, inm, link)
+                else:
+                    materialize.copy(fnm, tofnm, link)
             if typ in ('EXTENSION', 'BINARY'):
                 os.chmod(tofnm, 0o755)
 
@@ -788,8 +860,12 @@ class MERGE(object):
             return topath
 
 
+# Compression of entries in PKG and PYZ, see the 'cdict' argument of PKG.
 UNCOMPRESSED = 0
 COMPRESSED = 1
+# LZ4 is much faster to decompress than zlib at the cost of bigger entries.
+# It requires the Python package 'lz4' and is supported only by PKG.
+COMPRESSED_LZ4 = 2
 
 _MISSING_BOOTLOADER_ERRORMSG = """
 Fatal error: PyInstaller does not include a pre-compiled bootloader for your
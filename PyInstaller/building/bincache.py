@@ -0,0 +1,254 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Index of the binaries processed by strip, UPX or the manifest tools.
+
+Every bincache directory in CONF['cachedir'] holds the processed copies of
+binaries and a SQLite database mapping the name of every copy to the digest
+of the binary it was made from, its size and the time it was last used.
+Updates of the index are transactions, so builds sharing the cache do not
+corrupt it, and every update touches a single row.
+
+The cache is kept below a size limit by removing the entries that were not
+used for the longest time, see prune().
+"""
+
+import glob
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .. import log as logging
+from ..compat import os_replace
+from ..utils.misc import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+# Name of the index in every bincache directory.
+INDEX_NAME = 'index.db'
+
+# Prefix of the files being created, which are not yet in the index.
+TEMP_PREFIX = 'tmp-'
+
+# Temporary files older than this many seconds are left over by builds that
+# were killed and are removed by prune().
+TEMP_MAX_AGE = 3600
+
+# Open caches by directory, shared by all threads of the build.
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def digest(filename, blocksize=64 * 1024):
+    """
+    Return the MD5 hex digest of the file, read in blocks of `blocksize`.
+    """
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as fp:
+        for block in iter(lambda: fp.read(blocksize), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def open_cache(dirname):
+    """
+    Return the BinaryCache for the directory, opened once per process.
+    """
+    dirname = os.path.abspath(dirname)
+    with _caches_lock:
+        cache = _caches.get(dirname)
+        if cache is None:
+            cache = _caches[dirname] = BinaryCache(dirname)
+        return cache
+
+
+def close_caches():
+    """
+    Close all the caches opened by open_cache().
+    """
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
+        _caches.clear()
+
+
+class BinaryCache(object):
+    """
+    Processed binaries in a bincache directory and their SQLite index.
+    """
+    def __init__(self, dirname):
+        import sqlite3
+        self.dirname = dirname
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Created by a concurrent build.
+            if not os.path.isdir(dirname):
+                raise
+        self._lock = threading.Lock()
+        # Transactions are started explicitly, see _transaction().
+        self._db = sqlite3.connect(os.path.join(dirname, INDEX_NAME),
+                                   timeout=60, isolation_level=None,
+                                   check_same_thread=False)
+        with self._transaction():
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                             'name TEXT PRIMARY KEY, digest TEXT NOT NULL, '
+                             'size INTEGER NOT NULL, used REAL NOT NULL)')
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run the block in a write transaction. Other builds wait for it to
+        finish, up to the timeout of the connection.
+        """
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def close(self):
+        self._db.close()
+
+    def path(self, name):
+        """
+        Return the path of the cached copy named `name`.
+        """
+        return os.path.join(self.dirname, name)
+
+    def lookup(self, name, digest):
+        """
+        Return True if the cached copy named `name` was made from a binary
+        with the given digest, and mark it as used.
+        """
+        with self._transaction() as db:
+            row = db.execute('SELECT digest FROM entries WHERE name = ?',
+                             (name,)).fetchone()
+            if (row is None or row[0] != digest
+                    or not os.path.exists(self.path(name))):
+                return False
+            db.execute('UPDATE entries SET used = ? WHERE name = ?',
+                       (time.time(), name))
+            return True
+
+    def write(self, name, dump, replace=os_replace):
+        """
+        Write the cached copy named `name` by calling `dump(fp)`, without
+        adding it to the index, see atomic_write().
+        """
+        # Keep the extension, tools like UPX look at it.
+        atomic_write(self.path(name), dump, prefix=TEMP_PREFIX,
+                     suffix=os.path.splitext(name)[1], replace=replace)
+
+    def store(self, name, digest, dump):
+        """
+        Write the cached copy named `name`, made from a binary with the
+        given digest, by calling `dump(fp)` and add it to the index.
+        """
+        def replace(tmpname, path):
+            with self._transaction() as db:
+                os_replace(tmpname, path)
+                db.execute('INSERT OR REPLACE INTO entries '
+                           'VALUES (?, ?, ?, ?)',
+                           (name, digest, os.path.getsize(path), time.time()))
+        self.write(name, dump, replace)
+
+    def entries(self):
+        """
+        Return the list of (name, size, used) of all the cached copies.
+        Entries whose copy was removed are dropped from the index.
+        """
+        with self._transaction() as db:
+            rows = db.execute('SELECT name, size, used FROM entries').fetchall()
+            for name, size, used in rows:
+                if not os.path.exists(self.path(name)):
+                    db.execute('DELETE FROM entries WHERE name = ?', (name,))
+        return [row for row in rows if os.path.exists(self.path(row[0]))]
+
+    def evict(self, name, used):
+        """
+        Remove the cached copy named `name` unless it was used after `used`.
+        Return True if it was removed.
+        """
+        with self._transaction() as db:
+            cursor = db.execute('DELETE FROM entries WHERE name = ? AND '
+                                'used <= ?', (name, used))
+            if not cursor.rowcount:
+                return False
+            try:
+                os.remove(self.path(name))
+            except OSError:
+                pass
+            return True
+
+    def remove_orphans(self):
+        """
+        Remove files that are not in the index: the index.dat of older
+        versions of PyInstaller, copies listed only there and temporary
+        files of killed builds. Manifests are kept, checkCache() writes
+        them without adding them to the index.
+        """
+        with self._transaction() as db:
+            names = set(os.path.normcase(self.path(row[0])) for row in
+                        db.execute('SELECT name FROM entries'))
+            now = time.time()
+            for dirpath, dirnames, filenames in os.walk(self.dirname):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    if (os.path.normcase(path) in names or
+                            filename.startswith(INDEX_NAME) or
+                            filename.lower().endswith('.manifest')):
+                        continue
+                    if (filename.startswith(TEMP_PREFIX) and
+                            now - os.path.getmtime(path) < TEMP_MAX_AGE):
+                        continue
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+
+def prune(cachedir, max_size):
+    """
+    Remove the least recently used binaries from all the bincache
+    directories in `cachedir` until they take at most `max_size` bytes.
+
+    Return the tuple (count, size) of the removed binaries.
+    """
+    caches = [open_cache(d) for d in
+              sorted(glob.glob(os.path.join(cachedir, 'bincache*')))
+              if os.path.isdir(d)]
+    entries = []
+    for cache in caches:
+        entries.extend((used, size, name, cache)
+                       for name, size, used in cache.entries())
+    entries.sort(key=lambda entry: entry[0])
+    total = sum(entry[1] for entry in entries)
+    count = removed = 0
+    for used, size, name, cache in entries:
+        if total <= max_size:
+            break
+        if cache.evict(name, used):
+            total -= size
+            count += 1
+            removed += size
+    for cache in caches:
+        cache.remove_orphans()
+    if count:
+        logger.info('Removed %d binaries (%d KiB) from the cache',
+                    count, removed // 1024)
+    return count, removed
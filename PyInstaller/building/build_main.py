@@ -17,7 +17,9 @@ NOTE: All global variables, classes and imported modules create API
 
 
 import glob
+import multiprocessing
 import os
+import platform
 import pprint
 import shutil
 import sys
@@ -28,12 +30,17 @@ from .. import HOMEPATH, DEFAULT_DISTPATH, DEFAULT_WORKPATH
 from .. import compat
 from .. import log as logging
 from ..utils.misc import absnormpath
-from ..compat import is_py2, is_win, PYDYLIB_NAMES, VALID_MODULE_TYPES
+from ..compat import is_py2, is_win, PYDYLIB_NAMES
 from ..depend import bindepend
+from ..depend.depcache import BinaryDependencyCache
 from ..depend.analysis import initialize_modgraph
-from .api import PYZ, EXE, COLLECT, MERGE
+from ..utils.hooks import memo as hookmemo
+from .api import PYZ, EXE, COLLECT, MERGE, UNCOMPRESSED, COMPRESSED, \
+    COMPRESSED_LZ4
 from .datastruct import TOC, Target, Tree, _check_guts_eq
-from .imphook import AdditionalFilesCache, HooksCache, ImportHook
+from . import bincache, fingerprint, materialize
+from .imphook import AdditionalFilesCache, HooksCache, \
+    apply_post_graph_hooks
 from .osx import BUNDLE
 from .toc_conversion import DependencyProcessor
 from .utils import _check_guts_toc_mtime, format_binaries_and_datas
@@ -115,7 +122,8 @@ class Analysis(Target):
 
     def __init__(self, scripts, pathex=None, binaries=None, datas=None,
                  hiddenimports=None, hookspath=None, excludes=None, runtime_hooks=None,
-                 cipher=None, win_no_prefer_redirects=False, win_private_assemblies=False):
+                 cipher=None, win_no_prefer_redirects=False, win_private_assemblies=False,
+                 jobs=None):
         """
         scripts
                 A list of scripts specified as file names.
@@ -142,6 +150,10 @@ class Analysis(Target):
         win_private_assemblies
                 If True, changes all bundled Windows SxS Assemblies into Private
                 Assemblies to enforce assembly versions.
+        jobs
+                Number of worker processes scanning modules and of threads
+                reading binary dependencies in parallel, 0 means one per CPU.
+                Defaults to the value of option --jobs.
 
         """
         super(Analysis, self).__init__()
@@ -208,6 +220,9 @@ class Analysis(Target):
         self.binding_redirects = CONF['binding_redirects'] = []
         self.win_no_prefer_redirects = win_no_prefer_redirects
         self.win_private_assemblies = win_private_assemblies
+        if jobs is None:
+            jobs = CONF.get('jobs', 1)
+        self.jobs = jobs or multiprocessing.cpu_count()
 
         self.__postinit__()
 
@@ -279,7 +294,7 @@ class Analysis(Target):
         if Target._check_guts(self, data, last_build):
             return True
         for fnm in self.inputs:
-            if mtime(fnm) > last_build:
+            if last_build.changed(fnm):
                 logger.info("Building because %s changed", fnm)
                 return True
         # Now we know that none of the input parameters and none of
@@ -298,10 +313,22 @@ class Analysis(Target):
 
         return False
 
+    def _guts_files(self):
+        return self.inputs + super(Analysis, self)._guts_files()
+
     def assemble(self):
         """
         This method is the MAIN method for finding all necessary files to be bundled.
         """
+        self.graph = None
+        try:
+            self._assemble()
+        finally:
+            # Stop the workers scanning modules, also if the analysis failed.
+            if self.graph is not None:
+                self.graph.stop_scan_workers()
+
+    def _assemble(self):
         from ..config import CONF
 
         # Either instantiate a ModuleGraph object or for tests reuse
@@ -314,7 +341,8 @@ class Analysis(Target):
             for m in self.excludes:
                 logger.debug("Excluding module '%s'" % m)
             self.graph = initialize_modgraph(
-                excludes=self.excludes, user_hook_dirs=self.hookspath)
+                excludes=self.excludes, user_hook_dirs=self.hookspath,
+                jobs=self.jobs)
 
         # TODO Find a better place where to put 'base_library.zip' and when to created it.
         # For Python 3 it is necessary to create file 'base_library.zip'
@@ -359,9 +387,19 @@ class Analysis(Target):
         # the python executable and any binaries added by hooks later.
         # "binaries" are not the same as "extensions" which are .so or .dylib
         # that are found and recorded as extension nodes in the graph.
-        # Reset seen variable before running bindepend. We use bindepend only for
-        # the python executable.
-        bindepend.seen.clear()
+        # Binaries already analyzed by bindepend, shared by both passes below
+        # so the dependencies of the python executable are analyzed once.
+        seen = set()
+        # Persistent cache of the dependencies of the binaries, kept per Python
+        # version and architecture like the module cache.
+        depcache = None
+        if CONF.get('cachedir'):
+            pyver = 'py%d%s' % (sys.version_info[0], sys.version_info[1])
+            arch = platform.architecture()[0]
+            depcache = BinaryDependencyCache(
+                os.path.join(CONF['cachedir'],
+                             'depcache_%s_%s.dat' % (pyver, arch)),
+                bindepend.getImportsBackend())
 
         # Add binary and assembly dependencies of Python.exe.
         # This also ensures that its assembly depencies under Windows get added to the
@@ -369,7 +407,10 @@ class Analysis(Target):
         # dependencies, and rely on the app-global dependencies set by the .exe.
         self.binaries.extend(bindepend.Dependencies([('', python, '')],
                                                     manifest=depmanifest,
-                                                    redirects=self.binding_redirects)[1:])
+                                                    redirects=self.binding_redirects,
+                                                    seen=seen,
+                                                    jobs=self.jobs,
+                                                    cache=depcache)[1:])
         if is_win:
             depmanifest.writeprettyxml()
 
@@ -392,12 +433,10 @@ class Analysis(Target):
         #
         # Iterate over import hooks and update ModuleGraph as needed.
         #
-        # 1. Iterate in infinite 'while' loop.
-        # 2. Apply all possible hooks in one 'while' iteration.
-        # 3. Remove applied hooks from the cache.
-        # 4. The infinite 'while' loop ends when:
-        #    a. hooks cache is empty
-        #    b. no new hook was applied in the 'while' iteration.
+        # 1. Apply the hooks of all modules already in the graph.
+        # 2. Hooks add modules to the graph. The names of the new nodes are
+        #    matched against the hooked names and their hooks are applied.
+        # 3. Every hook is applied only once and removed from the cache.
         #
         logger.info('Looking for import hooks ...')
         hooks_cache = HooksCache(get_importhooks_dir())
@@ -410,49 +449,8 @@ class Analysis(Target):
         #       files belong to a module from dead branch of the graph.
         additional_files_cache = AdditionalFilesCache()
 
-        while True:
-            # This ensures that import hooks get applied only once.
-            applied_hooks = []  # Empty means no hook was applied.
-
-            # Iterate over hooks in cache.
-            for imported_name in hooks_cache:
-
-                # Skip hook if no module for it is in the graph.
-                from_node = self.graph.findNode(imported_name, create_nspkg=False)
-                if from_node is None:
-                    continue
-                # Skip hook if not the right Node type.
-                node_type = type(from_node).__name__
-                if node_type not in VALID_MODULE_TYPES:
-                    continue
-
-                # Run all post-graph hooks for this module.
-                for hook_file in hooks_cache[imported_name]:
-                    # Import hook module from a file.
-                    imphook_object = ImportHook(imported_name, hook_file)
-                    # Expand module dependency graph.
-                    imphook_object.update_dependencies(self.graph)
-                    # Update cache of binaries and datas.
-                    additional_files_cache.add(imported_name, imphook_object.binaries, imphook_object.datas)
-
-                # Append applied hooks to the list 'applied_hooks'.
-                # These will be removed after the inner loop finishs.
-                # It also is a marker that iteration over hooks should
-                # continue.
-                applied_hooks.append(imported_name)
-
-            ### All hooks from cache were traversed - stop or run again.
-            if not applied_hooks:  # Empty list.
-                # No new hook was applied - END of hooks processing.
-                break
-            else:
-                # Remove applied hooks from the cache - its not
-                # necessary apply then again.
-                hooks_cache.remove(applied_hooks)
-                # Run again - reset list 'applied_hooks'.
-                applied_hooks = []
-
-
+        apply_post_graph_hooks(self.graph, hooks_cache,
+                               additional_files_cache)
 
         # Update 'binaries' TOC and 'datas' TOC.
         deps_proc = DependencyProcessor(self.graph, additional_files_cache)
@@ -499,7 +497,10 @@ class Analysis(Target):
         # DLLs they depend on.
         logger.info('Looking for dynamic libraries')
         self.binaries.extend(bindepend.Dependencies(self.binaries,
-                                                    redirects=self.binding_redirects))
+                                                    redirects=self.binding_redirects,
+                                                    seen=seen,
+                                                    jobs=self.jobs,
+                                                    cache=depcache))
 
         ### Include zipped Python eggs.
         logger.info('Looking for eggs')
@@ -508,6 +509,8 @@ class Analysis(Target):
         # Verify that Python dynamic library can be found.
         # Without dynamic Python library PyInstaller cannot continue.
         self._check_python_library(self.binaries)
+        if depcache is not None:
+            depcache.save()
 
         if is_win:
             # Remove duplicate redirects
@@ -517,6 +520,9 @@ class Analysis(Target):
         # Write warnings about missing modules.
         self._write_warnings()
 
+        # Keep the scanned modules for the next build.
+        self.graph.save_code_cache()
+
     def _write_warnings(self):
         """
         Write warnings about missing modules. Get them from the graph
@@ -624,6 +630,7 @@ def build(spec, distpath, workpath, clean_build):
     # to be able start a clean build.
     if clean_build:
         logger.info('Removing temporary files and cleaning cache in %s', CONF['cachedir'])
+        bincache.close_caches()
         for pth in (CONF['cachedir'], workpath):
             if os.path.exists(pth):
                 # Remove all files in 'pth'.
@@ -667,6 +674,10 @@ def build(spec, distpath, workpath, clean_build):
         # Old classes for .spec - raise Exception for user.
         'TkPKG': TkPKG,
         'TkTree': TkTree,
+        # Compression of entries for PKG(cdict=...) and PYZ(compression=...).
+        'UNCOMPRESSED': UNCOMPRESSED,
+        'COMPRESSED': COMPRESSED,
+        'COMPRESSED_LZ4': COMPRESSED_LZ4,
         # Python modules available for .spec.
         'os': os,
         'pyi_crypto': pyz_crypto,
@@ -682,6 +693,16 @@ def build(spec, distpath, workpath, clean_build):
         text = f.read()
     exec(text, spec_namespace)
 
+    # Keep the digests of the input files for the next build.
+    fingerprint.save()
+    hookmemo.save()
+    materialize.log_stats()
+
+    # Keep the cache of processed binaries below its size limit.
+    if CONF.get('bincache_size') is not None:
+        bincache.prune(CONF['cachedir'], CONF['bincache_size'])
+    bincache.close_caches()
+
 
 def __add_options(parser):
     parser.add_argument("--distpath", metavar="DIR",
@@ -705,6 +726,36 @@ def __add_options(parser):
                         default=False,
                         help='Clean PyInstaller cache and remove temporary '
                         'files before building.')
+    parser.add_argument('--rebuild-check', choices=('mtime', 'content'),
+                        default='mtime',
+                        help='How to find the input files that changed since '
+                        'the last build: "mtime" compares their modification '
+                        'times, "content" their contents, which keeps builds '
+                        'incremental when the files are checked out or '
+                        'restored anew (default: mtime)')
+    parser.add_argument('--incremental-collect', action='store_true',
+                        default=False,
+                        help='In one-dir mode, update the output directory '
+                        'instead of building it anew: only the files that '
+                        'changed since the last build are copied, and the '
+                        'new directory replaces the old one only when it '
+                        'is complete.')
+    parser.add_argument('--link-cached-binaries', action='store_true',
+                        default=False,
+                        help='In one-dir mode, hard-link the stripped or '
+                        'UPX-compressed binaries from the cache into the '
+                        'output directory instead of copying them. The '
+                        'output directory then shares these files with the '
+                        'cache, so they must not be modified. Ignored on '
+                        'Mac OS X.')
+    parser.add_argument('--readable-tocs', action='store_true',
+                        default=False,
+                        help='Write the .toc files in the work directory as '
+                        'readable Python data instead of the faster binary '
+                        'format, e.g. to inspect them.')
+    parser.add_argument('--jobs', metavar='N', type=int, default=1,
+                        help='Number of worker processes to use for the '
+                        'build, 0 means one per CPU (default: 1)')
 
 
 def main(pyi_config, specfile, noconfirm, ascii=False, **kw):
@@ -733,5 +784,11 @@ def main(pyi_config, specfile, noconfirm, ascii=False, **kw):
 
     CONF['ui_admin'] = kw.get('ui_admin', False)
     CONF['ui_access'] = kw.get('ui_uiaccess', False)
+    # Number of worker processes or threads, 0 means one per CPU.
+    CONF['jobs'] = kw.get('jobs', 1) or multiprocessing.cpu_count()
+    CONF['rebuild_check'] = kw.get('rebuild_check', 'mtime')
+    CONF['incremental_collect'] = kw.get('incremental_collect', False)
+    CONF['link_cached_binaries'] = kw.get('link_cached_binaries', False)
+    CONF['readable_tocs'] = kw.get('readable_tocs', False)
 
     build(specfile, kw.get('distpath'), kw.get('workpath'), kw.get('clean_build'))
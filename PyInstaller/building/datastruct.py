@@ -9,15 +9,30 @@
 
 
 import os
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 from PyInstaller import compat as compat
 from PyInstaller.utils import misc
 from PyInstaller.utils.misc import load_py_data_struct, save_py_data_struct
 from .. import log as logging
-from .utils import _check_guts_eq
+from . import fingerprint
+from .utils import BuildStamp, _check_guts_eq
 
 logger = logging.getLogger(__name__)
 
+# Name of the digests of the input files stored after the guts.
+_DIGESTS = '_digests'
+
+# Magic and version of the binary format of the .toc files of Targets.
+GUTS_MAGIC = b'PYIGUTS\0'
+GUTS_VERSION = 1
+_GUTS_HEADER = '!8sII'
+
 
 class TOC(list):
     # TODO Simplify the representation and use directly Modulegraph objects.
@@ -37,13 +52,57 @@ class TOC(list):
 
     A TOC contains various types of files. A TOC contains no duplicates and preserves order.
     PyInstaller uses TOC data type to collect necessary files bundle them into an executable.
+
+    Besides the list, a TOC keeps a dict mapping the names to the entries and,
+    built on demand, the positions of the entries of every typecode, see
+    by_typecode(). Entries added with append(), insert() and extend() are
+    normalized and skip duplicates. All other list operations, e.g. slice
+    assignment or `+=` in spec files, work on the plain list and the index
+    is rebuilt from it when it is needed next.
     """
+    __slots__ = ('_index', '_partitions', '_normalized', '_code_cache')
+
+    def __new__(cls, *args, **kwargs):
+        # Set up the index here, subclasses might not call __init__().
+        self = super(TOC, cls).__new__(cls)
+        self._index = {}
+        self._partitions = None
+        # True while all entries were added by append(), insert() or
+        # extend(), i.e. are normalized and have unique names.
+        self._normalized = True
+        return self
+
     def __init__(self, initlist=None):
-        super(TOC, self).__init__(self)
-        self.filenames = set()
+        super(TOC, self).__init__()
+        self._changed()
+        self._normalized = True
         if initlist:
-            for entry in initlist:
-                self.append(entry)
+            self.extend(initlist)
+
+    @property
+    def filenames(self):
+        """
+        The set of the names of the entries.
+        """
+        return set(self._get_index())
+
+    def _get_index(self):
+        index = self._index
+        if index is None:
+            index = {}
+            for entry in self:
+                index.setdefault(entry[0], entry)
+            self._index = index
+        return index
+
+    def _changed(self, normalized=True):
+        """
+        Invalidate the index after the list was modified directly.
+        `normalized` tells if only normalized entries were added.
+        """
+        self._index = None
+        self._partitions = None
+        self._normalized = self._normalized and normalized
 
     def _normentry(self, entry):
         if not isinstance(entry, tuple):
@@ -61,17 +120,24 @@ class TOC(list):
             name = os.path.normcase(name)
         return (name, path, typecode)
 
+    def _append(self, entry):
+        # Append a normalized entry.
+        index = self._get_index()
+        if entry[0] not in index:
+            super(TOC, self).append(entry)
+            index[entry[0]] = entry
+            self._partitions = None
+
     def append(self, entry):
-        name, path, typecode = self._normentry(entry)
-        if name not in self.filenames:
-            super(TOC, self).append((name, path, typecode))
-            self.filenames.add(name)
+        self._append(self._normentry(entry))
 
     def insert(self, pos, entry):
-        name, path, typecode = self._normentry(entry)
-        if name not in self.filenames:
-            super(TOC, self).insert(pos, (name, path, typecode))
-            self.filenames.add(name)
+        entry = self._normentry(entry)
+        index = self._get_index()
+        if entry[0] not in index:
+            super(TOC, self).insert(pos, entry)
+            index[entry[0]] = entry
+            self._partitions = None
 
     def __add__(self, other):
         result = TOC(self)
@@ -83,19 +149,35 @@ class TOC(list):
         result.extend(self)
         return result
 
+    def _extend(self, entries):
+        # Append normalized entries.
+        index = self._get_index()
+        new = []
+        for entry in entries:
+            if entry[0] not in index:
+                index[entry[0]] = entry
+                new.append(entry)
+        super(TOC, self).extend(new)
+        self._partitions = None
+
     def extend(self, other):
-        # TODO: look if this can be done more efficient with out the
-        # loop, e.g. by not using a list as base at all
-        for entry in other:
-            self.append(entry)
+        if isinstance(other, TOC) and other._normalized:
+            # The entries are normalized already, only skip the duplicates.
+            self._extend(other)
+        else:
+            for entry in other:
+                self.append(entry)
 
     def __sub__(self, other):
-        other = TOC(other)
-        filenames = self.filenames - other.filenames
+        if not isinstance(other, TOC) or not other._normalized:
+            other = TOC(other)
+        names = other._get_index()
         result = TOC()
-        for name, path, typecode in self:
-            if name in filenames:
-                super(TOC, result).append((name, path, typecode))
+        entries = (entry for entry in self if entry[0] not in names)
+        if self._normalized:
+            result._extend(entries)
+        else:
+            result.extend(entries)
         return result
 
     def __rsub__(self, other):
@@ -103,14 +185,91 @@ class TOC(list):
         return result.__sub__(self)
 
     def intersect(self, other):
-        other = TOC(other)
-        filenames = self.filenames.intersection(other.filenames)
+        if not isinstance(other, TOC) or not other._normalized:
+            other = TOC(other)
+        names = self._get_index()
         result = TOC()
-        for name, path, typecode in other:
-            if name in filenames:
-                super(TOC, result).append((name, path, typecode))
+        result._extend(entry for entry in other if entry[0] in names)
         return result
 
+    def __contains__(self, entry):
+        if self._normalized:
+            try:
+                return self._get_index().get(entry[0]) == entry
+            except (TypeError, IndexError, KeyError):
+                return False
+        return super(TOC, self).__contains__(entry)
+
+    def get(self, name, default=None):
+        """
+        Return the entry with the given name or `default`. Names of BINARY
+        and DATA entries are compared case-normalized, see _normentry().
+        """
+        return self._get_index().get(name, default)
+
+    def by_typecode(self, *typecodes):
+        """
+        Return the list of the entries with one of the given typecodes in
+        the order of the TOC.
+        """
+        if self._partitions is None:
+            partitions = {}
+            for pos, entry in enumerate(self):
+                partitions.setdefault(entry[2], []).append(pos)
+            self._partitions = partitions
+        positions = []
+        for typecode in set(typecodes):
+            positions.extend(self._partitions.get(typecode, ()))
+        if len(typecodes) > 1:
+            positions.sort()
+        return [self[pos] for pos in positions]
+
+    # The list operations not going through append(), insert() or extend().
+
+    def __setitem__(self, key, value):
+        super(TOC, self).__setitem__(key, value)
+        self._changed(normalized=False)
+
+    def __delitem__(self, key):
+        super(TOC, self).__delitem__(key)
+        self._changed()
+
+    # Slicing on Python 2.
+    def __setslice__(self, i, j, sequence):
+        super(TOC, self).__setslice__(i, j, sequence)
+        self._changed(normalized=False)
+
+    def __delslice__(self, i, j):
+        super(TOC, self).__delslice__(i, j)
+        self._changed()
+
+    def __iadd__(self, other):
+        result = super(TOC, self).__iadd__(other)
+        self._changed(normalized=False)
+        return result
+
+    def __imul__(self, n):
+        result = super(TOC, self).__imul__(n)
+        self._changed(normalized=n <= 1)
+        return result
+
+    def pop(self, *args):
+        entry = super(TOC, self).pop(*args)
+        self._changed()
+        return entry
+
+    def remove(self, entry):
+        super(TOC, self).remove(entry)
+        self._changed()
+
+    def reverse(self):
+        super(TOC, self).reverse()
+        self._partitions = None
+
+    def sort(self, *args, **kwargs):
+        super(TOC, self).sort(*args, **kwargs)
+        self._partitions = None
+
 
 class Target(object):
     invcnum = 0
@@ -137,20 +296,27 @@ class Target(object):
         parameters and `__postinit__` is checking if rebuild is
         required and in case calls `assemble()`
         """
+        from ..config import CONF
         logger.info("checking %s", self.__class__.__name__)
         data = None
-        last_build = misc.mtime(self.tocfilename)
-        if last_build == 0:
+        last_build = BuildStamp(misc.mtime(self.tocfilename))
+        if last_build.mtime == 0:
             logger.info("Building %s because %s is non existent",
                         self.__class__.__name__, self.tocbasename)
         else:
             try:
-                data = load_py_data_struct(self.tocfilename)
+                data = _load_guts(self.tocfilename,
+                                  [g[0] for g in self._GUTS] + [_DIGESTS])
             except:
                 logger.info("Building because %s is bad", self.tocbasename)
             else:
-                # create a dict for easier access
-                data = dict(zip((g[0] for g in self._GUTS), data))
+                if (CONF.get('rebuild_check') == 'content' and
+                        _DIGESTS in data and data[_DIGESTS] is not None):
+                    # Hash the files that changed since the last build all at
+                    # once, the checks then find the digests in the memo.
+                    last_build.digests = data[_DIGESTS]
+                    fingerprint.digests(last_build.digests,
+                                        CONF.get('jobs', 1))
         # assemble if previous data was not found or is outdated
         if not data or self._check_guts(data, last_build):
             self.assemble()
@@ -163,7 +329,7 @@ class Target(object):
         """
         Returns True if rebuild/assemble is required
         """
-        if len(data) != len(self._GUTS):
+        if len(data) != len(self._GUTS) + 1:
             logger.info("Building because %s is bad", self.tocbasename)
             return True
         for attr, func in self._GUTS:
@@ -175,13 +341,132 @@ class Target(object):
         return False
 
 
+    def _guts_files(self):
+        """
+        Return the files whose contents the checks of the guts look at with
+        option --rebuild-check=content: the files in the TOCs of the guts
+        and the sources of the compiled modules among them.
+        """
+        files = []
+        for attr, func in self._GUTS:
+            value = getattr(self, attr)
+            if not isinstance(value, list):
+                continue
+            for entry in value:
+                if (isinstance(entry, tuple) and len(entry) == 3 and
+                        isinstance(entry[1], (str, type(u''))) and entry[1]):
+                    files.append(entry[1])
+                    if entry[1].endswith(('.pyc', '.pyo')):
+                        files.append(entry[1][:-1])
+        return files
+
+
     def _save_guts(self):
         """
         Save the input parameters and the work-product of this run to
         maybe avoid regenerating it later.
         """
-        data = tuple(getattr(self, g[0]) for g in self._GUTS)
-        save_py_data_struct(self.tocfilename, data)
+        from ..config import CONF
+        digests = None
+        if CONF.get('rebuild_check') == 'content':
+            digests = fingerprint.digests(self._guts_files(),
+                                          CONF.get('jobs', 1))
+        data = tuple(getattr(self, g[0]) for g in self._GUTS) + (digests,)
+        if CONF.get('readable_tocs'):
+            # Readable, but slow to write and to read back.
+            save_py_data_struct(self.tocfilename, data)
+        else:
+            _save_guts(self.tocfilename, data)
+
+
+def _plain(obj, strings):
+    """
+    Return `obj` with TOCs turned into lists, as load_py_data_struct() reads
+    them back, and with equal strings replaced by one object, which pickle
+    then stores once.
+    """
+    if isinstance(obj, (str, type(u''))):
+        return strings.setdefault(obj, obj)
+    elif isinstance(obj, list):
+        return [_plain(item, strings) for item in obj]
+    elif type(obj) is tuple:
+        return tuple(_plain(item, strings) for item in obj)
+    elif isinstance(obj, dict):
+        return dict((_plain(key, strings), _plain(value, strings))
+                    for key, value in obj.items())
+    return obj
+
+
+def _save_guts(filename, data):
+    """
+    Save the values of the guts of a Target in the binary format.
+
+    The file starts with the header (GUTS_MAGIC, GUTS_VERSION, count) and
+    the sizes of the `count` values, followed by the values, each pickled on
+    its own, so they can be read back one at a time.
+    """
+    strings = {}
+    values = [pickle.dumps(_plain(value, strings), pickle.HIGHEST_PROTOCOL)
+              for value in data]
+    dirname = os.path.dirname(filename)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(filename, 'wb') as fp:
+        fp.write(struct.pack(_GUTS_HEADER, GUTS_MAGIC, GUTS_VERSION,
+                             len(values)))
+        fp.write(struct.pack('!%dI' % len(values),
+                             *[len(value) for value in values]))
+        for value in values:
+            fp.write(value)
+
+
+class _Guts(object):
+    """
+    Read-only mapping of the guts saved by _save_guts(). Every value is
+    unpickled when it is accessed for the first time, so checking the input
+    parameters does not read the large TOCs when a parameter changed.
+    """
+    def __init__(self, names, blobs):
+        self._blobs = dict(zip(names, blobs))
+        self._values = {}
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def __contains__(self, name):
+        return name in self._blobs
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            value = self._values[name] = pickle.loads(self._blobs[name])
+            return value
+
+
+def _load_guts(filename, names):
+    """
+    Load the guts of a Target saved in the binary or in the text format.
+    Return a mapping from the names in `names` to the values.
+    """
+    headerlen = struct.calcsize(_GUTS_HEADER)
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    if not data.startswith(GUTS_MAGIC):
+        return dict(zip(names, load_py_data_struct(filename)))
+    magic, version, count = struct.unpack(_GUTS_HEADER, data[:headerlen])
+    if version != GUTS_VERSION:
+        raise ValueError('Unsupported version %d of %s' % (version, filename))
+    sizes = struct.unpack('!%dI' % count,
+                          data[headerlen:headerlen + 4 * count])
+    blobs = []
+    pos = headerlen + 4 * count
+    for size in sizes:
+        blobs.append(data[pos:pos + size])
+        pos += size
+    if pos != len(data):
+        raise ValueError('Truncated %s' % filename)
+    return _Guts(names, blobs)
 
 
 class Tree(Target, TOC):
@@ -232,7 +517,7 @@ class Tree(Target, TOC):
         stack = [data['root']]
         while stack:
             d = stack.pop()
-            if misc.mtime(d) > last_build:
+            if last_build.changed(d):
                 logger.info("Building %s because directory %s changed",
                             self.tocbasename, d)
                 return True
@@ -244,6 +529,20 @@ class Tree(Target, TOC):
         return False
 
 
+    def _guts_files(self):
+        # Only the directories are checked, see _check_guts().
+        dirs = []
+        stack = [self.root]
+        while stack:
+            d = stack.pop()
+            dirs.append(d)
+            for nm in os.listdir(d):
+                path = os.path.join(d, nm)
+                if os.path.isdir(path):
+                    stack.append(path)
+        return dirs
+
+
     def _save_guts(self):
         # Use the attribute `data` to save the list
         self.data = self
@@ -0,0 +1,173 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Incremental update of the output directory of COLLECT.
+
+Removing and copying every file of a large one-dir application takes a long
+time, although usually only a few of them changed. A manifest in WORKPATH
+records for every file of the output directory the file it was copied from
+and the size and modification time of both.
+
+The next build assembles the new output directory next to the old one. The
+files that did not change are hard-linked from the old directory, only the
+other ones are copied. Then the two directories are swapped, so the output
+directory is always either the complete old or the complete new one.
+"""
+
+import marshal
+import os
+import shutil
+
+from .. import log as logging
+from ..utils.misc import atomic_write, file_stamp
+from . import materialize
+from .utils import _confirm_rmtree
+
+logger = logging.getLogger(__name__)
+
+
+# Increment when the layout of the manifest changes.
+MANIFEST_VERSION = 1
+
+# The new output directory is assembled in a directory with this suffix.
+STAGING_SUFFIX = '.pyi-staging'
+
+# The old output directory is moved to a directory with this suffix before
+# it is removed.
+BACKUP_SUFFIX = '.pyi-old'
+
+
+def _list_files(dirname):
+    """
+    Return the paths of all files in the directory, relative to it.
+    """
+    result = []
+    for dirpath, dirnames, filenames in os.walk(dirname):
+        reldir = os.path.relpath(dirpath, dirname)
+        for filename in filenames:
+            result.append(os.path.normpath(os.path.join(reldir, filename)))
+    return result
+
+
+class DistSync(object):
+    """
+    Assemble the output directory `distdir` from the previous output,
+    described by the manifest `manifest`.
+
+    Every entry of the manifest maps the path of a file relative to the
+    output directory to the tuple
+
+        (source, source size, source mtime, size, mtime)
+
+    A file is reused when its source is the same file with the same size and
+    mtime as in the last build, and the file itself was not modified since.
+    """
+    def __init__(self, distdir, manifest):
+        self.distdir = distdir
+        self.manifest = manifest
+        self.staging = distdir + STAGING_SUFFIX
+        self.entries = {}
+        self.linked = 0
+        self.copied = 0
+        self._previous = {}
+        if os.path.isdir(distdir):
+            self._previous = self._load()
+            # Ask before removing files this class did not put there.
+            unknown = set(_list_files(distdir)) - set(self._previous)
+            if unknown:
+                logger.debug('Unknown files in %s: %s', distdir,
+                             sorted(unknown)[:10])
+                _confirm_rmtree(distdir)
+        self._rmtree(self.staging)
+        os.makedirs(self.staging)
+
+    def _load(self):
+        try:
+            with open(self.manifest, 'rb') as fp:
+                version, distdir, entries = marshal.load(fp)
+        except (IOError, OSError):
+            # No manifest yet.
+            return {}
+        except (EOFError, ValueError, TypeError):
+            logger.warn('Ignoring corrupted manifest %s', self.manifest)
+            return {}
+        if version != MANIFEST_VERSION or distdir != self.distdir:
+            return {}
+        return entries
+
+    def _save(self):
+        data = (MANIFEST_VERSION, self.distdir, self.entries)
+        atomic_write(self.manifest, lambda fp: marshal.dump(data, fp))
+
+    def _rmtree(self, path):
+        if os.path.isdir(path):
+            logger.debug('Removing dir %s', path)
+            shutil.rmtree(path)
+
+    def _reuse(self, src, inm, tofnm):
+        """
+        Hard-link the file of the last build to `tofnm` if it is still up to
+        date. Return True on success.
+        """
+        entry = self._previous.get(os.path.normpath(inm))
+        if entry is None or entry[0] != src:
+            return False
+        oldfnm = os.path.join(self.distdir, inm)
+        if (tuple(entry[1:3]) != file_stamp(src) or
+                tuple(entry[3:5]) != file_stamp(oldfnm)):
+            return False
+        link = getattr(os, 'link', None)
+        if link is None:
+            return False
+        try:
+            link(oldfnm, tofnm)
+        except OSError:
+            # E.g. a file system without hard links.
+            return False
+        return True
+
+    def copy(self, src, inm, link=False):
+        """
+        Put the file `src` into the new output directory as `inm` and return
+        its path there. If `link` is True, the file may be a hard link to
+        `src`.
+        """
+        tofnm = os.path.join(self.staging, inm)
+        if self._reuse(src, inm, tofnm):
+            self.linked += 1
+        else:
+            materialize.copy(src, tofnm, link)
+            self.copied += 1
+        self.entries[os.path.normpath(inm)] = (src,) + file_stamp(src) + \
+            file_stamp(tofnm)
+        return tofnm
+
+    def commit(self):
+        """
+        Replace the output directory by the new one and save the manifest.
+        """
+        if os.path.exists(self.manifest):
+            os.remove(self.manifest)
+        backup = self.distdir + BACKUP_SUFFIX
+        self._rmtree(backup)
+        if os.path.isdir(self.distdir):
+            os.rename(self.distdir, backup)
+        os.rename(self.staging, self.distdir)
+        self._save()
+        self._rmtree(backup)
+        logger.info('Updated %s: %d files copied, %d unchanged',
+                    self.distdir, self.copied, self.linked)
+
+    def abort(self):
+        """
+        Remove the new output directory, keeping the old one.
+        """
+        self._rmtree(self.staging)
@@ -0,0 +1,140 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Digests of the contents of the input files of Targets.
+
+With option --rebuild-check=content, a Target records the digests of its
+input files and is rebuilt only when a digest changed, not when the file was
+merely touched, e.g. by a fresh checkout or by restoring a cache on a CI
+server.
+
+Computing a digest means reading the whole file. The digests are therefore
+remembered for every (device, inode, size, mtime) of a file in a file in
+CONF['cachedir'], so files that were not touched are never read again.
+"""
+
+import hashlib
+import marshal
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
+from .. import log as logging
+from ..utils.misc import atomic_write
+from .bincache import digest as file_digest
+
+logger = logging.getLogger(__name__)
+
+
+# Increment when the layout of the memo changes.
+MEMO_VERSION = 1
+
+# The memo keeps at most this many digests, the ones used by the current
+# build first.
+MEMO_MAX_ENTRIES = 200000
+
+# Digests by (device, inode, size, mtime) of the files.
+_memo = None
+_used = {}
+_lock = threading.Lock()
+
+
+def _memo_filename():
+    from ..config import CONF
+    if not CONF.get('cachedir'):
+        return None
+    return os.path.join(CONF['cachedir'], 'digests.dat')
+
+
+def _load_memo():
+    global _memo
+    _memo = {}
+    filename = _memo_filename()
+    if filename is None:
+        return
+    try:
+        with open(filename, 'rb') as fp:
+            version, memo = marshal.load(fp)
+    except (IOError, OSError):
+        # No memo yet.
+        return
+    except (EOFError, ValueError, TypeError):
+        logger.warn('Ignoring corrupted digest cache %s', filename)
+        return
+    if version == MEMO_VERSION:
+        _memo = memo
+
+
+def digest(path):
+    """
+    Return the hex digest of the content of the file or the directory, or
+    None if it does not exist. The digest of a directory covers the names
+    of its entries.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+    with _lock:
+        if _memo is None:
+            _load_memo()
+        value = _memo.get(key)
+    if value is None:
+        if os.path.isdir(path):
+            names = '\0'.join(sorted(os.listdir(path)))
+            if not isinstance(names, bytes):
+                names = names.encode('utf-8', 'surrogateescape')
+            value = hashlib.md5(names).hexdigest()
+        else:
+            value = file_digest(path)
+    with _lock:
+        _memo[key] = _used[key] = value
+    return value
+
+
+def digests(paths, jobs=1):
+    """
+    Return a dict mapping every path in `paths` to digest(path), computed by
+    `jobs` threads. Reading files releases the GIL, so do the hashes of
+    large files.
+    """
+    paths = sorted(set(paths))
+    if jobs > 1 and len(paths) > 1:
+        pool = ThreadPool(jobs)
+        try:
+            values = pool.map(digest, paths)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        values = [digest(path) for path in paths]
+    return dict(zip(paths, values))
+
+
+def save():
+    """
+    Write the digests used by this build and as many older ones as allowed
+    by MEMO_MAX_ENTRIES back to the memo.
+    """
+    global _memo
+    filename = _memo_filename()
+    with _lock:
+        if filename is None or not _used:
+            return
+        memo = dict(_used)
+        for key, value in (_memo or {}).items():
+            if len(memo) >= MEMO_MAX_ENTRIES:
+                break
+            memo.setdefault(key, value)
+        _memo = None
+        _used.clear()
+    atomic_write(filename, lambda fp: marshal.dump((MEMO_VERSION, memo), fp))
@@ -16,12 +16,14 @@ import glob
 import os.path
 import re
 import sys
+import types
 import warnings
+from collections import deque
 
 from .. import log as logging
 from .utils import format_binaries_and_datas
 from ..compat import expand_path
-from ..compat import importlib_load_source, is_py2
+from ..compat import is_py2, VALID_MODULE_TYPES
 from ..utils.misc import get_code_object
 from .imphookapi import PostGraphAPI
 from ..lib.modulegraph.modulegraph import GraphError
@@ -29,6 +31,86 @@ from ..lib.modulegraph.modulegraph import GraphError
 logger = logging.getLogger(__name__)
 
 
+def load_hook_module(name, filename, code_cache=None):
+    """
+    Import the hook script `filename` as a new module named `name`.
+
+    If `code_cache` (a `ModuleCodeCache`) is given, the compiled code of the
+    script is taken from and stored into it, so the next build does not
+    compile the script again.
+    """
+    code = None
+    if code_cache is not None:
+        cached = code_cache.get(filename)
+        if cached is not None:
+            code = cached[0]
+    if code is None:
+        with open(filename, 'rb') as fp:
+            source = fp.read()
+        code = compile(source, filename, 'exec')
+        if code_cache is not None:
+            code_cache.put(filename, code, (), ())
+    module = types.ModuleType(name)
+    module.__file__ = filename
+    sys.modules[name] = module
+    exec(code, module.__dict__)
+    return module
+
+
+def apply_post_graph_hooks(mod_graph, hooks_cache, additional_files_cache):
+    """
+    Run the post-graph hooks in `hooks_cache` for the modules in the graph,
+    removing them from the cache.
+
+    The hooks of a module run exactly once, as soon as a valid node for the
+    module is in the graph. Hooks add nodes to the graph, so after every
+    hook the names of the nodes added in the meantime (see
+    `PyiModuleGraph.track_added_nodes()`) are matched against the hooked
+    module names, instead of looking up all hooked modules in the graph
+    again.
+
+    Parameters
+    ----------
+    mod_graph : PyiModuleGraph
+        Graph to be updated by the hooks.
+    hooks_cache : HooksCache
+        Hooks to be run.
+    additional_files_cache : AdditionalFilesCache
+        Cache receiving the binaries and datas added by the hooks.
+    """
+    code_cache = mod_graph.code_cache
+    mod_graph.track_added_nodes(True)
+    try:
+        # Every hooked module once, then only the newly added ones.
+        pending = deque(hooks_cache)
+        while pending:
+            imported_name = pending.popleft()
+            if imported_name in hooks_cache:
+                # Skip hook if no module for it is in the graph or if it is
+                # not the right Node type.
+                from_node = mod_graph.findNode(imported_name,
+                                               create_nspkg=False)
+                if (from_node is not None and
+                        type(from_node).__name__ in VALID_MODULE_TYPES):
+                    # Run all post-graph hooks for this module.
+                    for hook_file in hooks_cache[imported_name]:
+                        # Import hook module from a file.
+                        imphook_object = ImportHook(imported_name, hook_file,
+                                                    code_cache)
+                        # Expand module dependency graph.
+                        imphook_object.update_dependencies(mod_graph)
+                        # Update cache of binaries and datas.
+                        additional_files_cache.add(imported_name,
+                                                   imphook_object.binaries,
+                                                   imphook_object.datas)
+                    hooks_cache.remove([imported_name])
+            # Also findNode() might add nodes.
+            pending.extend(name for name in mod_graph.pop_added_nodes()
+                           if name in hooks_cache)
+    finally:
+        mod_graph.track_added_nodes(False)
+
+
 class HooksCache(dict):
     """
     Dictionary mapping from the fully-qualified names of each module hooked by
@@ -169,9 +251,10 @@ class ImportHook(object):
     """
     Class encapsulating processing of hook attributes like hiddenimports, etc.
     """
-    def __init__(self, modname, hook_filename):
+    def __init__(self, modname, hook_filename, code_cache=None):
         """
         :param hook_filename: File name where to load hook from.
+        :param code_cache: ModuleCodeCache with the compiled hook or None.
         """
         logger.info('Processing hook   %s' % os.path.basename(hook_filename))
         self._name = modname
@@ -179,7 +262,8 @@ class ImportHook(object):
         # _module represents the code of 'hook-modname.py'
         # Load hook from file and parse and interpret it's content.
         hook_modname = 'PyInstaller_hooks_' + modname.replace('.', '_')
-        self._module = importlib_load_source(hook_modname, self._filename)
+        self._module = load_hook_module(hook_modname, self._filename,
+                                        code_cache)
         # Public import hook attributes for further processing.
         self.binaries = set()
         self.datas = set()
@@ -239,19 +323,15 @@ class ImportHook(object):
         """
 
         def find_all_package_nodes(name):
-            mods = [name]
-            name += '.'
-            for subnode in mod_graph.nodes():
-                if subnode.identifier.startswith(name):
-                    mods.append(subnode.identifier)
+            mods = mod_graph.subtree(name)
+            if name not in mods:
+                mods.insert(0, name)
             return mods
 
         # Collect all submodules of this module.
         hooked_mods = find_all_package_nodes(self._name)
 
         # Collect all dependencies and their submodules
-        # TODO: Optimize this by using a pattern and walking the graph
-        # only once.
         for item in set(self._module.excludedimports):
             excluded_node = mod_graph.findNode(item, create_nspkg=False)
             if excluded_node is None:
@@ -0,0 +1,194 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Copying of files into the cache and the output directories.
+
+Most files end up in a build unchanged, so copying them is pure I/O. Where
+the operating system and the file system support it, the data is not read
+into Python at all. The methods are tried in this order:
+
+reflink
+    The copy shares the blocks of the original until one of them is
+    modified (ioctl FICLONE on Linux with Btrfs, XFS and others). Takes no
+    time and no disk space.
+copy_file_range, sendfile
+    The kernel copies the data, possibly on the server for network file
+    systems.
+hardlink
+    Only where the caller allows it, i.e. for files from the cache of
+    processed binaries with option --link-cached-binaries. The output then
+    shares the file with the cache, which must not be modified.
+copy
+    The data is read and written by Python.
+
+The number of files and bytes copied with every method is logged at the end
+of the build, see log_stats().
+"""
+
+import errno
+import os
+import shutil
+import threading
+
+from .. import log as logging
+from ..compat import is_linux
+
+logger = logging.getLogger(__name__)
+
+
+# Request code of the ioctl cloning a whole file on Linux.
+FICLONE = 0x40049409
+
+# Blocks of the Python copy loop.
+BLOCK_SIZE = 64 * 1024
+
+# Methods not supported by the running kernel.
+_unsupported = set()
+
+# Number of files and bytes copied by every method.
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _count(method, size):
+    with _stats_lock:
+        stats = _stats.setdefault(method, [0, 0])
+        stats[0] += 1
+        stats[1] += size
+
+
+def _reflink(src_fd, dst_fd, size, offset):
+    if offset:
+        # Cloning into the middle of a file requires aligned offsets.
+        raise OSError(errno.EINVAL, 'Cannot clone to offset %d' % offset)
+    import fcntl
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dst_fd, size, offset):
+    copied = 0
+    while copied < size:
+        n = os.copy_file_range(src_fd, dst_fd, size - copied, copied,
+                               offset + copied)
+        if not n:
+            break
+        copied += n
+
+
+def _sendfile(src_fd, dst_fd, size, offset):
+    # Linux only, elsewhere sendfile() writes to sockets only.
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    copied = 0
+    while copied < size:
+        n = os.sendfile(dst_fd, src_fd, copied, size - copied)
+        if not n:
+            break
+        copied += n
+
+
+_METHODS = []
+if is_linux:
+    _METHODS.append(('reflink', _reflink))
+    if hasattr(os, 'copy_file_range'):
+        _METHODS.append(('copy_file_range', _copy_file_range))
+    if hasattr(os, 'sendfile'):
+        _METHODS.append(('sendfile', _sendfile))
+
+
+def _copy_data(fsrc, fdst):
+    """
+    Write the content of the file object `fsrc` to the file object `fdst`
+    at its current position and return the method used.
+    """
+    fdst.flush()
+    offset = fdst.tell()
+    size = os.fstat(fsrc.fileno()).st_size
+    for method, function in _METHODS:
+        if method in _unsupported:
+            continue
+        try:
+            function(fsrc.fileno(), fdst.fileno(), size, offset)
+        except (OSError, IOError) as e:
+            if e.errno == errno.ENOSYS:
+                _unsupported.add(method)
+            # Drop whatever was written before the error.
+            os.ftruncate(fdst.fileno(), offset)
+            continue
+        fdst.seek(offset + size)
+        _count(method, size)
+        return method
+    fdst.seek(offset)
+    fsrc.seek(0)
+    shutil.copyfileobj(fsrc, fdst, BLOCK_SIZE)
+    _count('copy', size)
+    return 'copy'
+
+
+def append_file(src, fdst):
+    """
+    Append the content of the file `src` to the file object `fdst`, which
+    must be opened for writing in binary mode.
+    """
+    with open(src, 'rb') as fsrc:
+        return _copy_data(fsrc, fdst)
+
+
+def copy_file(src, dst, link=False):
+    """
+    Make `dst` a copy of the file `src` like shutil.copyfile() and return
+    the method used. If `link` is True, `dst` may become a hard link to
+    `src`.
+    """
+    if link and hasattr(os, 'link'):
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            # E.g. different file systems.
+            pass
+        else:
+            _count('hardlink', os.path.getsize(src))
+            return 'hardlink'
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            return _copy_data(fsrc, fdst)
+
+
+def copy(src, dst, link=False):
+    """
+    Copy the file `src` to the file or directory `dst` with its permission
+    bits and times like shutil.copy2() and return the method used. If
+    `link` is True, `dst` may become a hard link to `src`.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    method = copy_file(src, dst, link)
+    if method != 'hardlink':
+        try:
+            shutil.copystat(src, dst)
+        except OSError:
+            logger.warn("failed to copy flags of %s", src)
+    return method
+
+
+def log_stats():
+    """
+    Log the number of files and bytes copied with every method since the
+    last call.
+    """
+    with _stats_lock:
+        stats = sorted(_stats.items())
+        _stats.clear()
+    if stats:
+        logger.info('Copied files: %s', ', '.join(
+            '%s %d (%d KiB)' % (method, count, size // 1024)
+            for method, (count, size) in stats))
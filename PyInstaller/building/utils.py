@@ -13,20 +13,20 @@
 # NOTE: By GUTS it is meant intermediate files and data structures that
 # PyInstaller creates for bundling files and creating final executable.
 import glob
-import hashlib
 import os
 import os.path
 import platform
 import shutil
 import sys
+from multiprocessing.pool import ThreadPool
 
 from .. import is_darwin, is_win, compat
 from ..compat import EXTENSION_SUFFIXES, FileNotFoundError
 from ..depend import dylib
 from ..depend.bindepend import match_binding_redirect
 from ..utils import misc
-from ..utils.misc import load_py_data_struct, save_py_data_struct
 from .. import log as logging
+from . import bincache, fingerprint, materialize
 
 if is_win:
     from ..utils.win32 import winmanifest, winresource
@@ -39,6 +39,29 @@ logger = logging.getLogger(__name__)
 # NOTE: By _GUTS it is meant intermediate files and data structures that
 # PyInstaller creates for bundling files and creating final executable.
 
+class BuildStamp(object):
+    """
+    The state of the input files of a Target when it was last built, passed
+    as `last_build` to the functions checking the guts.
+
+    `mtime` is the time of the last build. `digests` maps the input files to
+    the digests of their contents recorded by the last build with option
+    --rebuild-check=content, and is None otherwise.
+    """
+    def __init__(self, mtime, digests=None):
+        self.mtime = mtime
+        self.digests = digests
+
+    def changed(self, fnm):
+        """
+        Return True if the file changed since the last build: its content if
+        its digest was recorded, its mtime otherwise.
+        """
+        if self.digests is not None and fnm in self.digests:
+            return fingerprint.digest(fnm) != self.digests[fnm]
+        return misc.mtime(fnm) > self.mtime
+
+
 def _check_guts_eq(attr, old, new, last_build):
     """
     rebuild is required if values differ
@@ -59,10 +82,10 @@ def _check_guts_toc_mtime(attr, old, toc, last_build, pyc=0):
     Use this for calculated/analysed values read from cache.
     """
     for (nm, fnm, typ) in old:
-        if misc.mtime(fnm) > last_build:
+        if last_build.changed(fnm):
             logger.info("Building because %s changed", fnm)
             return True
-        elif pyc and misc.mtime(fnm[:-1]) > last_build:
+        elif pyc and last_build.changed(fnm[:-1]):
             logger.info("Building because %s changed", fnm[:-1])
             return True
     return False
@@ -164,13 +187,7 @@ def checkCache(fnm, strip=False, upx=False, dist_nm=None):
     pyver = ('py%d%s') % (sys.version_info[0], sys.version_info[1])
     arch = platform.architecture()[0]
     cachedir = os.path.join(CONF['cachedir'], 'bincache%d%d_%s_%s' % (strip, upx, pyver, arch))
-    if not os.path.exists(cachedir):
-        os.makedirs(cachedir)
-    cacheindexfn = os.path.join(cachedir, "index.dat")
-    if os.path.exists(cacheindexfn):
-        cache_index = load_py_data_struct(cacheindexfn)
-    else:
-        cache_index = {}
+    cache = bincache.open_cache(cachedir)
 
     # Verify if the file we're looking for is present in the cache.
     # Use the dist_mn if given to avoid different extension modules
@@ -180,17 +197,39 @@ def checkCache(fnm, strip=False, upx=False, dist_nm=None):
     else:
         basenm = os.path.normcase(os.path.basename(fnm))
     digest = cacheDigest(fnm)
-    cachedfile = os.path.join(cachedir, basenm)
+    cachedfile = cache.path(basenm)
+    if cache.lookup(basenm, digest):
+        # On Mac OS X we need relative paths to dll dependencies
+        # starting with @executable_path
+        if is_darwin:
+            dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
+        return cachedfile
+
+    def process(fp):
+        # The tools write the file by its name.
+        fp.close()
+        _process_binary(fnm, fp.name, strip, upx, dist_nm)
+    if fnm.lower().endswith(".manifest"):
+        # Manifests depend on the binding redirects and are not kept in the
+        # index.
+        cache.write(basenm, process)
+        return cachedfile
+    cache.store(basenm, digest, process)
+
+    # On Mac OS X we need relative paths to dll dependencies
+    # starting with @executable_path
+    if is_darwin:
+        dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
+    return cachedfile
+
+
+def _process_binary(fnm, cachedfile, strip, upx, dist_nm):
+    """
+    Write the binary `fnm` stripped, compressed with UPX or with modified
+    manifests to `cachedfile`.
+    """
+    from ..config import CONF
     cmd = None
-    if basenm in cache_index:
-        if digest != cache_index[basenm]:
-            os.remove(cachedfile)
-        else:
-            # On Mac OS X we need relative paths to dll dependencies
-            # starting with @executable_path
-            if is_darwin:
-                dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
-            return cachedfile
 
     redirects = CONF.get('binding_redirects', [])
 
@@ -212,11 +251,11 @@ def checkCache(fnm, strip=False, upx=False, dist_nm=None):
         applyRedirects(manifest, redirects)
 
         manifest.writeprettyxml(cachedfile)
-        return cachedfile
+        return
 
     if upx:
         if strip:
-            fnm = checkCache(fnm, strip=True, upx=False)
+            fnm = checkCache(fnm, strip=True, upx=False, dist_nm=dist_nm)
         bestopt = "--best"
         # FIXME: Linux builds of UPX do not seem to contain LZMA (they assert out)
         # A better configure-time check is due.
@@ -237,9 +276,7 @@ def checkCache(fnm, strip=False, upx=False, dist_nm=None):
                 strip_options = ["-S"]
             cmd = ["strip"] + strip_options + [cachedfile]
 
-    if not os.path.exists(os.path.dirname(cachedfile)):
-        os.makedirs(os.path.dirname(cachedfile))
-    shutil.copy2(fnm, cachedfile)
+    materialize.copy(fnm, cachedfile)
     if hasattr(os, 'chflags'):
         # Some libraries on FreeBSD have immunable flag (libthr.so.3, for example)
         # If flags still remains, os.chmod will failed with:
@@ -304,21 +341,48 @@ def checkCache(fnm, strip=False, upx=False, dist_nm=None):
         except OSError as e:
             raise SystemExit("Execution failed: %s" % e)
 
-    # update cache index
-    cache_index[basenm] = digest
-    save_py_data_struct(cacheindexfn, cache_index)
 
-    # On Mac OS X we need relative paths to dll dependencies
-    # starting with @executable_path
-    if is_darwin:
-        dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
-    return cachedfile
+def populateCache(binaries, strip=False, upx=False, jobs=1):
+    """
+    Process the binaries with a pool of `jobs` threads ahead of the
+    checkCache() calls for them, which then find them in the cache.
+
+    `binaries` is a list of (fnm, dist_nm) pairs as passed to checkCache().
+    Only the first binary for every `dist_nm` is processed, binaries sharing
+    the name of one processed earlier are left to the checkCache() calls, so
+    the cache ends up the same as without this pre-pass.
+    """
+    if jobs <= 1 or (not strip and not upx and not is_darwin and not is_win):
+        return
+    todo = []
+    names = set()
+    for fnm, dist_nm in binaries:
+        name = os.path.normcase(dist_nm)
+        if name in names or ":" in dist_nm or not os.path.isfile(fnm):
+            continue
+        names.add(name)
+        todo.append((fnm, dist_nm))
+
+    def process(binary):
+        # SystemExit would stop the worker thread without a result.
+        try:
+            checkCache(binary[0], strip=strip, upx=upx, dist_nm=binary[1])
+        except SystemExit as e:
+            return e
+
+    logger.info("Processing %d binaries with %d threads", len(todo), jobs)
+    pool = ThreadPool(jobs)
+    try:
+        for error in pool.imap(process, todo):
+            if error is not None:
+                raise error
+    finally:
+        pool.terminate()
+        pool.join()
 
 
 def cacheDigest(fnm):
-    data = open(fnm, "rb").read()
-    digest = hashlib.md5(data).digest()
-    return digest
+    return bincache.digest(fnm)
 
 
 def _check_path_overlap(path):
@@ -351,6 +415,16 @@ def _rmtree(path):
     Remove directory and all its contents, but only after user confirmation,
     or if the -y option is set
     """
+    _confirm_rmtree(path)
+    logger.info('Removing dir %s', path)
+    shutil.rmtree(path)
+
+
+def _confirm_rmtree(path):
+    """
+    Ask the user to confirm the removal of the directory and all its
+    contents, unless the -y option is set. Raise SystemExit if not confirmed.
+    """
     from ..config import CONF
     if CONF['noconfirm']:
         choice = 'y'
@@ -362,10 +436,7 @@ def _rmtree(path):
                          'Please remove all its contents or use the '
                          '-y option (remove output directory without '
                          'confirmation).' % path)
-    if choice.strip().lower() == 'y':
-        logger.info('Removing dir %s', path)
-        shutil.rmtree(path)
-    else:
+    if choice.strip().lower() != 'y':
         raise SystemExit('User aborted')
 
 
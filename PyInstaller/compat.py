@@ -490,6 +490,18 @@ else:
         return mod_loader.load_module()
 
 
+# Function os.replace() is new in Python 3.3. It renames a file and silently
+# overwrites the destination on all platforms. In Python 2 os.rename() does
+# the same on Unix, but on Windows the destination has to be removed first.
+if hasattr(os, 'replace'):
+    os_replace = os.replace
+else:
+    def os_replace(src, dst):
+        if is_win and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
 try:
     # new in Python 3
     FileNotFoundError_ = FileNotFoundError
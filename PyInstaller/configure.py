@@ -23,6 +23,9 @@ from .compat import is_win, is_darwin
 
 logger = logging.getLogger(__name__)
 
+# Default size limit of the processed binaries in the cache.
+DEFAULT_BINCACHE_SIZE = 1024 * 1024 * 1024
+
 
 def test_UPX(config, upx_dir):
     logger.debug('Testing for UPX ...')
@@ -83,6 +86,20 @@ def _get_pyinst_cache_dir():
     return cache_dir
 
 
+def _get_bincache_size():
+    """
+    Return the size limit in bytes of the processed binaries in the cache,
+    from the environment variable PYINSTALLER_BINCACHE_SIZE in MiB.
+    """
+    size = compat.getenv('PYINSTALLER_BINCACHE_SIZE', '')
+    try:
+        return int(size) * 1024 * 1024
+    except ValueError:
+        if size:
+            logger.warn('Ignoring invalid PYINSTALLER_BINCACHE_SIZE %r', size)
+        return DEFAULT_BINCACHE_SIZE
+
+
 def get_importhooks_dir(hook_type=None):
     from . import PACKAGEPATH
     if not hook_type:
@@ -95,5 +112,6 @@ def get_config(upx_dir, **kw):
     config = {}
     test_UPX(config, upx_dir)
     config['cachedir'] = _get_pyinst_cache_dir()
+    config['bincache_size'] = _get_bincache_size()
 
     return config
@@ -32,25 +32,93 @@ Other added methods look up nodes by identifier and return facts
 about them, replacing what the old ImpTracker list could do.
 """
 
+import ast
+import imp
 import logging
+import marshal
+import multiprocessing
 import os
-import re
+import platform
+import sys
 
 from ..building.datastruct import TOC
-from ..building.imphook import HooksCache
+from ..building.imphook import HooksCache, load_hook_module
 from ..building.imphookapi import PreSafeImportModuleAPI, PreFindModulePathAPI
 from ..utils.misc import load_py_data_struct
-from ..lib.modulegraph.modulegraph import ModuleGraph
+from ..lib.modulegraph.modulegraph import ModuleGraph, DependencyInfo, \
+        SourceModule, _Visitor, _scan_bytecode_stores
 from ..lib.modulegraph.find_modules import get_implies
-from ..compat import importlib_load_source, is_py2, PY3_BASE_MODULES,\
+from ..compat import is_py2, PY3_BASE_MODULES,\
         PURE_PYTHON_MODULE_TYPES, BINARY_MODULE_TYPES, VALID_MODULE_TYPES, \
         BAD_MODULE_TYPES, MODULE_TYPES_TO_TOC_DICT
 from .. import HOMEPATH, configure
 from ..utils.hooks import collect_submodules, is_package
+from .codecache import ModuleCodeCache
+from .nameindex import ModuleNameIndex
+from .pathindex import SearchPathIndex
 
 logger = logging.getLogger(__name__)
 
 
+class _ImportCollector(_Visitor):
+    """
+    AST visitor collecting the imports of a module exactly like `_Visitor`,
+    which also remembers the names of each `from ... import` statement in
+    the order of the source code.
+
+    Rebuilding the `fromlist` sets in this order yields sets iterating in the
+    same order as the sets built by `_Visitor`, so the nodes for imported
+    names are added to the graph in the same order.
+    """
+    def __init__(self, module):
+        _Visitor.__init__(self, None, module)
+        self.fromlists = []
+
+    def _collect_import(self, name, fromlist, level):
+        _Visitor._collect_import(self, name, fromlist, level)
+        if fromlist is not None:
+            fromlist = tuple(n for n in fromlist if n != '*')
+        self.fromlists.append(fromlist)
+
+
+def _scan_source(pathname):
+    """
+    Read, parse, compile and scan the Python source file with the passed path.
+
+    This function does not touch any module graph, so it may run in a worker
+    process. It repeats what `ModuleGraph._load_module()` and
+    `ModuleGraph._scan_code()` do for source modules up to the point where
+    the imports are actually processed.
+
+    Returns
+    ----------
+    tuple
+        The tuple `(marshalled_code, globalnames, imports)` or `None` if the
+        file contains a syntax error. `imports` is a tuple of
+        `(have_star, name, fromlist, level, attr)` tuples containing only
+        plain builtin objects, so it can be marshalled and sent between
+        processes.
+    """
+    with open(pathname, 'rb') as fp:
+        contents = fp.read() + b'\n'
+    try:
+        co_ast = compile(contents, pathname, 'exec', ast.PyCF_ONLY_AST, True)
+    except SyntaxError:
+        return None
+    co = compile(co_ast, pathname, 'exec', 0, True)
+    # Temporary node collecting the scan results. Its name does not matter.
+    module = SourceModule(pathname)
+    visitor = _ImportCollector(module)
+    visitor.visit(co_ast)
+    _scan_bytecode_stores(co, module)
+    imports = []
+    for (have_star, (name, _, _, level), kwargs), fromlist in \
+            zip(module._imported_modules, visitor.fromlists):
+        imports.append((have_star, name, fromlist, level,
+                        tuple(kwargs['attr'])))
+    return marshal.dumps(co), tuple(module.globalnames), tuple(imports)
+
+
 class PyiModuleGraph(ModuleGraph):
     """
     Directed graph whose nodes represent modules and edges represent
@@ -77,16 +145,44 @@ class PyiModuleGraph(ModuleGraph):
     _user_hook_dirs : list
         List of the absolute paths of all directories containing user-defined
         hooks for the current application.
+    _code_cache : ModuleCodeCache
+        Persistent cache of code objects and imports of source modules
+        scanned by previous builds or `None` if caching is disabled. See the
+        `_load_module()` method for details.
+    _scan_pool : multiprocessing.Pool
+        Pool of worker processes scanning source modules in advance or `None`
+        if modules are scanned serially. See the `_prefetch_imports()` method
+        for details.
+    _path_index : SearchPathIndex
+        Names importable from the directories searched for modules, used to
+        skip directories not containing a module. See the
+        `_find_module_path()` method for details.
     """
 
 
-    def __init__(self, pyi_homepath, user_hook_dirs=None, *args, **kwargs):
+    def __init__(self, pyi_homepath, user_hook_dirs=None, code_cache=None,
+                 jobs=1, *args, **kwargs):
         super(PyiModuleGraph, self).__init__(*args, **kwargs)
         # Homepath to the place where is PyInstaller located.
         self._homepath = pyi_homepath
+        # Persistent cache of scanned source modules or None.
+        self._code_cache = code_cache
+        # Worker processes for parallel scanning, the pending scan jobs keyed
+        # by the path of the source file and the source files guessed for
+        # fully-qualified module names.
+        self._scan_pool = None
+        self._scan_jobs = {}
+        self._scan_guesses = {}
         # modulegraph Node for the main python script that is analyzed
         # by PyInstaller.
         self._top_script_node = None
+        # Identifiers of the nodes added to the graph, see addNode().
+        self._added_nodes = None
+        # Identifiers of all nodes by their package prefixes.
+        self._name_index = ModuleNameIndex()
+        # Names importable from the directories searched for modules, listed
+        # once per build.
+        self._path_index = SearchPathIndex()
 
         # Absolute paths of all user-defined hook directories.
         self._user_hook_dirs = \
@@ -100,6 +196,11 @@ class PyiModuleGraph(ModuleGraph):
             os.path.join(self._homepath, 'PyInstaller', 'loader', 'rthooks.dat')
         )
 
+        # Started last, nothing above may fail leaving the workers running.
+        if jobs > 1:
+            logger.info('Scanning modules with %d worker processes', jobs)
+            self._scan_pool = multiprocessing.Pool(jobs)
+
     def _cache_hooks(self, hook_type):
         """
         Get a cache of all hooks of the passed type.
@@ -182,7 +283,8 @@ class PyiModuleGraph(ModuleGraph):
                 # Dynamically import this hook as a fabricated module.
                 logger.info('Processing pre-safe import module hook   %s', module_name)
                 hook_module_name = 'PyInstaller_hooks_pre_safe_import_module_' + module_name.replace('.', '_')
-                hook_module = importlib_load_source(hook_module_name, hook_file)
+                hook_module = load_hook_module(hook_module_name, hook_file,
+                                               self._code_cache)
 
                 # Object communicating changes made by this hook back to us.
                 hook_api = PreSafeImportModuleAPI(
@@ -217,7 +319,9 @@ class PyiModuleGraph(ModuleGraph):
         path hooks. If such a hook exists for this module (e.g., a script
         `PyInstaller.hooks.hook-{module_name}` containing a function
         `pre_find_module_path()`), that hook will be run _before_ the
-        superclass method is called.
+        superclass method is called. Only the directories which may contain
+        the module according to the listing of their entries are passed to
+        the superclass method.
 
         See superclass method for parameter and return value descriptions.
         """
@@ -228,7 +332,8 @@ class PyiModuleGraph(ModuleGraph):
                 # Dynamically import this hook as a fabricated module.
                 logger.info('Processing pre-find module path hook   %s', fullname)
                 hook_fullname = 'PyInstaller_hooks_pre_find_module_path_' + fullname.replace('.', '_')
-                hook_module = importlib_load_source(hook_fullname, hook_file)
+                hook_module = load_hook_module(hook_fullname, hook_file,
+                                               self._code_cache)
 
                 # Object communicating changes made by this hook back to us.
                 hook_api = PreFindModulePathAPI(
@@ -248,10 +353,244 @@ class PyiModuleGraph(ModuleGraph):
             # Prevent subsequent calls from rerunning these hooks.
             del self._hooks_pre_find_module_path[fullname]
 
+        # Skip the directories certainly not containing this module.
+        search_dirs = self._path_index.filter(search_dirs, module_name)
+
         # Call the superclass method.
         return super(PyiModuleGraph, self)._find_module_path(
             fullname, module_name, search_dirs)
 
+    def _load_module(self, fqname, fp, pathname, info):
+        """
+        Create a new graph node for the module with the passed name.
+
+        This method wraps the superclass method with support for the
+        persistent code cache and for parallel scanning. Reading, parsing,
+        compiling and scanning a source module is skipped if the cache
+        contains an entry for the unchanged source file or if a worker
+        process already scanned it. Only the recorded imports are then
+        processed, which adds exactly the same nodes and edges to the graph
+        in the same order as the superclass method does.
+
+        See the superclass method for description of parameters and
+        return value.
+        """
+        if ((self._code_cache is None and self._scan_pool is None)
+                or self.replace_paths or info[2] != imp.PY_SOURCE
+                # Modules inside zipped eggs have no file on disk.
+                or not os.path.isfile(pathname)):
+            return super(PyiModuleGraph, self)._load_module(
+                fqname, fp, pathname, info)
+
+        scanned = self._get_scanned_source(pathname)
+        if scanned is None:
+            # The superclass creates an InvalidSourceModule node.
+            return super(PyiModuleGraph, self)._load_module(
+                fqname, fp, pathname, info)
+
+        code, globalnames, imports = scanned
+        # For packages this returns the already existing Package node.
+        module = self.createNode(SourceModule, fqname)
+        module.filename = pathname
+        module.code = code
+        module._imported_modules = [
+            (have_star,
+             (name, module, None if fromlist is None else set(fromlist), level),
+             {} if attr is None else {'attr': DependencyInfo(*attr)})
+            for have_star, name, fromlist, level, attr in imports]
+        self._prefetch_imports(module)
+        # Like in ModuleGraph._scan_code() the global names have to be
+        # suspended while the imports are processed.
+        module.globalnames = set()
+        self._process_imports(module)
+        module.globalnames = set(globalnames)
+        return module
+
+    def _get_scanned_source(self, pathname):
+        """
+        Get the tuple `(code, globalnames, imports)` for the source file with
+        the passed path from the code cache, from a worker process or by
+        scanning the file in this process, or `None` for invalid sources.
+        """
+        if self._code_cache is not None:
+            cached = self._code_cache.get(pathname)
+            if cached is not None:
+                return cached
+        job = self._scan_jobs.pop(pathname, None)
+        if job is not None:
+            scanned = job.get()
+        else:
+            scanned = _scan_source(pathname)
+        if scanned is None:
+            return None
+        code, globalnames, imports = scanned
+        code = marshal.loads(code)
+        if self._code_cache is not None:
+            self._code_cache.put(pathname, code, globalnames, imports)
+        return code, globalnames, imports
+
+    def _prefetch_imports(self, module):
+        """
+        Submit the source files of the modules imported by the passed module
+        to the worker processes.
+
+        While the graph is extended in this process one import at a time, the
+        workers already read, compile and scan the modules which will be
+        needed next. The source files are only guessed by looking for
+        packages and `.py` files in the search path. A wrong guess costs some
+        wasted work but never changes the graph, as the scan results are
+        looked up by the path the import machinery actually found.
+        """
+        if self._scan_pool is None:
+            return
+        for _, (name, caller, fromlist, level), _ in module._imported_modules:
+            if level > 0:
+                # Relative import: resolve against the importing package.
+                if hasattr(caller, 'packagepath'):
+                    base = caller.identifier
+                else:
+                    base = caller.identifier.rpartition('.')[0]
+                for _ in range(level - 1):
+                    base = base.rpartition('.')[0]
+                if not base:
+                    continue
+                name = base + '.' + name if name else base
+            if not name:
+                continue
+            fullnames = [name]
+            if fromlist:
+                fullnames.extend(name + '.' + sub for sub in sorted(fromlist))
+            for fullname in fullnames:
+                pathname = self._guess_source_path(fullname)
+                if (pathname is None or pathname in self._scan_jobs
+                        or self.findNode(fullname) is not None
+                        or (self._code_cache is not None
+                            and pathname in self._code_cache)):
+                    continue
+                self._scan_jobs[pathname] = self._scan_pool.apply_async(
+                    _scan_source, (pathname,))
+
+    def _guess_source_path(self, fullname):
+        """
+        Guess the absolute path of the `.py` file of the module with the
+        passed fully-qualified name or return `None`.
+        """
+        try:
+            return self._scan_guesses[fullname]
+        except KeyError:
+            pass
+        parent, _, basename = fullname.rpartition('.')
+        if parent:
+            parent_node = self.findNode(parent)
+            if parent_node is not None:
+                search_dirs = getattr(parent_node, 'packagepath', None) or []
+            else:
+                parent_path = self._guess_source_path(parent)
+                if parent_path is not None and \
+                        os.path.basename(parent_path) == '__init__.py':
+                    search_dirs = [os.path.dirname(parent_path)]
+                else:
+                    search_dirs = []
+        else:
+            search_dirs = self.path
+        pathname = None
+        for search_dir in search_dirs:
+            candidate = os.path.join(search_dir, basename, '__init__.py')
+            if os.path.isfile(candidate):
+                pathname = candidate
+                break
+            candidate = os.path.join(search_dir, basename + '.py')
+            if os.path.isfile(candidate):
+                pathname = candidate
+                break
+        self._scan_guesses[fullname] = pathname
+        return pathname
+
+    def addNode(self, node):
+        """
+        Add the node to the graph and remember its identifier if tracking of
+        added nodes is enabled, see `track_added_nodes()`.
+        """
+        super(PyiModuleGraph, self).addNode(node)
+        self._name_index.add(node.identifier)
+        if self._added_nodes is not None:
+            self._added_nodes.append(node.identifier)
+
+    def removeNode(self, node):
+        """
+        Remove the node from the graph if it exists.
+        """
+        ident = self.getIdent(node)
+        super(PyiModuleGraph, self).removeNode(node)
+        if ident is not None:
+            self._name_index.remove(ident)
+
+    def subtree(self, name):
+        """
+        Return the list of the identifiers of the node `name`, if it is in
+        the graph, and of all nodes of submodules of the package `name`.
+
+        Unlike testing all nodes in the graph, this takes time proportional
+        to the number of the returned nodes only.
+        """
+        # Nodes hidden without removeNode(), e.g. by filterStack(), are
+        # still indexed.
+        return [ident for ident in self._name_index.subtree(name)
+                if ident in self.graph.nodes]
+
+    def base_library_names(self):
+        """
+        Return the set of the identifiers of all nodes of the modules
+        bundled into base_library.zip, see `PY3_BASE_MODULES`.
+        """
+        names = set()
+        for name in PY3_BASE_MODULES:
+            names.update(self.subtree(name))
+        return names
+
+    def track_added_nodes(self, enable):
+        """
+        Enable or disable tracking of the nodes added to the graph.
+        """
+        self._added_nodes = [] if enable else None
+
+    def pop_added_nodes(self):
+        """
+        Return the list of the identifiers of the nodes added since the last
+        call and forget them. Nodes are tracked only while enabled by
+        `track_added_nodes()`.
+        """
+        added = self._added_nodes or []
+        if self._added_nodes is not None:
+            self._added_nodes = []
+        return added
+
+    @property
+    def code_cache(self):
+        """
+        Persistent cache of compiled code or None, see `ModuleCodeCache`.
+        """
+        return self._code_cache
+
+    def save_code_cache(self):
+        """
+        Write the persistent code cache to disk, if enabled.
+        """
+        if self._code_cache is not None:
+            self._code_cache.save()
+
+    def stop_scan_workers(self):
+        """
+        Terminate the worker processes used for parallel scanning, if any.
+
+        The graph stays usable afterwards, modules are scanned serially then.
+        """
+        if self._scan_pool is not None:
+            self._scan_pool.terminate()
+            self._scan_pool.join()
+            self._scan_pool = None
+            self._scan_jobs = {}
+
     def get_code_objects(self):
         """
         Get code objects from ModuleGraph for pure Pyhton modules. This allows
@@ -286,10 +625,9 @@ class PyiModuleGraph(ModuleGraph):
         We use the ModuleGraph (really, ObjectGraph) flatten() method to
         scan all the nodes. This is patterned after ModuleGraph.report().
         """
-        # Construct regular expression for matching modules that should be
-        # excluded because they are bundled in base_library.zip.
-        regex_str = '|'.join(['(%s.*)' % x for x in PY3_BASE_MODULES])
-        module_filter = re.compile(regex_str)
+        # Modules that should be excluded because they are bundled in
+        # base_library.zip.
+        base_library_names = set() if is_py2 else self.base_library_names()
 
         result = existing_TOC or TOC()
         for node in self.flatten(start=self._top_script_node):
@@ -299,7 +637,7 @@ class PyiModuleGraph(ModuleGraph):
             # "NoneType", for the curious.) Remove this, please.
 
             # Skip modules that are in base_library.zip.
-            if not is_py2 and module_filter.match(node.identifier):
+            if node.identifier in base_library_names:
                 continue
 
             # get node type e.g. Script
@@ -491,7 +829,7 @@ class PyiModuleGraph(ModuleGraph):
 # TODO: A little odd. Couldn't we just push this functionality into the
 # PyiModuleGraph.__init__() constructor and then construct PyiModuleGraph
 # objects directly?
-def initialize_modgraph(excludes=(), user_hook_dirs=None):
+def initialize_modgraph(excludes=(), user_hook_dirs=None, jobs=1):
     """
     Create the module graph and, for Python 3, analyze dependencies for
     `base_library.zip` (which remain the same for every executable).
@@ -505,6 +843,10 @@ def initialize_modgraph(excludes=(), user_hook_dirs=None):
         List of the absolute paths of all directories containing user-defined
         hooks for the current application or `None` if no such directories were
         specified.
+    jobs : int
+        Number of worker processes scanning source modules in parallel. With
+        1 all modules are scanned in this process. The resulting graph is the
+        same in either case.
 
     Returns
     ----------
@@ -528,6 +870,17 @@ def initialize_modgraph(excludes=(), user_hook_dirs=None):
     except ValueError:
         debug = 0
 
+    # Persistent cache of scanned source modules. Keep a separate cache
+    # per Python version and architecture, like the bincache does. The cache
+    # lives in CONF['cachedir'], so option --clean discards it.
+    from ..config import CONF
+    code_cache = None
+    if CONF.get('cachedir'):
+        pyver = 'py%d%s' % (sys.version_info[0], sys.version_info[1])
+        arch = platform.architecture()[0]
+        code_cache = ModuleCodeCache(os.path.join(
+            CONF['cachedir'], 'modcache_%s_%s.dat' % (pyver, arch)))
+
     # Construct the initial module graph by analyzing all import statements.
     graph = PyiModuleGraph(
         HOMEPATH,
@@ -536,6 +889,8 @@ def initialize_modgraph(excludes=(), user_hook_dirs=None):
         implies=get_implies(),
         debug=debug,
         user_hook_dirs=user_hook_dirs,
+        code_cache=code_cache,
+        jobs=jobs,
     )
 
     if not is_py2:
@@ -548,8 +903,12 @@ def initialize_modgraph(excludes=(), user_hook_dirs=None):
             else:
                 required_mods.append(m)
         # Initialize ModuleGraph.
-        for m in required_mods:
-            graph.import_hook(m)
+        try:
+            for m in required_mods:
+                graph.import_hook(m)
+        except:
+            graph.stop_scan_workers()
+            raise
     return graph
 
 
@@ -567,7 +926,8 @@ def get_bootstrap_modules():
     # built-in modules (linked statically) and thus does not have attribute __file__.
     # 'struct' module is required for reading Python bytecode from executable.
     # 'zlib' is required to decompress this bytecode.
-    for mod_name in ['_struct', 'zlib']:
+    # 'mmap' is optional and used to read the bytecode without system calls.
+    for mod_name in ['_struct', 'zlib', 'mmap']:
         mod = __import__(mod_name)  # C extension.
         if hasattr(mod, '__file__'):
             loader_mods.append((mod_name, os.path.abspath(mod.__file__), 'EXTENSION'))
@@ -21,10 +21,11 @@ from glob import glob
 # Required for extracting eggs.
 import zipfile
 import collections
+from multiprocessing.pool import ThreadPool
 
 from PyInstaller.compat import is_win, is_unix, is_aix, is_solar, is_cygwin, is_darwin, is_freebsd
-from PyInstaller.compat import is_venv, base_prefix, PYDYLIB_NAMES
-from PyInstaller.depend import dylib
+from PyInstaller.compat import is_linux, is_venv, base_prefix, PYDYLIB_NAMES
+from PyInstaller.depend import dylib, elf
 import PyInstaller.compat as compat
 
 
@@ -33,7 +34,10 @@ from PyInstaller.utils.win32 import winutils
 
 logger = logging.getLogger(__name__)
 
-seen = set()
+# How to find the dependencies of ELF binaries on Linux: 'elf' reads the
+# binaries and /etc/ld.so.cache directly, 'ldd' runs ldd for every binary.
+# Binaries the ELF reader cannot handle are always passed to ldd.
+ELF_BACKEND = compat.getenv('PYINSTALLER_ELF_BACKEND', 'elf')
 
 # Import windows specific stuff.
 if is_win:
@@ -188,7 +192,8 @@ def matchDLLArch(filename):
 
     return pe.FILE_HEADER.Machine == _exe_machine_type
 
-def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None):
+def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None,
+                 seen=None, jobs=None, cache=None):
     """
     Expand LTOC to include all the closure of binary dependencies.
 
@@ -202,24 +207,74 @@ def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None):
     `redirects` may be a list. Any assembly redirects found via policy files will
     be added to the list as BindingRedirect objects so they can later be used
     to modify any manifests that reference the redirected assembly.
+
+    `seen` may be a set of the upper-cased names and paths of the binaries
+    already analyzed, to share it between calls expanding the same TOC. It is
+    updated in place. By default each call starts with an empty set.
+
+    `jobs` is the number of threads reading the headers of the binaries,
+    defaults to the value of option --jobs. The result does not depend on it.
+
+    `cache` may be a depcache.BinaryDependencyCache created for
+    getImportsBackend(). The dependencies of binaries found in it are not
+    read again.
     """
     # Extract all necessary binary modules from Python eggs to be included
     # directly with PyInstaller.
     lTOC = _extract_from_egg(lTOC)
-
-    for nm, pth, typ in lTOC:
-        if nm.upper() in seen:
-            continue
-        logger.debug("Analyzing %s", pth)
-        seen.add(nm.upper())
-        if is_win:
-            for ftocnm, fn in getAssemblyFiles(pth, manifest, redirects):
-                lTOC.append((ftocnm, fn, 'BINARY'))
-        for lib, npth in selectImports(pth, xtrapath):
-            if lib.upper() in seen or npth.upper() in seen:
-                continue
-            seen.add(npth.upper())
-            lTOC.append((lib, npth, 'BINARY'))
+    if seen is None:
+        seen = set()
+    if jobs is None:
+        from ..config import CONF
+        jobs = CONF.get('jobs', 1)
+
+    pool = ThreadPool(jobs) if jobs > 1 else None
+    try:
+        # The closure is expanded one generation at a time. The binaries of a
+        # generation are independent of each other, so the headers of those
+        # not found in the cache are read by the pool at once. The results
+        # are then merged in the order of the TOC, exactly as if the
+        # binaries were analyzed one by one.
+        start = 0
+        while start < len(lTOC):
+            end = len(lTOC)
+            imports = {}
+            missing = []
+            for nm, pth, typ in lTOC[start:end]:
+                if nm.upper() in seen or pth in imports:
+                    continue
+                imports[pth] = None if cache is None else cache.get(pth)
+                if imports[pth] is None:
+                    missing.append(pth)
+            if pool is not None:
+                for pth, dlls in zip(missing, pool.map(getImports, missing)):
+                    imports[pth] = dlls
+                    if cache is not None:
+                        cache.put(pth, dlls)
+            for nm, pth, typ in lTOC[start:end]:
+                if nm.upper() in seen:
+                    continue
+                logger.debug("Analyzing %s", pth)
+                seen.add(nm.upper())
+                if is_win:
+                    for ftocnm, fn in getAssemblyFiles(pth, manifest,
+                                                       redirects, seen):
+                        lTOC.append((ftocnm, fn, 'BINARY'))
+                dlls = imports[pth]
+                if dlls is None:
+                    dlls = imports[pth] = getImports(pth)
+                    if cache is not None:
+                        cache.put(pth, dlls)
+                for lib, npth in _selectImports(pth, dlls, xtrapath, seen):
+                    if lib.upper() in seen or npth.upper() in seen:
+                        continue
+                    seen.add(npth.upper())
+                    lTOC.append((lib, npth, 'BINARY'))
+            start = end
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
 
     return lTOC
 
@@ -373,7 +428,7 @@ def getAssemblies(pth):
     return rv
 
 
-def getAssemblyFiles(pth, manifest=None, redirects=None):
+def getAssemblyFiles(pth, manifest=None, redirects=None, seen=None):
     """
     Find all assemblies that are dependencies of the given binary and return the files
     that make up the assemblies as (name, fullpath) tuples.
@@ -386,8 +441,13 @@ def getAssemblyFiles(pth, manifest=None, redirects=None):
     applied when searching for assemblies, BindingRedirect objects are appended to this
     list.
 
+    If a set is passed as `seen`, assemblies and files in it are skipped and
+    the returned ones are added to it.
+
     Return a list of pairs (name, fullpath)
     """
+    if seen is None:
+        seen = set()
     rv = []
     if manifest:
         _depNames = set(dep.name for dep in manifest.dependentAssemblies)
@@ -476,19 +536,31 @@ def getAssemblyFiles(pth, manifest=None, redirects=None):
     return rv
 
 
-def selectImports(pth, xtrapath=None):
+def selectImports(pth, xtrapath=None, seen=None):
     """
     Return the dependencies of a binary that should be included.
 
+    Dependencies whose upper-cased name or path is in the set `seen` are
+    skipped.
+
     Return a list of pairs (name, fullpath)
     """
+    if seen is None:
+        seen = set()
+    return _selectImports(pth, getImports(pth), xtrapath, seen)
+
+
+def _selectImports(pth, dlls, xtrapath, seen):
+    """
+    Select the dependencies to include from `dlls`, the result of
+    getImports(pth).
+    """
     rv = []
     if xtrapath is None:
         xtrapath = [os.path.dirname(pth)]
     else:
         assert isinstance(xtrapath, list)
         xtrapath = [os.path.dirname(pth)] + xtrapath  # make a copy
-    dlls = getImports(pth)
     for lib in dlls:
         if lib.upper() in seen:
             continue
@@ -587,6 +659,20 @@ def _getImports_ldd(pth):
     return rslt
 
 
+def _getImports_elf(pth):
+    """
+    Find the binary dependencies of PTH.
+
+    This implementation is for Linux and reads the ELF files in-process, see
+    PyInstaller.depend.elf. Fall back to ldd for files it cannot read.
+    """
+    try:
+        return elf.get_imports(pth)
+    except elf.ELFError as e:
+        logger.debug('%s, using ldd', e)
+        return _getImports_ldd(pth)
+
+
 def _getImports_macholib(pth):
     """
     Find the binary dependencies of PTH.
@@ -686,6 +772,20 @@ def _getImports_macholib(pth):
     return rslt
 
 
+def getImportsBackend():
+    """
+    Return the name of the getImports implementation for the platform.
+    """
+    if is_win or is_cygwin:
+        return 'pe'
+    elif is_darwin:
+        return 'macholib'
+    elif is_linux and ELF_BACKEND == 'elf':
+        return 'elf'
+    else:
+        return 'ldd'
+
+
 def getImports(pth):
     """
     Forwards to the correct getImports implementation for the platform.
@@ -705,6 +805,8 @@ def getImports(pth):
             return []
     elif is_darwin:
         return _getImports_macholib(pth)
+    elif is_linux and ELF_BACKEND == 'elf':
+        return _getImports_elf(pth)
     else:
         return _getImports_ldd(pth)
 
@@ -738,6 +840,9 @@ def findLibrary(name):
     # TODO Look for ldconfig in /usr/sbin/ldconfig. /sbin is deprecated
     #      in recent linux distributions.
     # Solaris does not have /sbin/ldconfig. Just check if this file exists.
+    if lib is None and is_linux and ELF_BACKEND == 'elf':
+        lib = elf.find_library(name)
+
     if lib is None and os.path.exists('/sbin/ldconfig'):
         expr = r'/[^\(\)\s]*%s\.[^\(\)\s]*' % re.escape(name)
         if is_freebsd:
@@ -810,6 +915,13 @@ def _get_so_name(filename):
 
     Soname is usefull whene there are multiple symplinks to one library.
     """
+    if is_linux and ELF_BACKEND == 'elf':
+        try:
+            soname = elf.get_soname(filename)
+            if soname:
+                return soname
+        except elf.ELFError:
+            pass
     # TODO verify that objdump works on other unixes and not Linux only.
     cmd = ["objdump", "-p", filename]
     m = re.search(r'\s+SONAME\s+([^\s]+)', compat.exec_command(*cmd))
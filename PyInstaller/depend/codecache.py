@@ -0,0 +1,121 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Persistent cache of the work ModuleGraph does for pure Python modules.
+
+For every source module ModuleGraph reads the file, parses it into an AST,
+compiles it and scans the result for import statements. All of this depends
+only on the content of the file and on the running interpreter, so the
+outcome is stored on disk and reused by the next build as long as the file
+was not modified.
+"""
+
+import marshal
+import sys
+
+from .. import log as logging
+from ..compat import BYTECODE_MAGIC
+from ..utils.misc import atomic_write, file_stamp
+
+logger = logging.getLogger(__name__)
+
+
+# Increment when the layout or the content of the cache entries changes,
+# e.g. the order of the names in the fromlists of the imports.
+CACHE_VERSION = 2
+
+
+class ModuleCodeCache(object):
+    """
+    On-disk cache mapping the absolute path of a Python source file to the
+    compiled code object and the imports found in that file.
+
+    An entry is valid only when the size and the modification time of the
+    file did not change since the entry was created. The whole cache is
+    discarded if it was written by a different Python interpreter (magic
+    number of the bytecode) or with different optimization flags.
+
+    Every entry is a tuple
+
+        (size, mtime, code, globalnames, imports)
+
+    where `globalnames` is a tuple of the global names the module assigns to
+    and `imports` is a tuple of `(have_star, name, fromlist, level, attr)`
+    tuples as collected by `ModuleGraph._scan_code()`.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._entries = {}
+        self._modified = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _header(self):
+        return (CACHE_VERSION, sys.flags.optimize)
+
+    def _load(self):
+        try:
+            with open(self.filename, 'rb') as fp:
+                if fp.read(len(BYTECODE_MAGIC)) != BYTECODE_MAGIC:
+                    logger.debug('Ignoring module cache %s written by a '
+                                 'different Python', self.filename)
+                    return
+                header, entries = marshal.load(fp)
+        except (IOError, OSError):
+            # No cache yet.
+            return
+        except (EOFError, ValueError, TypeError):
+            logger.warn('Ignoring corrupted module cache %s', self.filename)
+            return
+        if tuple(header) == self._header():
+            self._entries = entries
+
+    def __contains__(self, filename):
+        entry = self._entries.get(filename)
+        return entry is not None and entry[:2] == file_stamp(filename)
+
+    def get(self, filename):
+        """
+        Return the tuple (code, globalnames, imports) cached for the source
+        file or None if there is no valid entry.
+        """
+        entry = self._entries.get(filename)
+        if entry is not None and entry[:2] == file_stamp(filename):
+            self.hits += 1
+            return entry[2:]
+        self.misses += 1
+        return None
+
+    def put(self, filename, code, globalnames, imports):
+        """
+        Store the results of scanning the source file.
+        """
+        stamp = file_stamp(filename)
+        if stamp is None:
+            return
+        self._entries[filename] = stamp + (code, tuple(globalnames),
+                                           tuple(imports))
+        self._modified = True
+
+    def save(self):
+        """
+        Write the cache back to disk if anything changed.
+        """
+        logger.info('Module cache: %d hits, %d misses',
+                    self.hits, self.misses)
+        if not self._modified:
+            return
+        def dump(fp):
+            fp.write(BYTECODE_MAGIC)
+            marshal.dump((self._header(), self._entries), fp)
+        atomic_write(self.filename, dump)
+        self._modified = False
@@ -0,0 +1,130 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Persistent cache of the binary dependencies found by bindepend.
+
+Reading the headers of every binary (or running ldd for it) is the slowest
+part of an Analysis that only needs to redo its pure Python work. What
+getImports() returns for a binary depends on the binary, on the libraries it
+resolves to and on the library search environment, so the result is stored
+on disk and reused as long as none of these changed.
+"""
+
+import marshal
+import os
+
+from .. import log as logging
+from ..compat import is_win
+from ..utils.misc import atomic_write, file_stamp
+
+logger = logging.getLogger(__name__)
+
+
+# Increment when the layout of the cache entries changes.
+CACHE_VERSION = 1
+
+# Environment variables changing where libraries are found.
+SEARCH_ENV_VARS = ('LD_LIBRARY_PATH', 'LIBPATH', 'DYLD_LIBRARY_PATH',
+                   'DYLD_FALLBACK_LIBRARY_PATH', 'PATH')
+
+# Files of the dynamic loader changing where libraries are found.
+SEARCH_FILES = ('/etc/ld.so.cache',)
+
+
+class BinaryDependencyCache(object):
+    """
+    On-disk cache mapping the absolute path of a binary to the list of its
+    dependencies as returned by getImports().
+
+    Every entry is a tuple
+
+        (size, mtime, imports, stamps)
+
+    where `imports` is the tuple of dependencies and `stamps` holds the
+    (path, size, mtime) of every dependency that is a file. An entry is
+    valid only when neither the binary nor any of these files changed.
+
+    The whole cache is discarded if it was written for a different
+    `backend` (the getImports() implementation) or a different library
+    search environment, i.e. when one of SEARCH_ENV_VARS or SEARCH_FILES
+    changed.
+    """
+    def __init__(self, filename, backend):
+        self.filename = filename
+        self.backend = backend
+        self._entries = {}
+        self._modified = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _header(self):
+        env = tuple(os.environ.get(name, '') for name in SEARCH_ENV_VARS)
+        files = () if is_win else tuple(file_stamp(f) for f in SEARCH_FILES)
+        return (CACHE_VERSION, self.backend, env, files)
+
+    def _load(self):
+        try:
+            with open(self.filename, 'rb') as fp:
+                header, entries = marshal.load(fp)
+        except (IOError, OSError):
+            # No cache yet.
+            return
+        except (EOFError, ValueError, TypeError):
+            logger.warn('Ignoring corrupted dependency cache %s',
+                        self.filename)
+            return
+        if tuple(header) == self._header():
+            self._entries = entries
+        else:
+            logger.debug('Ignoring dependency cache %s written for a '
+                         'different library search path', self.filename)
+
+    def get(self, filename):
+        """
+        Return the list of dependencies cached for the binary or None if
+        there is no valid entry.
+        """
+        entry = self._entries.get(filename)
+        if (entry is not None and entry[:2] == file_stamp(filename) and
+                all(file_stamp(lib) == tuple(stamp)
+                    for lib, stamp in entry[3])):
+            self.hits += 1
+            return list(entry[2])
+        self.misses += 1
+        return None
+
+    def put(self, filename, imports):
+        """
+        Store the dependencies of the binary.
+        """
+        stamp = file_stamp(filename)
+        if stamp is None:
+            return
+        stamps = []
+        for lib in imports:
+            lib_stamp = file_stamp(lib) if os.path.isabs(lib) else None
+            if lib_stamp is not None:
+                stamps.append((lib, lib_stamp))
+        self._entries[filename] = stamp + (tuple(imports), tuple(stamps))
+        self._modified = True
+
+    def save(self):
+        """
+        Write the cache back to disk if anything changed.
+        """
+        logger.info('Binary dependency cache: %d hits, %d misses',
+                    self.hits, self.misses)
+        if not self._modified:
+            return
+        data = (self._header(), self._entries)
+        atomic_write(self.filename, lambda fp: marshal.dump(data, fp))
+        self._modified = False
@@ -0,0 +1,408 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Find the shared libraries an ELF binary depends on without running `ldd`.
+
+Running `ldd` for every binary costs a fork and an exec and it may even run
+code of the binary. Instead the dynamic section of the binary is read
+directly and the libraries are looked up the way the glibc dynamic loader
+does:
+
+1. DT_RPATH of the object and of the objects that loaded it (only if the
+   object has no DT_RUNPATH),
+2. LD_LIBRARY_PATH,
+3. DT_RUNPATH of the object,
+4. /etc/ld.so.cache and
+5. the default library directories.
+
+A library is used only if it matches the ELF class and the machine of the
+binary, so e.g. 32-bit libraries are skipped for 64-bit binaries.
+"""
+
+import os
+import platform
+import re
+import struct
+import sys
+import sysconfig
+from collections import deque
+
+from .. import log as logging
+from ..utils.misc import file_stamp
+
+logger = logging.getLogger(__name__)
+
+
+class ELFError(Exception):
+    pass
+
+
+# Program header types.
+PT_LOAD = 1
+PT_DYNAMIC = 2
+
+# Dynamic section tags.
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+DT_FLAGS_1 = 0x6ffffffb
+DF_1_NODEFLIB = 0x800
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+
+# The dynamic loader itself is listed as a dependency of libc but `ldd` does
+# not report it as a library.
+_DYNAMIC_LOADER = re.compile(r'ld[-.\w]*\.so(\.|$)')
+
+
+def _decode(name):
+    if str is bytes:
+        return name
+    return name.decode(sys.getfilesystemencoding(), 'surrogateescape')
+
+
+class ELFFile(object):
+    """
+    The parts of an ELF file relevant for the dynamic loader.
+
+    Attributes are `elfclass` and `machine` of the file, the names of the
+    libraries in `needed`, the `soname`, the lists of directories in `rpath`
+    and `runpath` (not expanded yet) and `nodeflib`, which is True if the
+    default library directories must not be searched.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.needed = []
+        self.soname = None
+        self.rpath = []
+        self.runpath = []
+        self.nodeflib = False
+        try:
+            with open(path, 'rb') as fp:
+                self._read(fp)
+        except (IOError, OSError) as e:
+            raise ELFError('Cannot read %s: %s' % (path, e))
+        except struct.error:
+            raise ELFError('%s is a truncated ELF file' % path)
+
+    def _read(self, fp):
+        ident = fp.read(16)
+        if len(ident) < 16 or ident[:4] != b'\x7fELF':
+            raise ELFError('%s is not an ELF file' % self.path)
+        self.elfclass = ord(ident[4:5])
+        byteorder = {1: '<', 2: '>'}.get(ord(ident[5:6]))
+        if self.elfclass not in (ELFCLASS32, ELFCLASS64) or byteorder is None:
+            raise ELFError('%s has an unknown ELF class' % self.path)
+        if self.elfclass == ELFCLASS32:
+            header = byteorder + 'HHIIIIIHHHHHH'
+            phdr = byteorder + 'IIIIIIII'
+            dyn = byteorder + 'iI'
+        else:
+            header = byteorder + 'HHIQQQIHHHHHH'
+            phdr = byteorder + 'IIQQQQQQ'
+            dyn = byteorder + 'qQ'
+        (e_type, self.machine, e_version, e_entry, e_phoff, e_shoff, e_flags,
+         e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum,
+         e_shstrndx) = struct.unpack(header, fp.read(struct.calcsize(header)))
+
+        # Segments as tuples (type, offset, vaddr, filesz).
+        segments = []
+        for i in range(e_phnum):
+            fp.seek(e_phoff + i * e_phentsize)
+            fields = struct.unpack(phdr, fp.read(struct.calcsize(phdr)))
+            if self.elfclass == ELFCLASS32:
+                (p_type, p_offset, p_vaddr, _, p_filesz) = fields[:5]
+            else:
+                (p_type, _, p_offset, p_vaddr, _, p_filesz) = fields[:6]
+            segments.append((p_type, p_offset, p_vaddr, p_filesz))
+
+        dynamic = [seg for seg in segments if seg[0] == PT_DYNAMIC]
+        if not dynamic:
+            # A static binary.
+            return
+        (_, offset, _, size) = dynamic[0]
+        fp.seek(offset)
+        data = fp.read(size)
+        entries = []
+        entrysize = struct.calcsize(dyn)
+        for pos in range(0, len(data) - entrysize + 1, entrysize):
+            (tag, value) = struct.unpack(dyn, data[pos:pos + entrysize])
+            if tag == DT_NULL:
+                break
+            entries.append((tag, value))
+        tags = dict(entries)
+        if DT_STRTAB not in tags:
+            raise ELFError('%s has no dynamic string table' % self.path)
+
+        # The string table is given as virtual address.
+        strtab = None
+        for (p_type, p_offset, p_vaddr, p_filesz) in segments:
+            if p_type == PT_LOAD and \
+                    p_vaddr <= tags[DT_STRTAB] < p_vaddr + p_filesz:
+                strtab = tags[DT_STRTAB] - p_vaddr + p_offset
+                break
+        if strtab is None:
+            raise ELFError('%s has an invalid string table' % self.path)
+        fp.seek(strtab)
+        strings = fp.read(tags.get(DT_STRSZ, 0))
+
+        def string(offset):
+            end = strings.find(b'\0', offset)
+            return _decode(strings[offset:end if end >= 0 else None])
+
+        for (tag, value) in entries:
+            if tag == DT_NEEDED:
+                self.needed.append(string(value))
+            elif tag == DT_SONAME:
+                self.soname = string(value)
+            elif tag == DT_RPATH:
+                self.rpath.extend(string(value).split(':'))
+            elif tag == DT_RUNPATH:
+                self.runpath.extend(string(value).split(':'))
+            elif tag == DT_FLAGS_1:
+                self.nodeflib = bool(value & DF_1_NODEFLIB)
+        # DT_RPATH is ignored if there is DT_RUNPATH.
+        if self.runpath:
+            self.rpath = []
+
+    def matches(self, other):
+        """
+        Return True if the dynamic loader would load this file as a
+        dependency of the ELF file `other`.
+        """
+        return self.elfclass == other.elfclass and \
+            self.machine == other.machine
+
+
+# Tuples (stamp, ELFFile or None) of the parsed ELF files by path. Many
+# binaries depend on the same libraries. The stamp of the file is checked
+# on every use, the cache outlives a build in the same process.
+_elf_files = {}
+
+
+def _get_elf_file(path):
+    """
+    Return the ELFFile of the path or None if it is not a readable ELF file.
+    """
+    stamp = file_stamp(path)
+    entry = _elf_files.get(path)
+    if entry is None or entry[0] != stamp:
+        try:
+            elf = ELFFile(path)
+        except ELFError:
+            elf = None
+        entry = _elf_files[path] = (stamp, elf)
+    return entry[1]
+
+
+def read_ld_so_cache(path='/etc/ld.so.cache'):
+    """
+    Return the list of the tuples (soname, path) in the cache of the dynamic
+    loader in the order the loader searches them. Libraries optimized for
+    certain CPU features (hwcaps) are omitted, the frozen app may run on
+    another CPU.
+
+    Both the old format 'ld.so-1.7.0' and the new format 'glibc-ld.so.cache'
+    are supported. Return an empty list if the cache cannot be read.
+    """
+    try:
+        with open(path, 'rb') as fp:
+            data = fp.read()
+    except (IOError, OSError):
+        return []
+
+    old_magic = b'ld.so-1.7.0'
+    new_magic = b'glibc-ld.so.cache1.1'
+    new_start = None
+    if data.startswith(old_magic):
+        (nlibs,) = struct.unpack_from('=I', data, 12)
+        old_entries_end = 16 + nlibs * 12
+        # A new format cache may follow the old one, aligned to the entries.
+        for align in (8, 4):
+            start = (old_entries_end + align - 1) & ~(align - 1)
+            if data[start:start + len(new_magic)] == new_magic:
+                new_start = start
+                break
+        if new_start is None:
+            # Offsets are relative to the string table after the entries.
+            return _read_entries(data, 16, nlibs, '=iII', old_entries_end)
+    elif data.startswith(new_magic):
+        new_start = 0
+    else:
+        return []
+    (nlibs,) = struct.unpack_from('=I', data, new_start + 20)
+    # Offsets are relative to the start of the new format header.
+    return _read_entries(data, new_start + 48, nlibs, '=iIIIQ', new_start)
+
+
+def _read_entries(data, start, nlibs, entry_format, strings_start):
+    entrysize = struct.calcsize(entry_format)
+    rslt = []
+
+    def string(offset):
+        offset += strings_start
+        return _decode(data[offset:data.index(b'\0', offset)])
+
+    try:
+        for i in range(nlibs):
+            entry = struct.unpack_from(entry_format, data, start + i * entrysize)
+            # Skip entries in glibc-hwcaps subdirectories.
+            if len(entry) > 4 and entry[4]:
+                continue
+            rslt.append((string(entry[1]), string(entry[2])))
+    except (struct.error, ValueError):
+        logger.warning('Dynamic loader cache is corrupted')
+    return rslt
+
+
+# Tuple (stamp, dictionary) of the last read /etc/ld.so.cache.
+_ld_so_cache = (None, None)
+
+
+def get_ld_so_cache(path='/etc/ld.so.cache'):
+    """
+    Return a dictionary mapping every soname in the cache of the dynamic
+    loader to the list of paths of the libraries with that soname. The
+    cache is read again when it changed.
+    """
+    global _ld_so_cache
+    stamp = file_stamp(path)
+    if _ld_so_cache[1] is None or _ld_so_cache[0] != stamp:
+        libs = {}
+        for soname, libpath in read_ld_so_cache(path):
+            libs.setdefault(soname, []).append(libpath)
+        _ld_so_cache = (stamp, libs)
+    return _ld_so_cache[1]
+
+
+def _default_dirs(elf):
+    """
+    Return the default library directories of the dynamic loader.
+    """
+    dirs = []
+    multiarch = sysconfig.get_config_var('MULTIARCH')
+    if multiarch:
+        # Debian and derivatives.
+        dirs.extend(['/lib/' + multiarch, '/usr/lib/' + multiarch])
+    if elf.elfclass == ELFCLASS64:
+        dirs.extend(['/lib64', '/usr/lib64'])
+    dirs.extend(['/lib', '/usr/lib'])
+    return dirs
+
+
+def _expand(directory, obj):
+    """
+    Expand the dynamic string tokens in a directory of DT_RPATH or
+    DT_RUNPATH of the ELF file `obj`.
+    """
+    origin = os.path.dirname(os.path.abspath(obj.path))
+    lib = 'lib64' if obj.elfclass == ELFCLASS64 else 'lib'
+    for token, value in (('ORIGIN', origin), ('LIB', lib),
+                         ('PLATFORM', platform.machine())):
+        directory = directory.replace('${%s}' % token, value)
+        directory = directory.replace('$%s' % token, value)
+    return directory
+
+
+def _find(name, obj, loaders, root):
+    """
+    Return the path of the library `name` needed by the ELF file `obj`,
+    loaded by the list of ELF files `loaders`, or None if it is not found.
+    """
+    def candidates():
+        if '/' in name:
+            yield _expand(name, obj)
+            return
+        # DT_RPATH of the object and its loaders, the closest first.
+        if not obj.runpath:
+            for loader in [obj] + loaders[::-1]:
+                for directory in loader.rpath:
+                    if directory:
+                        yield os.path.join(_expand(directory, loader), name)
+        for directory in os.environ.get('LD_LIBRARY_PATH', '').split(':'):
+            if directory:
+                yield os.path.join(directory, name)
+        for directory in obj.runpath:
+            if directory:
+                yield os.path.join(_expand(directory, obj), name)
+        if obj.nodeflib:
+            return
+        for path in get_ld_so_cache().get(name, []):
+            yield path
+        for directory in _default_dirs(root):
+            yield os.path.join(directory, name)
+
+    for path in candidates():
+        lib = _get_elf_file(os.path.normpath(path))
+        if lib is not None and lib.matches(root):
+            return lib
+    return None
+
+
+def get_imports(path):
+    """
+    Return the set of paths of all shared libraries the dynamic loader
+    loads for the ELF file at `path`, directly or indirectly, like `ldd`.
+
+    Raise ELFError if the file is not an ELF file.
+    """
+    root = ELFFile(path)
+    rslt = set()
+    # Libraries already loaded, by the name they were requested with and by
+    # their soname.
+    loaded = set()
+    # Breadth-first like the dynamic loader; items are (object, loaders).
+    pending = deque([(root, [])])
+    while pending:
+        obj, loaders = pending.popleft()
+        for name in obj.needed:
+            if name in loaded or _DYNAMIC_LOADER.match(name):
+                continue
+            loaded.add(name)
+            lib = _find(name, obj, loaders, root)
+            if lib is None:
+                logger.warning('Can not find %s (needed by %s)', name, obj.path)
+                continue
+            if lib.soname:
+                loaded.add(lib.soname)
+            if lib.path not in rslt:
+                rslt.add(lib.path)
+                pending.append((lib, loaders + [obj]))
+    return rslt
+
+
+def find_library(name, like=None):
+    """
+    Return the path of the first library in /etc/ld.so.cache whose file name
+    starts with `name` followed by a dot, e.g. 'libpython2.7.so' matches
+    'libpython2.7.so.1.0'. Only libraries matching the ELF file `like`
+    (default: the running Python interpreter) are considered.
+    """
+    if like is None:
+        like = _get_elf_file(os.path.realpath(sys.executable))
+    for soname, path in read_ld_so_cache():
+        if os.path.basename(path).startswith(name + '.'):
+            lib = _get_elf_file(path)
+            if lib is not None and (like is None or lib.matches(like)):
+                return path
+    return None
+
+
+def get_soname(path):
+    """
+    Return the soname of the shared library or None if it has none.
+    """
+    return ELFFile(path).soname
@@ -0,0 +1,99 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Index of dotted module names by their package prefixes.
+
+Finding all submodules of a package by testing every node of a module graph
+takes time proportional to the size of the graph, for every package. The
+index is a tree with one level per component of the dotted names, so the
+submodules of a package are found by walking only its branch.
+"""
+
+
+class ModuleNameIndex(object):
+    """
+    Set of dotted module names supporting the query for all names in a
+    package, see `subtree()`.
+
+    Every level of the tree is a dict mapping the next component of the names
+    to the dict of the level below. The key None marks a name ending on that
+    level.
+    """
+    def __init__(self, names=()):
+        self._root = {}
+        self._size = 0
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return self._size
+
+    def _branch(self, name):
+        branch = self._root
+        for part in name.split('.'):
+            branch = branch.get(part)
+            if branch is None:
+                return None
+        return branch
+
+    def __contains__(self, name):
+        branch = self._branch(name)
+        return branch is not None and None in branch
+
+    def add(self, name):
+        """
+        Add the name to the index.
+        """
+        branch = self._root
+        for part in name.split('.'):
+            branch = branch.setdefault(part, {})
+        if None not in branch:
+            branch[None] = True
+            self._size += 1
+
+    def remove(self, name):
+        """
+        Remove the name from the index if present.
+        """
+        path = [self._root]
+        parts = name.split('.')
+        for part in parts:
+            branch = path[-1].get(part)
+            if branch is None:
+                return
+            path.append(branch)
+        if path[-1].pop(None, None) is None:
+            return
+        self._size -= 1
+        # Drop the branches left empty.
+        for part in reversed(parts):
+            if path.pop():
+                break
+            del path[-1][part]
+
+    def subtree(self, name):
+        """
+        Return the list of the name, if present, and of all names in the
+        package `name`, i.e. starting with `name` followed by a dot.
+        """
+        result = []
+        branch = self._branch(name)
+        if branch is None:
+            return result
+        stack = [(name, branch)]
+        while stack:
+            prefix, branch = stack.pop()
+            for part, child in branch.items():
+                if part is None:
+                    result.append(prefix)
+                else:
+                    stack.append((prefix + '.' + part, child))
+        return result
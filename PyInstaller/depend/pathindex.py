@@ -0,0 +1,141 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Index of the names importable from the directories on the module search path.
+
+ModuleGraph looks for every imported module in every directory of the search
+path, asking the importer of the directory for a loader. Every such lookup
+tests several files, and most lookups fail, e.g. for every optional import
+of a missing module in every directory of sys.path.
+
+The index lists every directory, and every zip archive, once and records
+the names of the modules, packages and extensions it may contain. A
+directory whose listing has no entry for a module is not asked for it. The
+lookup itself is still done by the importer, so the index only needs to
+know which names are certainly missing.
+
+The index is not updated when the directories change. Every build uses a new
+index, see PyiModuleGraph.
+"""
+
+import imp
+import os
+import zipfile
+
+from .. import log as logging
+
+logger = logging.getLogger(__name__)
+
+
+class SearchPathIndex(object):
+    """
+    Names of the importable entries of the directories searched for modules.
+    """
+    def __init__(self):
+        # Importable names by directory or None if unknown.
+        self._names = {}
+        # Lists of the files in the zip archives.
+        self._archives = {}
+        # Suffixes of modules and extensions, the longest first, as
+        # '.cpython-35m-x86_64-linux-gnu.so' is also suffixed by '.so'.
+        self._suffixes = sorted(set(s[0] for s in imp.get_suffixes()),
+                                key=len, reverse=True)
+
+    def _module_name(self, entry):
+        for suffix in self._suffixes:
+            if entry.endswith(suffix):
+                return entry[:-len(suffix)]
+        return None
+
+    def _add_entries(self, names, entries):
+        for entry in entries:
+            # A package, a namespace package or a module.
+            names.add(os.path.normcase(entry))
+            name = self._module_name(entry)
+            if name:
+                names.add(os.path.normcase(name))
+
+    def _archive_files(self, archive):
+        if archive not in self._archives:
+            try:
+                with zipfile.ZipFile(archive) as zf:
+                    files = zf.namelist()
+            except (IOError, OSError, zipfile.BadZipfile) as e:
+                logger.debug('Cannot list %s: %s', archive, e)
+                files = None
+            self._archives[archive] = files
+        return self._archives[archive]
+
+    def _list_archive(self, search_dir):
+        """
+        Return the importable names in the directory `search_dir` in a zip
+        archive or None if it is not in a zip archive.
+        """
+        archive, prefix = search_dir, ''
+        while not os.path.exists(archive):
+            parent, tail = os.path.split(archive)
+            if not tail or parent == archive:
+                # Neither a directory nor in a zip archive, e.g. a directory
+                # on sys.path which does not exist.
+                return set()
+            archive = parent
+            prefix = tail + '/' + prefix
+        if prefix and os.path.isdir(archive):
+            # Does not exist either.
+            return set()
+        if not zipfile.is_zipfile(archive):
+            return None
+        files = self._archive_files(archive)
+        if files is None:
+            return None
+        names = set()
+        for filename in files:
+            if filename.startswith(prefix):
+                head = filename[len(prefix):].split('/', 1)
+                if len(head) > 1:
+                    # A package.
+                    names.add(os.path.normcase(head[0]))
+                else:
+                    self._add_entries(names, head)
+        return names
+
+    def _list(self, search_dir):
+        """
+        Return the set of the importable names in `search_dir` or None if
+        they are not known.
+        """
+        try:
+            entries = os.listdir(search_dir or os.curdir)
+        except (IOError, OSError):
+            return self._list_archive(search_dir)
+        names = set()
+        self._add_entries(names, entries)
+        return names
+
+    def may_contain(self, search_dir, module_name):
+        """
+        Return False if `search_dir` certainly does not contain the module,
+        package or extension `module_name` (not fully-qualified).
+        """
+        if search_dir not in self._names:
+            self._names[search_dir] = self._list(search_dir)
+        names = self._names[search_dir]
+        return names is None or os.path.normcase(module_name) in names
+
+    def filter(self, search_dirs, module_name):
+        """
+        Return the list of the directories in `search_dirs` which may contain
+        the module `module_name` (not fully-qualified).
+        """
+        if '.' in module_name:
+            return list(search_dirs)
+        return [search_dir for search_dir in search_dirs
+                if self.may_contain(search_dir, module_name)]
@@ -19,13 +19,12 @@ import dis
 import io
 import marshal
 import os
-import re
 import zipfile
 
 from ..lib.modulegraph import modulegraph
 
 from .. import compat
-from ..compat import is_darwin, is_unix, is_py2, BYTECODE_MAGIC, PY3_BASE_MODULES, \
+from ..compat import is_darwin, is_unix, is_py2, BYTECODE_MAGIC, \
     exec_python_rc
 from .dylib import include_library
 from .. import log as logging
@@ -51,10 +50,8 @@ def create_py3_base_library(libzip_filename, graph):
                        (x >> 16) & 0xff,
                        (x >> 24) & 0xff]))
 
-    # Construct regular expression for matching modules that should be bundled
-    # into base_library.zip.
-    regex_str = '|'.join(['(%s.*)' % x for x in PY3_BASE_MODULES])
-    regex = re.compile(regex_str)
+    # Modules that should be bundled into base_library.zip.
+    base_library_names = graph.base_library_names()
 
     try:
         # Remove .zip from previous run.
@@ -67,7 +64,7 @@ def create_py3_base_library(libzip_filename, graph):
             for mod in graph.flatten():
                 if type(mod) in (modulegraph.SourceModule, modulegraph.Package):
                     # Bundling just required modules.
-                    if regex.match(mod.identifier):
+                    if mod.identifier in base_library_names:
                         st = os.stat(mod.filename)
                         timestamp = int(st.st_mtime)
                         size = st.st_size & 0xFFFFFFFF
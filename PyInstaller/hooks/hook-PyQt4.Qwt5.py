@@ -12,9 +12,12 @@ from PyInstaller.utils.hooks import eval_statement
 
 hiddenimports = ["PyQt4.QtCore", "PyQt4.QtGui", "PyQt4.QtSvg"]
 
-if eval_statement("from PyQt4 import Qwt5; print(hasattr(Qwt5, 'toNumpy'))"):
+if eval_statement("from PyQt4 import Qwt5; print(hasattr(Qwt5, 'toNumpy'))",
+                  isolated=True):
     hiddenimports.append("numpy")
-if eval_statement("from PyQt4 import Qwt5; print(hasattr(Qwt5, 'toNumeric'))"):
+if eval_statement("from PyQt4 import Qwt5; print(hasattr(Qwt5, 'toNumeric'))",
+                  isolated=True):
     hiddenimports.append("Numeric")
-if eval_statement("from PyQt4 import Qwt5; print(hasattr(Qwt5, 'toNumarray'))"):
+if eval_statement("from PyQt4 import Qwt5; print(hasattr(Qwt5, 'toNumarray'))",
+                  isolated=True):
     hiddenimports.append("numarray")
@@ -15,9 +15,12 @@ hiddenimports = ["PyQt5.QtCore",
                  "PyQt5.QtGui",
                  "PyQt5.QtSvg"]
 
-if eval_statement("from PyQt5 import Qwt5; print(hasattr(Qwt5, 'toNumpy'))"):
+if eval_statement("from PyQt5 import Qwt5; print(hasattr(Qwt5, 'toNumpy'))",
+                  isolated=True):
     hiddenimports.append("numpy")
-if eval_statement("from PyQt5 import Qwt5; print(hasattr(Qwt5, 'toNumeric'))"):
+if eval_statement("from PyQt5 import Qwt5; print(hasattr(Qwt5, 'toNumeric'))",
+                  isolated=True):
     hiddenimports.append("Numeric")
-if eval_statement("from PyQt5 import Qwt5; print(hasattr(Qwt5, 'toNumarray'))"):
+if eval_statement("from PyQt5 import Qwt5; print(hasattr(Qwt5, 'toNumarray'))",
+                  isolated=True):
     hiddenimports.append("numarray")
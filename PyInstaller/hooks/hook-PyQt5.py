@@ -33,7 +33,7 @@ hiddenimports = ['sip', 'PyQt5.Qt']
 qt_version = exec_statement("""
 from PyQt5.QtCore import QT_VERSION_STR
 print(QT_VERSION_STR)
-""")
+""", isolated=True)
 if is_darwin and qt_version in Requirement.parse("QT<5.4"):
     datas = [
         (qt5_menu_nib_dir(), ''),
@@ -30,7 +30,9 @@ path = plug.get_filename()
 print(os.path.dirname(path))
 """
 
-plugin_path = exec_statement(statement)
+# The static 'gobject' bindings imported by 'gst' cannot be loaded together
+# with 'gi', which other hooks import.
+plugin_path = exec_statement(statement, isolated=True)
 
 if is_win:
     # TODO Verify that on Windows gst plugins really end with .dll.
@@ -66,7 +66,7 @@ except Exception:
     # For safety, attempt to import each backend in a unique subprocess.
     for backend_name in backend_names:
         module_name = 'matplotlib.backends.backend_%s' % backend_name.lower()
-        stdout = exec_statement(import_statement % module_name)
+        stdout = exec_statement(import_statement % module_name, isolated=True)
 
         # If no output was printed, this backend is importable.
         if not stdout:
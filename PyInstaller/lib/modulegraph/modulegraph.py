@@ -581,6 +581,39 @@ class _Visitor (ast.NodeVisitor):
 
 
 
+def _scan_bytecode_stores(co, m,
+        STORE_NAME=_Bchr(dis.opname.index('STORE_NAME')),
+        STORE_GLOBAL=_Bchr(dis.opname.index('STORE_GLOBAL')),
+        HAVE_ARGUMENT=_Bchr(dis.HAVE_ARGUMENT),
+        unpack=struct.unpack):
+    """
+    Add the names assigned at the global level of the code object `co` to
+    the global names of the module node `m`. Does not need a graph, so it
+    may also run in worker processes.
+    """
+    code = co.co_code
+    constants = co.co_consts
+    n = len(code)
+    i = 0
+
+    while i < n:
+        c = code[i]
+        i += 1
+        if c >= HAVE_ARGUMENT:
+            i = i+2
+
+        if c == STORE_NAME or c == STORE_GLOBAL:
+            # keep track of all global names that are assigned to
+            oparg = unpack('<H', code[i - 2:i])[0]
+            name = co.co_names[oparg]
+            m.globalnames.add(name)
+
+    cotype = type(co)
+    for c in constants:
+        if isinstance(c, cotype):
+            _scan_bytecode_stores(c, m)
+
+
 class ModuleGraph(ObjectGraph):
     """
     Directed graph whose nodes represent modules and edges represent
@@ -1474,35 +1507,8 @@ class ModuleGraph(ObjectGraph):
         visitor = _Visitor(self, m)
         visitor.visit(co)
 
-    def _scan_bytecode_stores(self, co, m,
-            STORE_NAME=_Bchr(dis.opname.index('STORE_NAME')),
-            STORE_GLOBAL=_Bchr(dis.opname.index('STORE_GLOBAL')),
-            HAVE_ARGUMENT=_Bchr(dis.HAVE_ARGUMENT),
-            unpack=struct.unpack):
-
-        extended_import = bool(sys.version_info[:2] >= (2,5))
-
-        code = co.co_code
-        constants = co.co_consts
-        n = len(code)
-        i = 0
-
-        while i < n:
-            c = code[i]
-            i += 1
-            if c >= HAVE_ARGUMENT:
-                i = i+2
-
-            if c == STORE_NAME or c == STORE_GLOBAL:
-                # keep track of all global names that are assigned to
-                oparg = unpack('<H', code[i - 2:i])[0]
-                name = co.co_names[oparg]
-                m.globalnames.add(name)
-
-        cotype = type(co)
-        for c in constants:
-            if isinstance(c, cotype):
-                self._scan_bytecode_stores(c, m)
+    def _scan_bytecode_stores(self, co, m):
+        _scan_bytecode_stores(co, m)
 
     def _scan_bytecode(self, co, m,
             HAVE_ARGUMENT=_Bchr(dis.HAVE_ARGUMENT),
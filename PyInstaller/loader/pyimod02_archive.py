@@ -29,6 +29,13 @@ import struct
 import sys
 import zlib
 
+# The 'mmap' extension is bundled next to 'zlib' as a bootstrap module, but
+# it is optional: without it the archive is read by seeking in the file.
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
 
 # For decrypting Python modules.
 CRYPT_BLOCK_SIZE = 16
@@ -39,6 +46,19 @@ PYZ_TYPE_MODULE = 0
 PYZ_TYPE_PKG = 1
 PYZ_TYPE_DATA = 2
 
+# Compression of the entries in a PYZ archive and of the entries in a CArchive
+# (the 'flag' field of the table of contents). Keep in sync with
+# bootloader/src/pyi_archive.h. LZ4 is used only in CArchives.
+COMPRESSION_STORED = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZ4 = 2
+
+# Version of the PYZ header. The header of a PYZ archive is followed by the
+# encryption flag, the header version and the compression. In archives
+# written before the compression became selectable these bytes are padding,
+# i.e. the version is 0 and the entries are compressed with zlib.
+PYZ_HEADER_VERSION = 1
+
 
 class ArchiveFile(object):
     """
@@ -301,6 +321,24 @@ class ZlibArchiveReader(ArchiveReader):
 
         super(ZlibArchiveReader, self).__init__(path, offset)
 
+        # The bytes after the encryption flag in the header tell how the
+        # entries are compressed, see PYZ_HEADER_VERSION.
+        self.compression = COMPRESSION_ZLIB
+        if path is not None:
+            with self.lib:
+                self.lib.seek(self.start + ArchiveReader.HDRLEN + 1)
+                version, compression = struct.unpack('!BB', self.lib.read(2))
+            if version >= PYZ_HEADER_VERSION:
+                self.compression = compression
+
+        # Map the file into memory once, so extracting an entry needs
+        # no system calls. The mapping keeps the file open, which on Windows
+        # locks it, so there every entry is read through ArchiveFile.
+        self._view = None
+        if path is not None and mmap is not None and \
+                not sys.platform.startswith('win'):
+            self._view = self._map(path)
+
         # Try to import the key module. If the key module is not available
         # then it means that encryption is disabled.
         try:
@@ -309,19 +347,178 @@ class ZlibArchiveReader(ArchiveReader):
         except ImportError:
             self.cipher = None
 
+    @staticmethod
+    def _map(path):
+        """
+        Return a read-only view of the memory-mapped file or None if the file
+        cannot be mapped.
+        """
+        try:
+            with open(path, 'rb') as fp:
+                mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            return None
+        if sys.version_info[0] == 2:
+            # Slicing the mapping returns a copy of the data as str.
+            return mapping
+        # Slicing a memoryview does not copy the data.
+        return memoryview(mapping)
+
     def extract(self, name):
         (typ, pos, length) = self.toc.get(name, (0, None, 0))
         if pos is None:
             return None
-        with self.lib:
-            self.lib.seek(self.start + pos)
-            obj = self.lib.read(length)
+        if self._view is not None:
+            obj = self._view[self.start + pos:self.start + pos + length]
+        else:
+            with self.lib:
+                self.lib.seek(self.start + pos)
+                obj = self.lib.read(length)
         try:
             if self.cipher:
-                obj = self.cipher.decrypt(obj)
-            obj = zlib.decompress(obj)
+                obj = self.cipher.decrypt(bytes(obj))
+            if self.compression == COMPRESSION_ZLIB:
+                obj = zlib.decompress(obj)
+            else:
+                obj = bytes(obj)
             if typ in (PYZ_TYPE_MODULE, PYZ_TYPE_PKG):
                 obj = marshal.loads(obj)
         except EOFError:
             raise ImportError("PYZ entry '%s' failed to unmarshal" % name)
         return typ, obj
+
+
+class CArchiveDataReader(object):
+    """
+    Data files (type 'x') in the CArchive appended to the executable, which
+    the bootloader did not extract because of the runtime option
+    'pyi-lazy-data'. They are read straight from the archive on request and
+    written to sys._MEIPASS only when a path to the file is requested.
+
+    Data files compressed with LZ4 are always extracted by the bootloader,
+    so they are not listed here.
+    """
+    # Keep in sync with CArchiveWriter in PyInstaller/archive/writers.py.
+    MAGIC = b'MEI\014\013\012\013\016'
+    _cookie_format = '!8siiii64s'
+    _cookie_size = struct.calcsize(_cookie_format)
+    ENTRYSTRUCT = '!iiiiBB'
+    ENTRYLEN = struct.calcsize(ENTRYSTRUCT)
+    # A digital signature may follow the archive, look for the cookie at most
+    # that far from the end of the file.
+    SEARCHLEN = 256 * 1024
+
+    def __init__(self, path, destdir):
+        self.path = path
+        self.destdir = destdir
+        # True if the bootloader left the data files in the archive.
+        self.lazy = False
+        # name -> (dpos, dlen, ulen, flag)
+        self.toc = {}
+        with open(path, 'rb') as fp:
+            tocpos, toclen = self._read_cookie(fp)
+            fp.seek(self.start + tocpos)
+            tocdata = fp.read(toclen)
+        toc = {}
+        pos = 0
+        while pos < len(tocdata):
+            (entrylen, dpos, dlen, ulen, flag, typcd) = struct.unpack(
+                self.ENTRYSTRUCT, tocdata[pos:pos + self.ENTRYLEN])
+            nm = tocdata[pos + self.ENTRYLEN:pos + entrylen].rstrip(b'\0')
+            # The reader is created while the FrozenImporter is installed,
+            # Python 2 cannot import any codec yet. Keep the names as the
+            # UTF-8 encoded str there.
+            if sys.version_info[0] > 2:
+                nm = nm.decode('utf-8')
+            pos += entrylen
+            typcd = chr(typcd)
+            if typcd == 'o' and nm == 'pyi-lazy-data':
+                self.lazy = True
+            elif typcd == 'x' and flag in (COMPRESSION_STORED, COMPRESSION_ZLIB):
+                toc[nm] = (dpos, dlen, ulen, flag)
+        if self.lazy:
+            self.toc = toc
+
+    def _read_cookie(self, fp):
+        """
+        Find the cookie at the end of the file, set the start of the archive
+        and return the tuple (tocpos, toclen).
+        """
+        fp.seek(0, 2)
+        end = fp.tell()
+        size = min(end, self.SEARCHLEN)
+        fp.seek(end - self._cookie_size)
+        tail = fp.read(self._cookie_size)
+        if not tail.startswith(self.MAGIC):
+            fp.seek(end - size)
+            tail = fp.read(size)
+        idx = tail.rfind(self.MAGIC)
+        if idx < 0 or idx + self._cookie_size > len(tail):
+            raise ArchiveReadError("%s does not contain a CArchive" % self.path)
+        (magic, length, tocpos, toclen, pyvers, pylib_name) = struct.unpack(
+            self._cookie_format, tail[idx:idx + self._cookie_size])
+        self.start = end - len(tail) + idx + self._cookie_size - length
+        return tocpos, toclen
+
+    @staticmethod
+    def _normalize(name):
+        import os
+        return os.path.normpath(name)
+
+    def __contains__(self, name):
+        return self._normalize(name) in self.toc
+
+    def contents(self):
+        """
+        Return the names of the data files left in the archive.
+        """
+        return list(self.toc.keys())
+
+    def read(self, name):
+        """
+        Return the content of the data file as bytes.
+        """
+        (dpos, dlen, ulen, flag) = self.toc[self._normalize(name)]
+        with open(self.path, 'rb') as fp:
+            fp.seek(self.start + dpos)
+            data = fp.read(dlen)
+        if flag == COMPRESSION_ZLIB:
+            data = zlib.decompress(data)
+        return data
+
+    def extract(self, name):
+        """
+        Return the path of the data file in sys._MEIPASS, extracting the file
+        first if it does not exist yet.
+        """
+        import os
+        name = self._normalize(name)
+        ulen = self.toc[name][2]
+        path = os.path.join(self.destdir, name)
+        try:
+            if os.path.getsize(path) == ulen:
+                return path
+        except OSError:
+            pass
+        data = self.read(name)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Created by another thread meanwhile.
+                if not os.path.isdir(dirname):
+                    raise
+        # Other threads may extract the same file, so write under a unique
+        # name and move the file in place when it is complete.
+        tmpname = '%s.%d.%x.tmp' % (path, os.getpid(), id(data))
+        with open(tmpname, 'wb') as fp:
+            fp.write(data)
+        try:
+            os.rename(tmpname, path)
+        except OSError:
+            # On Windows renaming fails if the file exists already.
+            os.remove(tmpname)
+            if not os.path.exists(path):
+                raise
+        return path
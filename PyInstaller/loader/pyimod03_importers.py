@@ -21,7 +21,8 @@ PEP-302 importers for frozen applications.
 import sys
 import pyimod01_os_path as pyi_os_path
 
-from pyimod02_archive import ArchiveReadError, ZlibArchiveReader
+from pyimod02_archive import ArchiveReadError, ZlibArchiveReader, \
+    CArchiveDataReader
 
 
 SYS_PREFIX = sys._MEIPASS
@@ -207,6 +208,12 @@ class FrozenImporter(object):
                 # Some runtime hook might need access to the list of available
                 # frozen module. Let's make them accessible as a set().
                 self.toc = set(self._pyz_archive.toc.keys())
+                # The bootloader sets sys._MEILAZYDATA only with the runtime
+                # option 'pyi-lazy-data'. Other apps do not read the archive.
+                self._lazy_data = None
+                if getattr(sys, '_MEILAZYDATA', False):
+                    self._lazy_data = self._load_lazy_data(
+                        self._pyz_archive.path)
                 # Return - no error was raised.
                 trace("# PyInstaller: FrozenImporter(%s)", pyz_filepath)
                 return
@@ -222,6 +229,28 @@ class FrozenImporter(object):
         # Raise import error.
         raise ImportError("Can't load frozen modules.")
 
+    @staticmethod
+    def _load_lazy_data(path):
+        """
+        Return the CArchiveDataReader of the data files the bootloader left in
+        the archive (runtime option 'pyi-lazy-data') or None. The reader is
+        also available to the app as sys._MEIDATA.
+        """
+        try:
+            lazy_data = CArchiveDataReader(path, SYS_PREFIX)
+        except Exception as e:
+            # E.g. a damaged TOC. Must not stop the app, the data files are
+            # then missing only. The bootloader did not extract them either,
+            # so always report it.
+            if sys.stderr is not None:
+                sys.stderr.write("PyInstaller: cannot read lazy data files: "
+                                 "%s\n" % e)
+            return None
+        if not lazy_data.lazy:
+            return None
+        sys._MEIDATA = lazy_data
+        return lazy_data
+
     def find_module(self, fullname, path=None):
         """
         PEP-302 finder.find_module() method for the ``sys.meta_path`` hook.
@@ -442,6 +471,9 @@ class FrozenImporter(object):
         if fullname in self.toc:
             # If the file is in the archive, return this
             return self._pyz_archive.extract(fullname)[1]
+        elif self._lazy_data is not None and fullname in self._lazy_data:
+            # Data file the bootloader did not extract.
+            return self._lazy_data.read(fullname)
         else:
             # Otherwise try to fetch it from the filesystem. Since
             # __file__ attribute works properly just try to open and
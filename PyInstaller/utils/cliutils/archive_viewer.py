@@ -152,7 +152,10 @@ def get_data(name, arch):
             return None
         with arch.lib:
             arch.lib.seek(arch.start + pos)
-            return zlib.decompress(arch.lib.read(length))
+            data = arch.lib.read(length)
+        if arch.compression == pyimod02_archive.COMPRESSION_ZLIB:
+            data = zlib.decompress(data)
+        return data
     ndx = arch.toc.find(name)
     dpos, dlen, ulen, flag, typcd, name = arch.toc[ndx]
     x, data = arch.extract(ndx)
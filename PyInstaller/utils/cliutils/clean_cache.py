@@ -0,0 +1,50 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2013, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Remove the least recently used binaries from the cache of PyInstaller.
+"""
+
+from __future__ import print_function
+
+import argparse
+
+import PyInstaller.log
+from PyInstaller.building import bincache
+from PyInstaller.configure import _get_bincache_size, _get_pyinst_cache_dir
+
+
+def run():
+    PyInstaller.log.init()
+
+    parser = argparse.ArgumentParser()
+    PyInstaller.log.__add_options(parser)
+    parser.add_argument('--max-size', metavar='MiB', type=int, default=None,
+                        help=('size the binaries processed by strip and UPX '
+                              'may take in the cache, 0 removes all of them '
+                              '(default: $PYINSTALLER_BINCACHE_SIZE or 1024)'))
+
+    args = parser.parse_args()
+    PyInstaller.log.__process_options(parser, args)
+
+    if args.max_size is None:
+        max_size = _get_bincache_size()
+    else:
+        max_size = args.max_size * 1024 * 1024
+    cachedir = _get_pyinst_cache_dir()
+    try:
+        count, size = bincache.prune(cachedir, max_size)
+        print('Removed %d binaries (%d KiB) from %s' % (count, size // 1024,
+                                                        cachedir))
+    except KeyboardInterrupt:
+        raise SystemExit("Aborted by user request.")
+
+if __name__ == '__main__':
+    run()
@@ -8,7 +8,6 @@
 #-----------------------------------------------------------------------------
 
 
-import copy
 import glob
 import os
 import pkg_resources
@@ -22,6 +21,8 @@ from ...compat import is_py2, is_win, is_py3, is_darwin, EXTENSION_SUFFIXES
 from ...utils import misc
 from ... import HOMEPATH
 from ... import log as logging
+from . import worker
+from .memo import memoize
 
 logger = logging.getLogger(__name__)
 
@@ -44,18 +45,18 @@ PY_IGNORE_EXTENSIONS = set(['.py', '.pyc', '.pyd', '.pyo', '.so'])
 hook_variables = {}
 
 
-def __exec_python_cmd(cmd, env=None):
+def __get_python_env(env=None):
     """
-    Executes an externally spawned Python interpreter and returns
-    anything that was emitted in the standard output as a single
-    string.
+    Return the environment of the Python interpreters running the hook
+    utilities: os.environ updated with `env` and with PYTHONPATH prepended
+    with pathex and HOMEPATH.
     """
     # 'PyInstaller.config' cannot be imported as other top-level modules.
     from ...config import CONF
     if env is None:
         env = {}
     # Update environment. Defaults to 'os.environ'
-    pp_env = copy.deepcopy(os.environ)
+    pp_env = dict(os.environ)
     pp_env.update(env)
     # Prepend PYTHONPATH with pathex
     # Some functions use some PyInstaller code in subprocess so add
@@ -73,7 +74,16 @@ def __exec_python_cmd(cmd, env=None):
     if 'PYTHONPATH' in env:
         pp = os.pathsep.join([env.get('PYTHONPATH'), pp])
     pp_env['PYTHONPATH'] = pp
+    return pp_env
 
+
+def __exec_python_cmd(cmd, env=None):
+    """
+    Executes an externally spawned Python interpreter and returns
+    anything that was emitted in the standard output as a single
+    string.
+    """
+    pp_env = __get_python_env(env)
     try:
         txt = compat.exec_python(*cmd, env=pp_env)
     except OSError as e:
@@ -81,13 +91,40 @@ def __exec_python_cmd(cmd, env=None):
     return txt.strip()
 
 
-def exec_statement(statement):
+def __exec_in_worker(kind, arg, args, cmd):
+    """
+    Run the statement or script in a hook worker, see
+    PyInstaller.utils.hooks.worker, and return anything that was emitted
+    in the standard output as a single string. If the worker dies, run
+    `cmd` in a new interpreter instead.
+    """
+    pp_env = __get_python_env()
+    try:
+        txt = worker.run(kind, arg, args, env=pp_env)
+    except worker.WorkerError as e:
+        logger.debug('%s, running %s in a new interpreter', e, kind)
+        return __exec_python_cmd(cmd)
+    except OSError as e:
+        raise SystemExit("Execution failed: %s" % e)
+    return txt.strip()
+
+
+def exec_statement(statement, isolated=False):
     """Executes a Python statement in an externally spawned interpreter, and
     returns anything that was emitted in the standard output as a single string.
+
+    The statement runs in a long-lived interpreter shared with other
+    statements, which keeps the modules they imported. If `isolated` is True,
+    it runs in a new interpreter instead. Statements must be isolated if they
+    inspect sys.modules, create application singletons like
+    QCoreApplication, or import modules which conflict with modules other
+    statements import, e.g. PyQt4 and PyQt5.
     """
     statement = textwrap.dedent(statement)
     cmd = ['-c', statement]
-    return __exec_python_cmd(cmd)
+    if isolated:
+        return __exec_python_cmd(cmd)
+    return __exec_in_worker('statement', statement, (), cmd)
 
 
 def exec_script(script_filename, env=None, *args):
@@ -108,11 +145,13 @@ def exec_script(script_filename, env=None, *args):
 
     cmd = [script_filename]
     cmd.extend(args)
+    if env is None:
+        return __exec_in_worker('script', script_filename, args, cmd)
     return __exec_python_cmd(cmd, env=env)
 
 
-def eval_statement(statement):
-    txt = exec_statement(statement).strip()
+def eval_statement(statement, isolated=False):
+    txt = exec_statement(statement, isolated).strip()
     if not txt:
         # return an empty string which is "not true" but iterable
         return ''
@@ -156,7 +195,8 @@ diff.discard('%(modname)s')
 # Print module list to stdout.
 print(list(diff))
 """ % {'modname': modname}
-    module_imports = eval_statement(statement)
+    # Modules imported by other statements would be missing from the list.
+    module_imports = eval_statement(statement, isolated=True)
 
     if not module_imports:
         logger.error('Cannot find imports for module %s' % modname)
@@ -172,7 +212,7 @@ def qt4_plugins_dir(ns='PyQt4'):
         # For Python 2 print would give "<PyQt4.QtCore.QStringList
         # object at 0x....>", so we need to convert each element separately
         "str=getattr(__builtins__, 'unicode', str);" # for Python 2
-        "print([str(p) for p in app.libraryPaths()])" % ns)
+        "print([str(p) for p in app.libraryPaths()])" % ns, isolated=True)
     if not qt4_plugin_dirs:
         logger.error('Cannot find %s plugin directories' % ns)
         return ""
@@ -192,7 +232,7 @@ def qt4_phonon_plugins_dir(ns='PyQt4'):
         # For Python 2 print would give "<PyQt4.QtCore.QStringList
         # object at 0x....>", so we need to convert each element separately
         "str=getattr(__builtins__, 'unicode', str);" # for Python 2
-        "print([str(p) for p in app.libraryPaths()])")
+        "print([str(p) for p in app.libraryPaths()])", isolated=True)
     if not qt4_plugin_dirs:
         logger.error("Cannot find PyQt4 phonon plugin directories")
         return ""
@@ -290,7 +330,7 @@ def qt5_plugins_dir():
         # For Python 2 print would give "<PyQt4.QtCore.QStringList
         # object at 0x....>", so we need to convert each element separately
         "str=getattr(__builtins__, 'unicode', str);" # for Python 2
-        "print([str(p) for p in app.libraryPaths()])")
+        "print([str(p) for p in app.libraryPaths()])", isolated=True)
     if not qt5_plugin_dirs:
         logger.error("Cannot find PyQt5 plugin directories")
         return ""
@@ -310,7 +350,7 @@ def qt5_phonon_plugins_dir():
         # For Python 2 print would give "<PyQt4.QtCore.QStringList
         # object at 0x....>", so we need to convert each element separately
         "str=getattr(__builtins__, 'unicode', str);" # for Python 2
-        "print([str(p) for p in app.libraryPaths()])")
+        "print([str(p) for p in app.libraryPaths()])", isolated=True)
     if not qt5_plugin_dirs:
         logger.error("Cannot find PyQt5 phonon plugin directories")
         return ""
@@ -321,6 +361,8 @@ def qt5_phonon_plugins_dir():
     return ""
 
 
+@memoize(lambda value, plugin_type:
+         [os.path.dirname(value[0][0])] if value else [])
 def qt5_plugins_binaries(plugin_type):
     """Return list of dynamic libraries formatted for mod.binaries."""
     pdir = qt5_plugins_dir()
@@ -806,6 +848,15 @@ def is_package(module_name):
             return False
 
 
+def _package_trees(package):
+    # The directory of the package for memoize().
+    try:
+        return [get_package_paths(package)[1]]
+    except Exception:
+        return []
+
+
+@memoize(lambda value, package: [value[1]])
 def get_package_paths(package):
     """
     Given a package, return the path to packages stored on this machine
@@ -827,6 +878,7 @@ def get_package_paths(package):
     return pkg_base, pkg_dir
 
 
+@memoize(lambda value, package, *args, **kwargs: _package_trees(package))
 def collect_submodules(package, subdir=None, pattern=None):
     """
     The following two functions were originally written by Ryan Welsh
@@ -905,6 +957,7 @@ PY_DYLIB_PATTERNS = [
 ]
 
 
+@memoize(lambda value, package, *args, **kwargs: _package_trees(package))
 def collect_dynamic_libs(package, destdir=None):
     """
     This routine produces a list of (source, dest) of dynamic library
@@ -942,6 +995,7 @@ def collect_dynamic_libs(package, destdir=None):
     return dylibs
 
 
+@memoize(lambda value, package, *args, **kwargs: _package_trees(package))
 def collect_data_files(package, include_py_files=False, subdir=None):
     """
     This routine produces a list of (source, dest) non-Python (i.e. data)
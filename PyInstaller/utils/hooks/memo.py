@@ -0,0 +1,167 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Memo of the results of hook utilities across builds.
+
+Utilities like collect_submodules() walk the directories of a package or
+query a Python subprocess and return the same result on every build as long
+as the package is not reinstalled. Their results are therefore kept in a
+file in CONF['cachedir'], keyed by the utility, its arguments and the Python
+environment.
+
+Every result is stored with the modification times of the directories it
+was computed from: the directory trees of the package and the directories
+on sys.path. Installing, removing or upgrading a package changes at least
+one of them, so the result is computed again.
+"""
+
+import functools
+import marshal
+import os
+import sys
+import threading
+
+from ... import log as logging
+from ..misc import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+# Increment when the layout of the memo changes.
+MEMO_VERSION = 1
+
+# The memo keeps at most this many results, the ones used by the current
+# build first.
+MEMO_MAX_ENTRIES = 5000
+
+# Environment variables changing the results of the utilities.
+ENV_VARS = ('PYTHONPATH', 'QT_PLUGIN_PATH')
+
+# Results by key, see memoize().
+_memo = None
+_used = {}
+_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def _memo_filename():
+    # 'PyInstaller.config' cannot be imported as other top-level modules.
+    from ...config import CONF
+    if not CONF.get('cachedir'):
+        return None
+    return os.path.join(CONF['cachedir'], 'hookmemo.dat')
+
+
+def _load_memo(filename):
+    global _memo
+    _memo = {}
+    try:
+        with open(filename, 'rb') as fp:
+            version, memo = marshal.load(fp)
+    except (IOError, OSError):
+        # No memo yet.
+        return
+    except (EOFError, ValueError, TypeError):
+        logger.warn('Ignoring corrupted hook utility cache %s', filename)
+        return
+    if version == MEMO_VERSION:
+        _memo = memo
+
+
+def _environment():
+    from ...config import CONF
+    return (sys.executable, sys.version, tuple(sys.path),
+            tuple(CONF.get('pathex') or ()),
+            tuple(os.environ.get(name, '') for name in ENV_VARS))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _stamps(trees):
+    """
+    Return the tuple of (directory, mtime) of all directories in the
+    `trees` and on sys.path.
+    """
+    dirs = [d for d in sys.path if d]
+    for tree in trees:
+        for dirpath, dirnames, filenames in os.walk(tree):
+            dirs.append(dirpath)
+    return tuple((d, _mtime(d)) for d in dirs)
+
+
+def memoize(trees):
+    """
+    Decorator memoizing the results of the hook utility in the memo.
+
+    `trees` is called with the result and the arguments of the utility and
+    returns the list of the directories it walked.
+    """
+    def decorator(function):
+        name = function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            filename = _memo_filename()
+            if filename is None:
+                return function(*args, **kwargs)
+            key = repr((name, args, sorted(kwargs.items()), _environment()))
+            with _lock:
+                if _memo is None:
+                    _load_memo(filename)
+                entry = _used.get(key) or _memo.get(key)
+            if entry is not None and all(_mtime(d) == mtime
+                                         for d, mtime in entry[0]):
+                with _lock:
+                    _used[key] = entry
+                    _stats['hits'] += 1
+                # A copy the caller may modify.
+                return marshal.loads(marshal.dumps(entry[1]))
+            value = function(*args, **kwargs)
+            try:
+                entry = (_stamps(trees(value, *args, **kwargs)),
+                         marshal.loads(marshal.dumps(value)))
+            except ValueError:
+                # Not marshallable.
+                return value
+            with _lock:
+                _memo[key] = _used[key] = entry
+                _stats['misses'] += 1
+            return value
+        return wrapper
+    return decorator
+
+
+def save():
+    """
+    Write the results used by this build and as many older ones as allowed
+    by MEMO_MAX_ENTRIES back to the memo.
+    """
+    global _memo
+    filename = _memo_filename()
+    with _lock:
+        if filename is None or not _used:
+            return
+        logger.info('Hook utility cache: %d hits, %d misses',
+                    _stats['hits'], _stats['misses'])
+        memo = dict(_used)
+        for key, value in (_memo or {}).items():
+            if len(memo) >= MEMO_MAX_ENTRIES:
+                break
+            memo.setdefault(key, value)
+        _memo = None
+        _used.clear()
+        _stats['hits'] = _stats['misses'] = 0
+    atomic_write(filename, lambda fp: marshal.dump((MEMO_VERSION, memo), fp))
@@ -0,0 +1,128 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Worker process running the statements and scripts of the hook utilities,
+see PyInstaller.utils.hooks.worker.
+
+Every request and every response is a marshalled tuple preceded by its
+length. A request is one of
+
+    ('statement', source, ())
+    ('script', filename, args)
+
+and the response is the tuple (exit status, output). Everything the
+request writes to the standard output, also from extension modules, is
+captured in a temporary file and returned as output.
+
+Modules imported by a request stay imported, but sys.path, sys.argv,
+sys.stdout, os.environ and the working directory are restored after every
+request.
+
+This script must not import PyInstaller.
+"""
+
+import marshal
+import os
+import struct
+import sys
+import tempfile
+import traceback
+
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+
+_HEADER = '!I'
+
+
+def _read(fp, size):
+    data = b''
+    while len(data) < size:
+        chunk = fp.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _run(kind, arg, args):
+    if kind == 'statement':
+        code = compile(arg, '<string>', 'exec')
+        namespace = {'__name__': '__main__', '__builtins__': builtins}
+        exec(code, namespace)
+    else:
+        import runpy
+        sys.argv = [arg] + list(args)
+        sys.path[0] = os.path.dirname(arg)
+        runpy.run_path(arg, run_name='__main__')
+
+
+def main():
+    requests = os.fdopen(os.dup(0), 'rb')
+    responses = os.fdopen(os.dup(1), 'wb')
+    # Requests must neither read the requests nor write into the responses.
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    output = tempfile.TemporaryFile()
+    os.dup2(output.fileno(), 1)
+
+    # Like `python -c`.
+    sys.path[0] = ''
+    path = list(sys.path)
+    argv = list(sys.argv)
+    environ = dict(os.environ)
+    cwd = os.getcwd()
+    stdout, stderr = sys.stdout, sys.stderr
+
+    while True:
+        header = _read(requests, struct.calcsize(_HEADER))
+        if header is None:
+            break
+        kind, arg, args = marshal.loads(
+            _read(requests, struct.unpack(_HEADER, header)[0]))
+        status = 0
+        try:
+            _run(kind, arg, args)
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                sys.stderr.write('%s\n' % e.code)
+                status = 1
+        except:
+            traceback.print_exc()
+            status = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sys.stdout, sys.stderr = stdout, stderr
+        stdout.flush()
+        output.seek(0)
+        data = output.read()
+        output.seek(0)
+        output.truncate()
+
+        sys.path[:] = path
+        sys.argv[:] = argv
+        if os.environ != environ:
+            os.environ.clear()
+            os.environ.update(environ)
+        os.chdir(cwd)
+
+        response = marshal.dumps((status, data))
+        responses.write(struct.pack(_HEADER, len(response)) + response)
+        responses.flush()
+
+
+if __name__ == '__main__':
+    main()
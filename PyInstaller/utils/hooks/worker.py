@@ -0,0 +1,147 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Long-lived Python processes running the statements and scripts of the hook
+utilities.
+
+Starting a new interpreter for every exec_statement() and importing the
+same large packages in every one of them again is slow. A worker process,
+see subproc/hook_worker.py, runs one request after the other and keeps the
+imported modules. Workers are started on demand, one for every caller
+running a request at the same time, and are reused for requests with the
+same environment.
+
+A worker that dies while running a request is discarded and WorkerError is
+raised, the next request starts a new worker.
+"""
+
+import atexit
+import marshal
+import os
+import struct
+import subprocess
+import threading
+
+from ... import compat
+from ... import log as logging
+
+logger = logging.getLogger(__name__)
+
+
+_HEADER = '!I'
+
+_SCRIPT = os.path.join(os.path.dirname(__file__), 'subproc', 'hook_worker.py')
+
+# Idle workers by their environment.
+_idle = {}
+_lock = threading.Lock()
+
+
+class WorkerError(Exception):
+    """
+    The worker process died while running a request.
+    """
+
+
+def _read(fp, size):
+    data = b''
+    while len(data) < size:
+        chunk = fp.read(size - len(data))
+        if not chunk:
+            raise WorkerError('Hook worker exited unexpectedly')
+        data += chunk
+    return data
+
+
+def _command(env):
+    # Not in HookWorker, where the name would be mangled.
+    cmdargs, kwargs = compat.__wrap_python([_SCRIPT], {'env': env})
+    return cmdargs, kwargs['env']
+
+
+class HookWorker(object):
+    """
+    A worker process started with the environment `env`.
+    """
+    def __init__(self, env):
+        cmdargs, env = _command(env)
+        self._proc = subprocess.Popen(cmdargs, stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE, env=env)
+        logger.debug('Started hook worker %d', self._proc.pid)
+
+    def run(self, kind, arg, args=()):
+        """
+        Run the request in the worker and return the tuple (exit status,
+        output), the output being bytes.
+        """
+        request = marshal.dumps((kind, arg, tuple(args)))
+        try:
+            self._proc.stdin.write(struct.pack(_HEADER, len(request)) +
+                                   request)
+            self._proc.stdin.flush()
+            header = _read(self._proc.stdout, struct.calcsize(_HEADER))
+            response = _read(self._proc.stdout,
+                             struct.unpack(_HEADER, header)[0])
+        except (IOError, OSError) as e:
+            raise WorkerError('Hook worker failed: %s' % e)
+        status, output = marshal.loads(response)
+        return status, output
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except (IOError, OSError):
+            pass
+        self._proc.wait()
+        self._proc.stdout.close()
+
+
+def run(kind, arg, args=(), env=None):
+    """
+    Run the request in an idle worker for the environment `env` (default:
+    os.environ) or in a new one and return its output as a string.
+
+    Raise WorkerError if the worker died.
+    """
+    if env is None:
+        env = os.environ
+    key = tuple(sorted(env.items()))
+    with _lock:
+        workers = _idle.get(key)
+        worker = workers.pop() if workers else None
+    if worker is None:
+        worker = HookWorker(dict(env))
+    try:
+        status, output = worker.run(kind, arg, args)
+    except WorkerError:
+        worker.close()
+        raise
+    with _lock:
+        _idle.setdefault(key, []).append(worker)
+    if status:
+        logger.debug('Hook worker request exited with status %s', status)
+    if compat.is_py3:
+        output = output.decode('UTF-8')
+    return output
+
+
+def close_workers():
+    """
+    Stop all idle workers.
+    """
+    with _lock:
+        workers = [worker for workers in _idle.values() for worker in workers]
+        _idle.clear()
+    for worker in workers:
+        worker.close()
+
+
+atexit.register(close_workers)
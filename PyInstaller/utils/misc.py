@@ -18,9 +18,11 @@ import os
 import pprint
 import py_compile
 import sys
+import tempfile
 
 from PyInstaller import log as logging
-from PyInstaller.compat import is_unix, is_win, BYTECODE_MAGIC, is_py2
+from PyInstaller.compat import is_unix, is_win, BYTECODE_MAGIC, is_py2, \
+    os_replace
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +118,49 @@ def mtime(fnm):
         return 0
 
 
+def file_stamp(filename):
+    """
+    Return the tuple (size, mtime) of the file or None if it does not exist.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime)
+
+
+def atomic_write(filename, dump, prefix='tmp', suffix='.tmp',
+                 replace=os_replace):
+    """
+    Write the file by calling `dump(fp)` with a temporary file `fp` in the
+    same directory, opened for writing in binary mode, and then moving the
+    temporary file in place by calling `replace(tmpname, filename)`.
+
+    Builds sharing the file never read it partially written. The directory is
+    created if needed and the temporary file is removed if anything fails.
+    `dump` may also close `fp` and write the file named `fp.name` by other
+    means, e.g. by running a tool.
+    """
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Created by a concurrent build.
+            if not os.path.isdir(dirname):
+                raise
+    fd, tmpname = tempfile.mkstemp(dir=dirname, prefix=prefix, suffix=suffix)
+    os.close(fd)
+    try:
+        with open(tmpname, 'wb') as fp:
+            dump(fp)
+        replace(tmpname, filename)
+    except:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+
 def compile_py_files(toc, workpath):
     """
     Given a TOC or equivalent list of tuples, generates all the required
@@ -239,7 +284,7 @@ def load_py_data_struct(filename):
         import codecs
         f = codecs.open(filename, 'rU', encoding='utf-8')
     else:
-        f = open(filename, 'rU', encoding='utf-8')
+        f = open(filename, 'r', encoding='utf-8')
     with f:
         # Binding redirects are stored as a named tuple, so bring the namedtuple
         # class into scope for parsing the TOC.
@@ -28,7 +28,7 @@
     	#include <netinet/in.h>  // ntohl
     #endif
     #include <stdlib.h>  // malloc
-    #include <string.h>  // strncmp, strcpy, strcat
+    #include <string.h>  // strncmp, strcpy, strcat, memcpy
     #include <sys/stat.h>  // fchmod
 #endif
 #include <stddef.h>  // ptrdiff_t
@@ -46,6 +46,8 @@
 
 /* Magic number to verify archive data are bundled correctly. */
 #define MAGIC "MEI\014\013\012\013\016"
+#define TOC_INDEX_MAGIC "MEI\014\013IDX"
+#define TOC_INDEX_VERSION 1
 
 
 /*
@@ -88,11 +90,11 @@ static void pyi_arch_close_fp(ARCHIVE_STATUS *status)
 	}
 }
 
-/* 
- * Decompress data in buff, described by ptoc.
+/*
+ * Inflate zlib compressed data in buff, described by ptoc.
  * Return in malloc'ed buffer (needs to be freed)
  */
-static unsigned char *decompress(unsigned char * buff, TOC *ptoc)
+static unsigned char *decompress_zlib(unsigned char * buff, TOC *ptoc)
 {
 	const char *ver;
 	unsigned char *out;
@@ -121,11 +123,14 @@ static unsigned char *decompress(unsigned char * buff, TOC *ptoc)
 		}
 		else {
 			OTHERERROR("Error %d from inflate: %s\n", rc, zstream.msg);
+			(inflateEnd)(&zstream);
+			free(out);
 			return NULL;
 		}
 	}
 	else {
 		OTHERERROR("Error %d from inflateInit: %s\n", rc, zstream.msg);
+		free(out);
 		return NULL;
 	}
 
@@ -134,31 +139,159 @@ static unsigned char *decompress(unsigned char * buff, TOC *ptoc)
 
 
 /*
- * Extract an archive entry.
- * Returns pointer to the data (must be freed).
+ * Read the length of a literal run or match continued in extra bytes
+ * (each byte 255 means another byte follows).
+ * Return -1 if the input ends prematurely.
  */
-unsigned char *pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
+static int lz4_read_length(const unsigned char **ip, const unsigned char *iend,
+                           size_t *length)
 {
-	unsigned char *data;
-	unsigned char *tmp;
+	unsigned int s;
 
-	if (pyi_arch_open_fp(status) != 0) {
-		OTHERERROR("Cannot open archive file\n");
+	do {
+		if (*ip >= iend) {
+			return -1;
+		}
+		s = *(*ip)++;
+		*length += s;
+	} while (s == 255);
+	return 0;
+}
+
+
+/*
+ * Decompress a LZ4 block in buff, described by ptoc.
+ *
+ * The block is a sequence of a token byte (literal length in the high
+ * nibble, match length - 4 in the low one), optional extra length bytes,
+ * the literals, a 2-byte little-endian match offset and optional extra
+ * match length bytes. The last sequence consists of literals only.
+ * See https://github.com/lz4/lz4/blob/dev/doc/lz4_Block_format.md
+ *
+ * Return in malloc'ed buffer (needs to be freed)
+ */
+static unsigned char *decompress_lz4(unsigned char * buff, TOC *ptoc)
+{
+	const unsigned char *ip = buff;
+	const unsigned char *iend = buff + ntohl(ptoc->len);
+	const unsigned char *match;
+	unsigned char *out;
+	unsigned char *op;
+	unsigned char *oend;
+	unsigned int token;
+	size_t length, offset;
+	size_t ulen = ntohl(ptoc->ulen);
+
+	/* malloc(0) may return NULL, an empty entry is no error. */
+	out = (unsigned char *)malloc(ulen ? ulen : 1);
+	if (out == NULL) {
+		OTHERERROR("Error allocating decompression buffer\n");
 		return NULL;
 	}
+	op = out;
+	oend = out + ulen;
+
+	while (ip < iend) {
+		token = *ip++;
+		/* Copy literals. */
+		length = token >> 4;
+		if (length == 15 && lz4_read_length(&ip, iend, &length) < 0) {
+			goto corrupted;
+		}
+		if ((size_t)(iend - ip) < length || (size_t)(oend - op) < length) {
+			goto corrupted;
+		}
+		memcpy(op, ip, length);
+		ip += length;
+		op += length;
+		if (ip == iend) {
+			/* The last sequence has no match. */
+			break;
+		}
+		/* Copy match. */
+		if (iend - ip < 2) {
+			goto corrupted;
+		}
+		offset = ip[0] | (ip[1] << 8);
+		ip += 2;
+		if (offset == 0 || offset > (size_t)(op - out)) {
+			goto corrupted;
+		}
+		length = token & 15;
+		if (length == 15 && lz4_read_length(&ip, iend, &length) < 0) {
+			goto corrupted;
+		}
+		length += 4;
+		if ((size_t)(oend - op) < length) {
+			goto corrupted;
+		}
+		match = op - offset;
+		if (offset >= length) {
+			memcpy(op, match, length);
+			op += length;
+		}
+		else {
+			/* Overlapping match repeats the last 'offset' bytes. */
+			while (length--) {
+				*op++ = *match++;
+			}
+		}
+	}
 
-	fseek(status->fp, status->pkgstart + ntohl(ptoc->pos), SEEK_SET);
+	if (op != oend) {
+		goto corrupted;
+	}
+	return out;
+
+corrupted:
+	OTHERERROR("Corrupted LZ4 data\n");
+	free(out);
+	return NULL;
+}
+
+
+/*
+ * Decompress data in buff, described by ptoc.
+ * Return in malloc'ed buffer (needs to be freed)
+ */
+static unsigned char *decompress(unsigned char * buff, TOC *ptoc)
+{
+	switch (ptoc->cflag) {
+	case ARCHIVE_COMPRESSION_ZLIB:
+		return decompress_zlib(buff, ptoc);
+	case ARCHIVE_COMPRESSION_LZ4:
+		return decompress_lz4(buff, ptoc);
+	default:
+		OTHERERROR("Unknown compression %d\n", ptoc->cflag);
+		return NULL;
+	}
+}
+
+
+/*
+ * Extract an archive entry reading from the passed file, which must be
+ * the opened archive. Threads extracting entries at the same time each
+ * use their own file.
+ * Returns pointer to the data (must be freed).
+ */
+unsigned char *pyi_arch_extract_fp(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc)
+{
+	unsigned char *data;
+	unsigned char *tmp;
+
+	fseek(fp, status->pkgstart + ntohl(ptoc->pos), SEEK_SET);
 	data = (unsigned char *)malloc(ntohl(ptoc->len));
 	if (data == NULL) {
 		OTHERERROR("Could not allocate read buffer\n");
 		return NULL;
 	}
-	if (fread(data, ntohl(ptoc->len), 1, status->fp) < 1) {
+	if (fread(data, ntohl(ptoc->len), 1, fp) < 1) {
 	    OTHERERROR("Could not read from file\n");
+	    free(data);
 	    return NULL;
 	}
 
-	if (ptoc->cflag == '\1') {
+	if (ptoc->cflag != ARCHIVE_COMPRESSION_STORED) {
 		tmp = decompress(data, ptoc);
 		free(data);
 		data = tmp;
@@ -168,11 +301,56 @@ unsigned char *pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
 		}
 	}
 
+	return data;
+}
+
+
+/*
+ * Extract an archive entry.
+ * Returns pointer to the data (must be freed).
+ */
+unsigned char *pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
+{
+	unsigned char *data;
+
+	if (pyi_arch_open_fp(status) != 0) {
+		OTHERERROR("Cannot open archive file\n");
+		return NULL;
+	}
+
+	data = pyi_arch_extract_fp(status, status->fp, ptoc);
+	if (data == NULL) {
+		return NULL;
+	}
+
 	pyi_arch_close_fp(status);
 	return data;
 }
 
 
+/*
+ * Write the extracted data of an archive entry to the file opened by
+ * pyi_open_target() and close it.
+ */
+int pyi_arch_write_target(FILE *out, TOC *ptoc, unsigned char *data)
+{
+	size_t result, len;
+
+	len = ntohl(ptoc->ulen);
+	result = fwrite(data, len, 1, out);
+	if((1 != result) && (len > 0)) {
+		FATALERROR("Failed to write all bytes for %s\n", ptoc->name);
+		fclose(out);
+		return -1;
+	}
+#ifndef WIN32
+	fchmod(fileno(out), S_IRUSR | S_IWUSR | S_IXUSR);
+#endif
+	fclose(out);
+	return 0;
+}
+
+
 /*
  * Extract from the archive and copy to the filesystem.
  * The path is relative to the directory the archive is in.
@@ -180,7 +358,6 @@ unsigned char *pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
 int pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc)
 {
 	FILE *out;
-	size_t result, len;
 	unsigned char *data = pyi_arch_extract(status, ptoc);
 
     /* Create tmp dir _MEIPASSxxx. */
@@ -189,21 +366,12 @@ int pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc)
     }
 
 	out = pyi_open_target(status->temppath, ptoc->name);
-	len = ntohl(ptoc->ulen);
 	if (out == NULL)  {
 		FATALERROR("%s could not be extracted!\n", ptoc->name);
 		return -1;
 	}
-	else {
-		result = fwrite(data, len, 1, out);
-		if((1 != result) && (len > 0)) {
-			FATALERROR("Failed to write all bytes for %s\n", ptoc->name);
-			return -1;
-		}
-#ifndef WIN32
-		fchmod(fileno(out), S_IRUSR | S_IWUSR | S_IXUSR);
-#endif
-        fclose(out);
+	if (pyi_arch_write_target(out, ptoc, data)) {
+		return -1;
 	}
 	free(data);
 
@@ -211,6 +379,144 @@ int pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc)
 }
 
 
+/*
+ * Read the name index stored between the TOC and the cookie. Without a valid
+ * index, entries are looked up by scanning the whole TOC.
+ */
+static void pyi_arch_load_index(ARCHIVE_STATUS *status)
+{
+	TOC_INDEX_COOKIE index_cookie;
+	int toclen = ntohl(status->cookie.TOClen);
+	int tocend = status->pkgstart + ntohl(status->cookie.TOC) + toclen;
+	int indexend = status->pkgstart + ntohl(status->cookie.len) - (int) sizeof(COOKIE);
+	int count;
+	int i;
+
+	if (indexend - (int) sizeof(TOC_INDEX_COOKIE) < tocend)
+		return;
+	if (fseek(status->fp, indexend - (int) sizeof(TOC_INDEX_COOKIE), SEEK_SET))
+		return;
+	if (fread(&index_cookie, sizeof(TOC_INDEX_COOKIE), 1, status->fp) < 1)
+		return;
+	if (strncmp(index_cookie.magic, TOC_INDEX_MAGIC, strlen(TOC_INDEX_MAGIC)) ||
+			ntohl(index_cookie.version) != TOC_INDEX_VERSION) {
+		VS("LOADER: Archive has no name index\n");
+		return;
+	}
+	count = ntohl(index_cookie.count);
+	if (count <= 0 || tocend + count * (int) sizeof(int) +
+			(int) sizeof(TOC_INDEX_COOKIE) != indexend)
+		return;
+
+	status->tocindex = (int *) malloc(count * sizeof(int));
+	if (status->tocindex == NULL)
+		return;
+	if (fseek(status->fp, tocend, SEEK_SET) ||
+			fread(status->tocindex, count * sizeof(int), 1, status->fp) < 1) {
+		free(status->tocindex);
+		status->tocindex = NULL;
+		return;
+	}
+	for (i = 0; i < count; i++) {
+		status->tocindex[i] = ntohl(status->tocindex[i]);
+		if (status->tocindex[i] < 0 || status->tocindex[i] >= toclen) {
+			VS("LOADER: Ignoring corrupted name index\n");
+			free(status->tocindex);
+			status->tocindex = NULL;
+			return;
+		}
+	}
+	status->tocindexlen = count;
+}
+
+
+/*
+ * Return the position in the name index of the first entry with a name not
+ * less than the given one.
+ */
+static int _find_in_index(ARCHIVE_STATUS *status, const char *name)
+{
+	TOC *ptoc;
+	int lo = 0;
+	int hi = status->tocindexlen;
+	int mid;
+
+	while (lo < hi) {
+		mid = lo + (hi - lo) / 2;
+		ptoc = (TOC *) ((char *) status->tocbuff + status->tocindex[mid]);
+		if (strcmp(ptoc->name, name) < 0)
+			lo = mid + 1;
+		else
+			hi = mid;
+	}
+	return lo;
+}
+
+
+/*
+ * Return the entry at position 'pos' of the name index if it has the given
+ * name, else NULL.
+ */
+static TOC *_index_entry(ARCHIVE_STATUS *status, int pos, const char *name)
+{
+	TOC *ptoc;
+
+	if (pos >= status->tocindexlen)
+		return NULL;
+	ptoc = (TOC *) ((char *) status->tocbuff + status->tocindex[pos]);
+	return strcmp(ptoc->name, name) == 0 ? ptoc : NULL;
+}
+
+
+/*
+ * Return the first TOC entry with the given name or NULL if there is none.
+ * Uses binary search when the archive has a name index.
+ */
+TOC *pyi_arch_find_by_name(ARCHIVE_STATUS *status, const char *name)
+{
+	TOC *ptoc;
+
+	if (status->tocindex == NULL) {
+		for (ptoc = status->tocbuff; ptoc < status->tocend;
+				ptoc = pyi_arch_increment_toc_ptr(status, ptoc)) {
+			if (strcmp(ptoc->name, name) == 0)
+				return ptoc;
+		}
+		return NULL;
+	}
+	return _index_entry(status, _find_in_index(status, name), name);
+}
+
+
+/*
+ * Return the next TOC entry after 'ptoc', in TOC order, with the same name
+ * or NULL if there is none. Entries with equal names are adjacent in the
+ * name index and keep their TOC order there.
+ */
+TOC *pyi_arch_find_next_by_name(ARCHIVE_STATUS *status, TOC *ptoc)
+{
+	TOC *next;
+	int offset = (int) ((char *) ptoc - (char *) status->tocbuff);
+	int pos;
+
+	if (status->tocindex == NULL) {
+		for (next = pyi_arch_increment_toc_ptr(status, ptoc);
+				next < status->tocend;
+				next = pyi_arch_increment_toc_ptr(status, next)) {
+			if (strcmp(next->name, ptoc->name) == 0)
+				return next;
+		}
+		return NULL;
+	}
+	for (pos = _find_in_index(status, ptoc->name);
+			_index_entry(status, pos, ptoc->name) != NULL; pos++) {
+		if (status->tocindex[pos] == offset)
+			return _index_entry(status, pos + 1, ptoc->name);
+	}
+	return NULL;
+}
+
+
 /*
  * Look for a predefined value in the embedded data.
  *
@@ -336,6 +642,8 @@ int pyi_arch_open(ARCHIVE_STATUS *status)
 #endif
 	int filelen;
     VS("LOADER: archivename is %s\n", status->archivename);
+	status->tocindex = NULL;
+	status->tocindexlen = 0;
 	/* Physically open the file */
 	if (pyi_arch_open_fp(status) != 0) {
 		VS("LOADER: Cannot open archive: %s\n", status->archivename);
@@ -394,6 +702,9 @@ int pyi_arch_open(ARCHIVE_STATUS *status)
 	}
 	status->tocend = (TOC *) (((char *)status->tocbuff) + ntohl(status->cookie.TOClen));
 
+	/* Read the name index following the TOC. */
+	pyi_arch_load_index(status);
+
 	/* Check input file is still ok (should be). */
 	if (ferror(status->fp))
 	{
@@ -487,6 +798,9 @@ void pyi_arch_status_free_memory(ARCHIVE_STATUS *archive_status)
         if (archive_status->tocbuff != NULL) {
             free(archive_status->tocbuff);
         }
+        if (archive_status->tocindex != NULL) {
+            free(archive_status->tocindex);
+        }
         /* Close file handler */
         pyi_arch_close_fp(archive_status);
         free(archive_status);
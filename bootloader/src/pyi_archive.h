@@ -29,13 +29,18 @@
 #define ARCHIVE_ITEM_DATA             'x'  /* data */
 #define ARCHIVE_ITEM_RUNTIME_OPTION   'o'  /* runtime option */
 
+/* Compression of CArchive items (TOC.cflag). */
+#define ARCHIVE_COMPRESSION_STORED    '\0'  /* not compressed */
+#define ARCHIVE_COMPRESSION_ZLIB      '\1'  /* zlib (deflate) */
+#define ARCHIVE_COMPRESSION_LZ4       '\2'  /* LZ4 block without size prefix */
+
 /* TOC entry for a CArchive */
 typedef struct _toc {
     int structlen;    /*len of this one - including full len of name */
     int pos;          /* pos rel to start of concatenation */
     int len;          /* len of the data (compressed) */
     int ulen;         /* len of data (uncompressed) */
-    char cflag;       /* is it compressed (really a byte) */
+    char cflag;       /* compression, ARCHIVE_COMPRESSION_* (really a byte) */
     char typcd;       /* type code -'b' binary, 'z' zlib, 'm' module,
                        * 's' script (v3),'x' data, 'o' runtime option  */
     char name[1];    /* the name to save it as */
@@ -52,11 +57,25 @@ typedef struct _cookie {
     char pylibname[64];    /* Filename of Python dynamic library e.g. python2.7.dll. */
 } COOKIE;
 
+/*
+ * Trailer of the name index, which is stored between the TOC and the cookie.
+ * The index is an array of 'count' offsets of TOC entries (relative to the
+ * start of the TOC) sorted by the names of the entries. Archives created by
+ * older versions of PyInstaller have no index.
+ */
+typedef struct _toc_index_cookie {
+    char magic[8]; /* 'MEI\014\013IDX' */
+    int  version;  /* 1 */
+    int  count;    /* count of offsets in the index */
+} TOC_INDEX_COOKIE;
+
 typedef struct _archive_status {
     FILE    *fp;
     int     pkgstart;
     TOC     *tocbuff;
     TOC     *tocend;
+    int     *tocindex;    /* sorted name index or NULL */
+    int     tocindexlen;  /* count of entries in tocindex */
     COOKIE  cookie;
     /*
      * On Windows:
@@ -85,6 +104,12 @@ typedef struct _archive_status {
      * in this mode.
      */
     bool  has_temp_directory;
+    /*
+     * Flag if the temporary directory is a persistent cache of the extracted
+     * files, reused by later runs (runtime option 'pyi-extraction-cache').
+     * Such a directory is not removed on exit.
+     */
+    bool  is_temp_directory_cached;
     /*
      * Flag if Python library was loaded. This indicates if it is safe
      * to call function PI_Py_Finalize(). If Python dll is missing 
@@ -104,7 +129,11 @@ typedef struct _archive_status {
 TOC *pyi_arch_increment_toc_ptr(ARCHIVE_STATUS *status, TOC* ptoc);
 
 unsigned char *pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc);
+unsigned char *pyi_arch_extract_fp(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc);
+int pyi_arch_write_target(FILE *out, TOC *ptoc, unsigned char *data);
 int pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc);
+TOC *pyi_arch_find_by_name(ARCHIVE_STATUS *status, const char *name);
+TOC *pyi_arch_find_next_by_name(ARCHIVE_STATUS *status, TOC *ptoc);
 
 /**
  * Helpers for embedders
@@ -23,10 +23,20 @@
 
 #ifdef _WIN32
     #include <windows.h>
+    #include <process.h>  // _beginthreadex
+    #include <winsock.h>  // ntohl
 #else
     #include <langinfo.h>  // CODESET, nl_langinfo
     #include <limits.h>  // PATH_MAX
+    #ifdef __FreeBSD__
+    	// freebsd issue #188316
+    	#include <arpa/inet.h>  // ntohl
+    #else
+    	#include <netinet/in.h>  // ntohl
+    #endif
+    #include <pthread.h>  // pthread_create, pthread_mutex_lock
     #include <stdlib.h>  // malloc
+    #include <unistd.h>  // sysconf
 #endif
 #include <locale.h>  // setlocale
 #include <stdarg.h>
@@ -49,6 +59,51 @@
 /* Max count of possible opened archives in multipackage mode. */
 #define _MAX_ARCHIVE_POOL_LEN 20
 
+/* Max count of threads extracting binaries in onefile mode. */
+#define _MAX_EXTRACT_WORKERS 64
+
+/* File in the extraction cache holding the digest of the archive. */
+#define _CACHE_MARKER_NAME "pyi-extraction-cache"
+
+/* Not defined by MSVC. */
+#ifndef S_ISDIR
+    #define S_ISDIR(m) (((m) & S_IFMT) == S_IFDIR)
+#endif
+
+/* Minimal portable threads for the parallel extraction. */
+#ifdef _WIN32
+    typedef CRITICAL_SECTION pyi_mutex_t;
+    typedef HANDLE pyi_thread_t;
+    /* Threads calling CRT functions are started with _beginthreadex(). */
+    #define PYI_THREAD_FUNC unsigned __stdcall
+    #define pyi_mutex_init(m) InitializeCriticalSection(m)
+    #define pyi_mutex_destroy(m) DeleteCriticalSection(m)
+    #define pyi_mutex_lock(m) EnterCriticalSection(m)
+    #define pyi_mutex_unlock(m) LeaveCriticalSection(m)
+#else
+    typedef pthread_mutex_t pyi_mutex_t;
+    typedef pthread_t pyi_thread_t;
+    #define PYI_THREAD_FUNC void *
+    #define pyi_mutex_init(m) pthread_mutex_init(m, NULL)
+    #define pyi_mutex_destroy(m) pthread_mutex_destroy(m)
+    #define pyi_mutex_lock(m) pthread_mutex_lock(m)
+    #define pyi_mutex_unlock(m) pthread_mutex_unlock(m)
+#endif
+
+/* State shared by the threads extracting binaries. */
+typedef struct _extract_job {
+    ARCHIVE_STATUS *status;
+    TOC **entries;      /* Entries to extract. */
+    int count;          /* Count of entries. */
+    int next;           /* Index of the next entry to extract. */
+    int failed;         /* Set if extracting any entry failed. */
+    /*
+     * Protects 'next' and 'failed' and serializes pyi_open_target(), which
+     * creates the directories of the entries and is not thread-safe.
+     */
+    pyi_mutex_t lock;
+} EXTRACT_JOB;
+
 /*
  * The functions in this file defined in reverse order so that forward
  * declarations are not necessary.
@@ -156,15 +211,15 @@ static ARCHIVE_STATUS *_get_archive(ARCHIVE_STATUS *archive_pool[], const char *
 /* Extract a file identifed by filename from the archive associated to status. */
 static int extractDependencyFromArchive(ARCHIVE_STATUS *status, const char *filename)
 {
-	TOC * ptoc = status->tocbuff;
+	TOC * ptoc;
 	VS("LOADER: Extracting dependencies from archive\n");
-	while (ptoc < status->tocend) {
-		if (strcmp(ptoc->name, filename) == 0) {
-			if (pyi_arch_extract2fs(status, ptoc)) {
-				return -1;
-            }
-        }
-		ptoc = pyi_arch_increment_toc_ptr(status, ptoc);
+	/* Extract all entries of that name, like the linear scan did. */
+	ptoc = pyi_arch_find_by_name(status, filename);
+	while (ptoc != NULL) {
+		if (pyi_arch_extract2fs(status, ptoc)) {
+			return -1;
+		}
+		ptoc = pyi_arch_find_next_by_name(status, ptoc);
 	}
 	return 0;
 }
@@ -253,6 +308,392 @@ int pyi_launch_need_to_extract_binaries(ARCHIVE_STATUS *archive_status)
 	return false;
 }
 
+/*
+ * Return the count of threads to use for extracting binaries, as set by the
+ * runtime option 'pyi-extract-workers N'. Zero means one thread per CPU.
+ * Without the option binaries are extracted by the main thread only.
+ */
+static int _get_extract_workers(ARCHIVE_STATUS *archive_status)
+{
+    char *value = pyi_arch_get_option(archive_status, "pyi-extract-workers");
+    int workers;
+#ifdef _WIN32
+    SYSTEM_INFO sysinfo;
+#endif
+
+    if (value == NULL) {
+        return 1;
+    }
+    workers = atoi(value);
+    if (workers <= 0) {
+#ifdef _WIN32
+        GetSystemInfo(&sysinfo);
+        workers = sysinfo.dwNumberOfProcessors;
+#else
+        workers = (int) sysconf(_SC_NPROCESSORS_ONLN);
+#endif
+    }
+    if (workers < 1) {
+        workers = 1;
+    }
+    if (workers > _MAX_EXTRACT_WORKERS) {
+        workers = _MAX_EXTRACT_WORKERS;
+    }
+    return workers;
+}
+
+
+/*
+ * Return true if the entry has to be extracted before running the Python
+ * code. With the runtime option 'pyi-lazy-data' data files (type 'x') stay
+ * in the archive and the frozen app extracts them on first use, see
+ * CArchiveDataReader in pyimod02_archive. Python cannot decompress LZ4, so
+ * such data files are extracted anyway.
+ */
+static int _is_extracted(TOC *ptoc, int lazy_data)
+{
+    if (ptoc->typcd == ARCHIVE_ITEM_DATA) {
+        return !lazy_data || ptoc->cflag == ARCHIVE_COMPRESSION_LZ4;
+    }
+    return ptoc->typcd == ARCHIVE_ITEM_BINARY || ptoc->typcd == ARCHIVE_ITEM_ZIPFILE;
+}
+
+
+/*
+ * Thread extracting entries of the job until all are done or extracting
+ * any of them fails. Each thread reads the archive through its own file.
+ */
+static PYI_THREAD_FUNC _extract_worker(void *arg)
+{
+    EXTRACT_JOB *job = (EXTRACT_JOB *) arg;
+    ARCHIVE_STATUS *status = job->status;
+    unsigned char *data;
+    TOC *ptoc;
+    FILE *fp;
+    FILE *out;
+    int failed = 0;
+
+    fp = pyi_path_fopen(status->archivename, "rb");
+    if (fp == NULL) {
+        OTHERERROR("Cannot open archive file\n");
+        failed = 1;
+    }
+
+    while (!failed) {
+        pyi_mutex_lock(&job->lock);
+        if (job->failed || job->next >= job->count) {
+            pyi_mutex_unlock(&job->lock);
+            break;
+        }
+        ptoc = job->entries[job->next++];
+        pyi_mutex_unlock(&job->lock);
+
+        data = pyi_arch_extract_fp(status, fp, ptoc);
+        if (data == NULL) {
+            failed = 1;
+            break;
+        }
+        pyi_mutex_lock(&job->lock);
+        out = pyi_open_target(status->temppath, ptoc->name);
+        pyi_mutex_unlock(&job->lock);
+        if (out == NULL) {
+            FATALERROR("%s could not be extracted!\n", ptoc->name);
+            failed = 1;
+        }
+        else if (pyi_arch_write_target(out, ptoc, data)) {
+            failed = 1;
+        }
+        free(data);
+    }
+
+    if (fp != NULL) {
+        pyi_path_fclose(fp);
+    }
+    if (failed) {
+        pyi_mutex_lock(&job->lock);
+        job->failed = 1;
+        pyi_mutex_unlock(&job->lock);
+    }
+    return 0;
+}
+
+
+/*
+ * Extract all binaries (type 'b'), data files (type 'x') and zipfiles
+ * (type 'Z') with the passed count of threads.
+ */
+static int _extract_binaries_parallel(ARCHIVE_STATUS *archive_status, int workers,
+                                      int lazy_data)
+{
+    EXTRACT_JOB job;
+    pyi_thread_t threads[_MAX_EXTRACT_WORKERS];
+    int started = 0;
+    int i;
+    TOC *ptoc = archive_status->tocbuff;
+
+    /* Create tmp dir _MEIPASSxxx before starting the threads. */
+    if (pyi_create_temp_path(archive_status) == -1) {
+        return -1;
+    }
+
+    memset(&job, 0, sizeof(job));
+    job.status = archive_status;
+    /* Entry count is an upper bound of the entries to extract. */
+    for (i = 0; ptoc < archive_status->tocend; i++) {
+        ptoc = pyi_arch_increment_toc_ptr(archive_status, ptoc);
+    }
+    job.entries = (TOC **) malloc(sizeof(TOC *) * (i + 1));
+    if (job.entries == NULL) {
+        FATALERROR("Could not allocate memory for extraction\n");
+        return -1;
+    }
+    ptoc = archive_status->tocbuff;
+    while (ptoc < archive_status->tocend) {
+        if (_is_extracted(ptoc, lazy_data)) {
+            job.entries[job.count++] = ptoc;
+        }
+        ptoc = pyi_arch_increment_toc_ptr(archive_status, ptoc);
+    }
+    if (workers > job.count) {
+        workers = job.count;
+    }
+    VS("LOADER: Extracting %d binaries with %d threads\n", job.count, workers);
+
+    pyi_mutex_init(&job.lock);
+    for (i = 0; i < workers; i++) {
+#ifdef _WIN32
+        threads[started] = (HANDLE) _beginthreadex(NULL, 0, _extract_worker,
+                                                   &job, 0, NULL);
+        if (threads[started] == 0) {
+            break;
+        }
+#else
+        if (pthread_create(&threads[started], NULL, _extract_worker, &job) != 0) {
+            break;
+        }
+#endif
+        started++;
+    }
+    if (started == 0 && job.count > 0) {
+        /* Could not start any thread, extract in this one. */
+        _extract_worker(&job);
+    }
+    for (i = 0; i < started; i++) {
+#ifdef _WIN32
+        WaitForSingleObject(threads[i], INFINITE);
+        CloseHandle(threads[i]);
+#else
+        pthread_join(threads[i], NULL);
+#endif
+    }
+    pyi_mutex_destroy(&job.lock);
+    free(job.entries);
+
+    return job.failed ? -1 : 0;
+}
+
+
+/*
+ * Cache of the extracted files (runtime option 'pyi-extraction-cache').
+ *
+ * The files are extracted to a new temporary directory as usual. This
+ * directory is then renamed to '_MEI' followed by the digest of the archive,
+ * so later runs of the same executable find the files there and skip the
+ * extraction. Renaming is atomic: when several processes start at once, each
+ * of them extracts to its own directory, only the first rename succeeds and
+ * the others switch to the cache created by the winner.
+ *
+ * The digest is also written to a marker file in the directory after all
+ * files were extracted. A directory without it is not reused.
+ */
+
+/*
+ * Store the path of the cache directory of this archive in 'cachepath'.
+ * The cache is next to the temporary directory, which is created by this
+ * function. Return 1 if the extraction cache is used, 0 if not and -1 on
+ * error.
+ */
+static int _get_cache_path(ARCHIVE_STATUS *status, char *cachepath)
+{
+    char *digest;
+    char tempdir[PATH_MAX];
+    char name[PATH_MAX];
+    TOC *ptoc = status->tocbuff;
+
+    if (pyi_arch_get_option(status, "pyi-extraction-cache") == NULL) {
+        return 0;
+    }
+    digest = pyi_arch_get_option(status, "pyi-archive-digest");
+    if (digest == NULL || strlen(digest) == 0 || strlen(digest) > 64) {
+        VS("LOADER: Archive digest missing, not using the extraction cache\n");
+        return 0;
+    }
+    if (!pyi_launch_need_to_extract_binaries(status)) {
+        return 0;
+    }
+    /* Files from other executables are not covered by the digest. */
+    while (ptoc < status->tocend) {
+        if (ptoc->typcd == ARCHIVE_ITEM_DEPENDENCY) {
+            VS("LOADER: Archive has dependencies, not using the extraction cache\n");
+            return 0;
+        }
+        ptoc = pyi_arch_increment_toc_ptr(status, ptoc);
+    }
+
+    if (pyi_create_temp_path(status) == -1) {
+        return -1;
+    }
+    pyi_path_dirname(tempdir, status->temppath);
+    strcpy(name, "_MEI");
+    strcat(name, digest);
+    pyi_path_join(cachepath, tempdir, name);
+    return 1;
+}
+
+
+/*
+ * Write the digest of the archive to the marker file in the directory
+ * 'dirpath'. Return 0 on success and -1 on error.
+ */
+static int _write_cache_marker(ARCHIVE_STATUS *status, const char *dirpath)
+{
+    char path[PATH_MAX];
+    char *digest = pyi_arch_get_option(status, "pyi-archive-digest");
+    FILE *fp;
+    int rc = 0;
+
+    pyi_path_join(path, dirpath, _CACHE_MARKER_NAME);
+    fp = pyi_path_fopen(path, "wb");
+    if (fp == NULL) {
+        return -1;
+    }
+    if (fputs(digest, fp) < 0) {
+        rc = -1;
+    }
+    if (fclose(fp) != 0) {
+        rc = -1;
+    }
+    return rc;
+}
+
+
+/*
+ * Return true if the marker file in the cache directory holds the digest
+ * of the archive.
+ */
+static int _has_cache_marker(ARCHIVE_STATUS *status, const char *cachepath)
+{
+    char path[PATH_MAX];
+    char buf[65];
+    char *digest = pyi_arch_get_option(status, "pyi-archive-digest");
+    size_t len;
+    FILE *fp;
+
+    pyi_path_join(path, cachepath, _CACHE_MARKER_NAME);
+    fp = pyi_path_fopen(path, "rb");
+    if (fp == NULL) {
+        return false;
+    }
+    len = fread(buf, 1, sizeof(buf) - 1, fp);
+    fclose(fp);
+    buf[len] = '\0';
+    return strcmp(buf, digest) == 0;
+}
+
+
+/*
+ * Check that the cache directory belongs to the current user, that its
+ * marker file holds the digest of the archive and that it contains all files
+ * of the archive with the right size. Cleanup jobs may remove single files
+ * from temporary directories at any time.
+ */
+static int _is_valid_cache(ARCHIVE_STATUS *status, const char *cachepath,
+                           int lazy_data)
+{
+    struct stat sbuf;
+    char path[PATH_MAX];
+    TOC *ptoc = status->tocbuff;
+
+    if (stat(cachepath, &sbuf) != 0 || !S_ISDIR(sbuf.st_mode)) {
+        return false;
+    }
+#ifndef _WIN32
+    /* Anyone may create directories in /tmp. */
+    if (sbuf.st_uid != geteuid() || (sbuf.st_mode & (S_IWGRP | S_IWOTH))) {
+        VS("LOADER: Extraction cache %s is not private, ignoring it\n", cachepath);
+        return false;
+    }
+#endif
+    if (!_has_cache_marker(status, cachepath)) {
+        VS("LOADER: Extraction cache %s is incomplete\n", cachepath);
+        return false;
+    }
+    while (ptoc < status->tocend) {
+        if (_is_extracted(ptoc, lazy_data)) {
+            pyi_path_join(path, cachepath, ptoc->name);
+            if (stat(path, &sbuf) != 0 || sbuf.st_size != (int) ntohl(ptoc->ulen)) {
+                VS("LOADER: Extraction cache is missing %s\n", ptoc->name);
+                return false;
+            }
+        }
+        ptoc = pyi_arch_increment_toc_ptr(status, ptoc);
+    }
+    return true;
+}
+
+
+/*
+ * Switch from the temporary directory to the cache directory.
+ */
+static void _use_cache(ARCHIVE_STATUS *status, const char *cachepath)
+{
+    strcpy(status->temppath, cachepath);
+    status->is_temp_directory_cached = true;
+}
+
+
+/*
+ * Move the temporary directory with the extracted files to the cache. If
+ * another process created the cache meanwhile, use that one instead. If
+ * moving fails, keep running from the temporary directory.
+ */
+static void _store_in_cache(ARCHIVE_STATUS *status, const char *cachepath,
+                            int lazy_data)
+{
+    char stalepath[PATH_MAX];
+
+    /* Written last, after all the other files. */
+    if (_write_cache_marker(status, status->temppath) == -1) {
+        VS("LOADER: Cannot write the marker of the extraction cache\n");
+        return;
+    }
+    if (rename(status->temppath, cachepath) == 0) {
+        VS("LOADER: Created extraction cache %s\n", cachepath);
+        _use_cache(status, cachepath);
+        return;
+    }
+    if (_is_valid_cache(status, cachepath, lazy_data)) {
+        VS("LOADER: Extraction cache %s created by another process\n", cachepath);
+        pyi_remove_temp_path(status->temppath);
+        _use_cache(status, cachepath);
+        return;
+    }
+    /* Replace a damaged cache. Move it aside first to keep the window short. */
+    strcpy(stalepath, status->temppath);
+    strcat(stalepath, "-stale");
+    if (rename(cachepath, stalepath) == 0) {
+        pyi_remove_temp_path(stalepath);
+    }
+    if (rename(status->temppath, cachepath) == 0) {
+        VS("LOADER: Replaced extraction cache %s\n", cachepath);
+        _use_cache(status, cachepath);
+    }
+    else {
+        VS("LOADER: Cannot create extraction cache %s\n", cachepath);
+    }
+}
+
+
 /*
  * Extract all binaries (type 'b') and all data files (type 'x') to the filesystem
  * and checks for dependencies (type 'd'). If dependencies are found, extract them.
@@ -264,6 +705,10 @@ int pyi_launch_need_to_extract_binaries(ARCHIVE_STATUS *archive_status)
 int pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
 {
     int retcode = 0;
+    int workers;
+    int cached;
+    int lazy_data;
+    char cachepath[PATH_MAX];
     ptrdiff_t index = 0;
 
     /*
@@ -278,12 +723,45 @@ int pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
     /* Current process is the 1st item. */
     archive_pool[0] = archive_status;
 
+    lazy_data = pyi_arch_get_option(archive_status, "pyi-lazy-data") != NULL;
+    cached = _get_cache_path(archive_status, cachepath);
+    if (cached == -1) {
+        return -1;
+    }
+    if (cached && _is_valid_cache(archive_status, cachepath, lazy_data)) {
+        VS("LOADER: Using extraction cache %s\n", cachepath);
+        pyi_remove_temp_path(archive_status->temppath);
+        _use_cache(archive_status, cachepath);
+        return 0;
+    }
+
 	VS("LOADER: Extracting binaries\n");
 
+    /* Data files left in the archive are extracted to the temp dir later. */
+    if (lazy_data && pyi_launch_need_to_extract_binaries(archive_status)) {
+        if (pyi_create_temp_path(archive_status) == -1) {
+            return -1;
+        }
+    }
+
+    /*
+     * With more threads extract the entries of this archive first, then the
+     * dependencies below. The order does not matter, the names differ.
+     */
+    workers = _get_extract_workers(archive_status);
+    if (workers > 1) {
+        if (_extract_binaries_parallel(archive_status, workers, lazy_data)) {
+            return -1;
+        }
+    }
+
 	while (ptoc < archive_status->tocend) {
 		if (ptoc->typcd == ARCHIVE_ITEM_BINARY || ptoc->typcd == ARCHIVE_ITEM_DATA ||
                 ptoc->typcd == ARCHIVE_ITEM_ZIPFILE) {
-			if (pyi_arch_extract2fs(archive_status, ptoc)) {
+			if (workers > 1 || !_is_extracted(ptoc, lazy_data)) {
+				/* Already extracted or left in the archive. */
+			}
+			else if (pyi_arch_extract2fs(archive_status, ptoc)) {
 				retcode = -1;
                 break;  /* No need to extract other items in case of error. */
             }
@@ -302,6 +780,9 @@ int pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
 		ptoc = pyi_arch_increment_toc_ptr(archive_status, ptoc);
 	}
 
+    if (retcode == 0 && cached) {
+        _store_in_cache(archive_status, cachepath, lazy_data);
+    }
 
     /*
      * Free memory allocated for archive_pool data. Do not free memory
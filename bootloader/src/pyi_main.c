@@ -167,7 +167,8 @@ int pyi_main(int argc, char * argv[])
         VS("LOADER: Back to parent (RC: %d)\n", rc);
 
         VS("LOADER: Doing cleanup\n");
-        if (archive_status->has_temp_directory == true)
+        if (archive_status->has_temp_directory == true &&
+                archive_status->is_temp_directory_cached != true)
             pyi_remove_temp_path(archive_status->temppath);
         pyi_arch_status_free_memory(archive_status);
         if (extractionpath != NULL)
@@ -548,6 +548,15 @@ int pyi_pylib_import_modules(ARCHIVE_STATUS *status)
 
 	PI_PySys_SetObject("_MEIPASS", meipass_obj);
 
+	/*
+	 * Tell FrozenImporter that data files were left in the archive, so that
+	 * only apps built with this option read the archive TOC at startup.
+	 */
+	if (pyi_arch_get_option(status, "pyi-lazy-data") != NULL) {
+		VS("LOADER: setting sys._MEILAZYDATA\n");
+		PI_PySys_SetObject("_MEILAZYDATA", PI_Py_BuildValue("i", 1));
+	}
+
 	VS("LOADER: importing modules from CArchive\n");
 
 	/* Get the Python function marshall.load
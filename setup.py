@@ -110,6 +110,7 @@ setup(
             'pyinstaller = PyInstaller.__main__:run',
             'pyi-archive_viewer = PyInstaller.utils.cliutils.archive_viewer:run',
             'pyi-bindepend = PyInstaller.utils.cliutils.bindepend:run',
+            'pyi-clean_cache = PyInstaller.utils.cliutils.clean_cache:run',
             'pyi-grab_version = PyInstaller.utils.cliutils.grab_version:run',
             'pyi-makespec = PyInstaller.utils.cliutils.makespec:run',
             'pyi-set_version = PyInstaller.utils.cliutils.set_version:run',
@@ -0,0 +1,36 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+# With the runtime option 'pyi-lazy-data' the bootloader does not extract
+# the data files. The app reads them from the executable with sys._MEIDATA.
+
+
+import os
+import sys
+
+
+CONTENT = b'Some data of a lazy data file.\n'
+
+path = os.path.join(sys._MEIPASS, 'data.txt')
+if os.path.exists(path):
+    raise SystemExit('data.txt was extracted by the bootloader.')
+if getattr(sys, '_MEIDATA', None) is None:
+    raise SystemExit('sys._MEIDATA is not set.')
+if 'data.txt' not in sys._MEIDATA:
+    raise SystemExit('data.txt is not in sys._MEIDATA.')
+content = sys._MEIDATA.read('data.txt')
+if content != CONTENT:
+    raise SystemExit('Wrong content read: %r' % content)
+if sys._MEIDATA.extract('data.txt') != path:
+    raise SystemExit('data.txt was not extracted to sys._MEIPASS.')
+with open(path, 'rb') as fp:
+    content = fp.read()
+if content != CONTENT:
+    raise SystemExit('Wrong content extracted: %r' % content)
@@ -0,0 +1,38 @@
+# -*- mode: python -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+block_cipher = None
+app_name = 'pyi_lazy_data'
+
+
+a = Analysis(['../scripts/pyi_lazy_data.py'],
+             pathex=[],
+             binaries=None,
+             datas=[('../data/lazy_data/data.txt', '.')],
+             hiddenimports=[],
+             hookspath=None,
+             runtime_hooks=None,
+             excludes=None,
+             cipher=block_cipher)
+pyz = PYZ(a.pure, a.zipped_data,
+             cipher=block_cipher)
+exe = EXE(pyz,
+          a.scripts,
+          a.binaries,
+          a.zipfiles,
+          a.datas,
+          # Leave the data files in the executable.
+          [('pyi-lazy-data', None, 'OPTION')],
+          name=app_name,
+          debug=True,
+          strip=None,
+          upx=False,
+          console=True )
@@ -321,5 +321,10 @@ def test_renamed_exe(pyi_builder):
 def test_osx_override_info_plist(pyi_builder_spec):
     pyi_builder_spec.test_spec('pyi_osx_override_info_plist.spec')
 
+
+# Data files left in the one-file executable are read by the app.
+def test_lazy_data(pyi_builder_spec):
+    pyi_builder_spec.test_spec('pyi_lazy_data.spec')
+
 def test_hook_collect_submodules(pyi_builder, script_dir):
     pyi_builder.test_script('pyi_collect_submodules.py', ['--additional-hooks-dir='+script_dir.join('pyi_hooks').strpath])
@@ -254,3 +254,31 @@ def test_rsub_non_existing():
     assert isinstance(result, TOC)
     expected = list(ELEMS1)
     assert result == expected
+
+def test_by_typecode():
+    toc = TOC(ELEMS1 + ELEMS2)
+    assert toc.by_typecode('BINARY') == [ELEMS1[2]]
+    assert toc.by_typecode('PKG', 'PYMODULE') == [ELEMS1[0], ELEMS2[1]]
+    assert toc.by_typecode('DATA') == []
+    toc.insert(0, ('libz.so.1', '/lib64/libz.so.1', 'BINARY'))
+    assert toc.by_typecode('BINARY') == [toc[0], ELEMS1[2]]
+
+def test_get():
+    toc = TOC(ELEMS1)
+    assert toc.get('_random') == ELEMS1[1]
+    assert toc.get('li-la-lu') is None
+
+def test_list_operations():
+    # Spec files may modify TOCs as plain lists.
+    toc = TOC(ELEMS1)
+    toc += [ELEMS2[0]]
+    toc[0] = ELEMS3[0]
+    del toc[1]
+    assert toc == [ELEMS3[0], ELEMS1[2], ELEMS2[0]]
+    assert toc.filenames == set(['PIL.Image.py', 'libreadline.so.6', 'li-la-lu'])
+    assert toc.by_typecode('PYMODULE') == [ELEMS3[0]]
+    toc.append(ELEMS1[1])
+    toc.append(ELEMS1[2])
+    toc[:] = toc[::-1]
+    assert toc == [ELEMS1[1], ELEMS2[0], ELEMS1[2], ELEMS3[0]]
+    assert toc - ELEMS1 == [ELEMS2[0], ELEMS3[0]]
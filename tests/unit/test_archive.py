@@ -0,0 +1,383 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the archive writers and the compressed blob cache.
+
+import ctypes
+import os
+import random
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from PyInstaller import HOMEPATH
+from PyInstaller.archive.blobcache import CompressedBlobCache
+from PyInstaller.archive.readers import CArchiveReader
+from PyInstaller.archive.writers import CArchiveWriter, CTOC, ZlibArchiveWriter
+from PyInstaller.loader.pyimod02_archive import ZlibArchiveReader, \
+    ArchiveReader, CArchiveDataReader, PYZ_TYPE_MODULE, COMPRESSION_STORED, \
+    COMPRESSION_ZLIB, COMPRESSION_LZ4
+
+
+def _write_pyz(tmpdir, filename, jobs):
+    data_file = tmpdir.join('data.txt')
+    data_file.write('some data\n' * 100)
+    toc = [('mod%03d' % i, 'mod%03d.py' % i, 'PYMODULE') for i in range(50)]
+    toc.append(('pkg', 'pkg/__init__.py', 'PYMODULE'))
+    toc.append(('data.txt', str(data_file), 'DATA'))
+    code_dict = dict((entry[0], compile('x = %r\n' % entry[0], entry[1], 'exec'))
+                     for entry in toc if entry[2] == 'PYMODULE')
+    pyz = tmpdir.join(filename)
+    ZlibArchiveWriter(str(pyz), toc, code_dict=code_dict, jobs=jobs)
+    return pyz.read_binary()
+
+
+def test_parallel_pyz_is_identical(tmpdir):
+    assert _write_pyz(tmpdir, 'seq.pyz', 1) == _write_pyz(tmpdir, 'par.pyz', 4)
+
+
+def _write_pkg(tmpdir, filename, blob_cache):
+    data_file = tmpdir.join('data.bin')
+    data_file.write_binary(b'some data\n' * 1000)
+    toc = [('data.bin', str(data_file), 1, 'x'),
+           ('script', str(data_file), 1, 's')]
+    pkg = tmpdir.join(filename)
+    CArchiveWriter(str(pkg), toc, pylib_name='libpython', blob_cache=blob_cache)
+    return pkg.read_binary()
+
+
+def test_blob_cache(tmpdir):
+    expected = _write_pkg(tmpdir, 'nocache.pkg', None)
+    cache = CompressedBlobCache(str(tmpdir.join('blobs')))
+    assert _write_pkg(tmpdir, 'miss.pkg', cache) == expected
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert _write_pkg(tmpdir, 'hit.pkg', cache) == expected
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_blob_cache_trim(tmpdir):
+    cache = CompressedBlobCache(str(tmpdir.join('blobs')), max_size=0)
+    _write_pkg(tmpdir, 'miss.pkg', cache)
+    cache.trim()
+    _write_pkg(tmpdir, 'miss.pkg', cache)
+    assert cache.misses == 4
+
+
+@pytest.mark.parametrize('compression', [COMPRESSION_STORED, COMPRESSION_ZLIB])
+def test_pyz_compression(tmpdir, compression):
+    code = compile('x = 1\n', 'mod.py', 'exec')
+    pyz = str(tmpdir.join('out.pyz'))
+    ZlibArchiveWriter(pyz, [('mod', 'mod.py', 'PYMODULE')],
+                      code_dict={'mod': code}, compression=compression)
+    reader = ZlibArchiveReader(pyz)
+    assert reader.compression == compression
+    assert reader.extract('mod') == (PYZ_TYPE_MODULE, code)
+
+
+def test_pyz_without_header_version(tmpdir):
+    code = compile('x = 1\n', 'mod.py', 'exec')
+    pyz = tmpdir.join('out.pyz')
+    ZlibArchiveWriter(str(pyz), [('mod', 'mod.py', 'PYMODULE')],
+                      code_dict={'mod': code})
+    # Like archives written before the compression was selectable, with
+    # padding after the encryption flag.
+    data = bytearray(pyz.read_binary())
+    data[ArchiveReader.HDRLEN + 1:ArchiveReader.HDRLEN + 3] = b'\0\0'
+    pyz.write_binary(bytes(data))
+    reader = ZlibArchiveReader(str(pyz))
+    assert reader.compression == COMPRESSION_ZLIB
+    assert reader.extract('mod') == (PYZ_TYPE_MODULE, code)
+
+
+def test_pyz_reader_without_mmap(tmpdir):
+    code = compile('x = 1\n', 'mod.py', 'exec')
+    pyz = str(tmpdir.join('out.pyz'))
+    ZlibArchiveWriter(pyz, [('mod', 'mod.py', 'PYMODULE')],
+                      code_dict={'mod': code})
+    reader = ZlibArchiveReader(pyz)
+    mapped = reader.extract('mod')
+    # Fall back to reading the file.
+    reader._view = None
+    assert reader.extract('mod') == mapped == (PYZ_TYPE_MODULE, code)
+
+
+def _write_lz4_pkg(tmpdir, blob_cache=None):
+    rand = random.Random(0)
+    contents = {
+        'empty.bin': b'',
+        'short.bin': b'abc',
+        'text.bin': b'some data\n' * 1000,
+        'random.bin': bytes(bytearray(rand.randint(0, 255)
+                                      for i in range(70000))),
+    }
+    toc = []
+    for name, content in sorted(contents.items()):
+        tmpdir.join(name).write_binary(content)
+        toc.append((name, str(tmpdir.join(name)), COMPRESSION_LZ4, 'x'))
+    pkg = str(tmpdir.join('out.pkg'))
+    CArchiveWriter(pkg, toc, pylib_name='libpython', blob_cache=blob_cache)
+    return pkg, contents
+
+
+@pytest.mark.parametrize('blob_cache', [False, True])
+def test_lz4_pkg(tmpdir, blob_cache):
+    pytest.importorskip('lz4')
+    cache = CompressedBlobCache(str(tmpdir.join('blobs'))) if blob_cache \
+        else None
+    pkg, contents = _write_lz4_pkg(tmpdir, cache)
+    reader = CArchiveReader(pkg)
+    for name, content in contents.items():
+        ndx = reader.toc.find(name)
+        assert reader.toc.get(ndx)[3] == COMPRESSION_LZ4
+        assert reader.extract(ndx) == (False, content)
+
+
+def _build_harness(tmpdir, code, source='pyi_archive.c'):
+    """
+    Build a shared library of the bootloader, with the C code `code`
+    appended to its source file `source`.
+    """
+    if sys.platform.startswith('win'):
+        pytest.skip('Building the harness needs a Unix compiler.')
+    srcdir = os.path.join(HOMEPATH, 'bootloader', 'src')
+    zlibdir = os.path.join(HOMEPATH, 'bootloader', 'zlib')
+    harness = tmpdir.join('harness.c')
+    harness.write('#include "%s"\n' % source + code)
+    sources = [os.path.join(srcdir, name) for name in os.listdir(srcdir)
+               if name.endswith('.c') and 'win32' not in name and
+               name not in ('main.c', source)]
+    sources += [os.path.join(zlibdir, name) for name in os.listdir(zlibdir)
+                if name.endswith('.c')]
+    library = str(tmpdir.join('harness.so'))
+    try:
+        subprocess.check_call(['cc', '-shared', '-fPIC', '-w',
+                               '-DHAVE_UNSETENV', '-I', srcdir, '-I', zlibdir,
+                               '-o', library, str(harness)] + sources +
+                              ['-ldl', '-lpthread'])
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip('Cannot build the harness.')
+    return ctypes.CDLL(library)
+
+
+def _build_lz4_decoder(tmpdir):
+    """
+    Build a shared library exposing decompress_lz4() of the bootloader.
+    """
+    decoder = _build_harness(tmpdir, """
+        unsigned char *harness_lz4(unsigned char *buff,
+                                   unsigned int len,
+                                   unsigned int ulen)
+        {
+            TOC toc;
+            toc.len = htonl(len);
+            toc.ulen = htonl(ulen);
+            return decompress_lz4(buff, &toc);
+        }
+        """)
+    decoder.harness_lz4.restype = ctypes.c_void_p
+    decoder.harness_lz4.argtypes = [ctypes.c_char_p, ctypes.c_uint,
+                                   ctypes.c_uint]
+    return decoder
+
+
+def test_lz4_bootloader_decoder(tmpdir):
+    pytest.importorskip('lz4')
+    decoder = _build_lz4_decoder(tmpdir)
+    pkg, contents = _write_lz4_pkg(tmpdir)
+    reader = CArchiveReader(pkg)
+    for name, content in contents.items():
+        dpos, dlen, ulen, flag, typcd, nm = \
+            reader.toc.get(reader.toc.find(name))
+        with open(pkg, 'rb') as fp:
+            fp.seek(reader.pkg_start + dpos)
+            block = fp.read(dlen)
+        out = decoder.harness_lz4(block, dlen, ulen)
+        # Also empty entries are no allocation failure.
+        assert out is not None
+        assert ctypes.string_at(out, ulen) == content
+        # Damaged data is detected.
+        assert not decoder.harness_lz4(block, dlen, ulen + 1)
+
+
+# The bootloader finds all entries of a name, with and without the index.
+@pytest.mark.parametrize('use_index', [0, 1])
+def test_bootloader_find_by_name(tmpdir, use_index):
+    harness = _build_harness(tmpdir, """
+        int harness_count(const char *path,
+                          const char *name,
+                          const char *entry,
+                          int use_index)
+        {
+            ARCHIVE_STATUS *status;
+            TOC *ptoc;
+            int count = 0;
+            status = calloc(1, sizeof(ARCHIVE_STATUS));
+            if (pyi_arch_setup(status, path, name))
+                return -1;
+            if (status->tocindex == NULL)
+                return -2;
+            if (!use_index)
+                status->tocindex = NULL;
+            for (ptoc = pyi_arch_find_by_name(status, entry);
+                 ptoc != NULL;
+                 ptoc = pyi_arch_find_next_by_name(status, ptoc))
+                count++;
+            return count;
+        }
+        """)
+    data_file = tmpdir.join('data.bin')
+    data_file.write_binary(b'data')
+    toc = [(name, str(data_file), 0, 'x')
+           for name in ['dup', 'b', 'dup', 'a', 'c', 'dup', 'd']]
+    CArchiveWriter(str(tmpdir.join('out.pkg')), toc, pylib_name='libpython')
+    path = (str(tmpdir) + os.sep).encode('utf-8')
+    for entry, count in [(b'dup', 3), (b'a', 1), (b'd', 1), (b'e', 0)]:
+        assert harness.harness_count(path, b'out.pkg', entry,
+                                     use_index) == count
+
+
+def _open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+
+# Threads extracting the files of an archive write them all or fail without
+# leaking files.
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                    reason='Counts the open files in /proc')
+@pytest.mark.parametrize('corrupt', [False, True])
+def test_bootloader_extract_workers(tmpdir, corrupt):
+    harness = _build_harness(tmpdir, """
+        int harness_extract(const char *path,
+                            const char *name,
+                            const char *destdir)
+        {
+            ARCHIVE_STATUS *status;
+            int rc;
+            status = calloc(1, sizeof(ARCHIVE_STATUS));
+            if (pyi_arch_setup(status, path, name))
+                return -2;
+            strcpy(status->temppath, destdir);
+            status->has_temp_directory = true;
+            rc = pyi_launch_extract_binaries(status);
+            pyi_arch_status_free_memory(status);
+            return rc;
+        }
+        """, source='pyi_launch.c')
+    rand = random.Random(0)
+    contents = {}
+    toc = [('pyi-extract-workers 4', '', 0, 'o')]
+    for i in range(40):
+        name = os.path.join('sub%d' % (i % 3), 'file%02d.bin' % i)
+        if i % 2:
+            content = b'%d\n' % i * rand.randint(1, 50000)
+        else:
+            content = bytes(bytearray(rand.randint(0, 255)
+                                      for j in range(rand.randint(1, 5000))))
+        src = tmpdir.join('file%02d.bin' % i)
+        src.write_binary(content)
+        contents[name] = content
+        toc.append((name, str(src), i % 2, 'b' if i % 4 else 'x'))
+    pkg = tmpdir.join('out.pkg')
+    CArchiveWriter(str(pkg), toc, pylib_name='libpython')
+    if corrupt:
+        # Damage the zlib header of an entry in the middle.
+        reader = CArchiveReader(str(pkg))
+        ndx = reader.toc.find(os.path.join('sub0', 'file21.bin'))
+        dpos = reader.toc.get(ndx)[0]
+        with open(str(pkg), 'r+b') as fp:
+            fp.seek(reader.pkg_start + dpos)
+            fp.write(b'\0\0')
+
+    destdir = tmpdir.mkdir('dest')
+    fds = _open_fds()
+    result = []
+    # Fail instead of hanging if the threads never finish.
+    thread = threading.Thread(target=lambda: result.append(
+        harness.harness_extract((str(tmpdir) + os.sep).encode('utf-8'),
+                                b'out.pkg', str(destdir).encode('utf-8'))))
+    thread.start()
+    thread.join(60)
+    assert not thread.is_alive()
+    assert _open_fds() == fds
+    if corrupt:
+        assert result == [-1]
+        return
+    assert result == [0]
+    extracted = {}
+    for dirpath, dirnames, filenames in os.walk(str(destdir)):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as fp:
+                extracted[os.path.relpath(path, str(destdir))] = fp.read()
+    assert extracted == contents
+
+
+def _archive_digest(tmpdir, content):
+    data_file = tmpdir.join('data.bin')
+    data_file.write_binary(content)
+    toc = [('pyi-extraction-cache', '', 0, 'o'),
+           ('data.bin', str(data_file), 1, 'x')]
+    pkg = str(tmpdir.join('out.pkg'))
+    CArchiveWriter(pkg, toc, pylib_name='libpython')
+    options = [entry[-1] for entry in CArchiveReader(pkg).toc.data
+               if entry[-2] == 'o' and entry[-1].startswith('pyi-archive-digest')]
+    assert len(options) == 1
+    return options[0]
+
+
+def test_extraction_cache_digest(tmpdir):
+    digest = _archive_digest(tmpdir, b'some data')
+    assert _archive_digest(tmpdir, b'some data') == digest
+    assert _archive_digest(tmpdir, b'other data') != digest
+
+
+def test_lazy_data(tmpdir):
+    data_file = tmpdir.join('data.bin')
+    data_file.write_binary(b'some data\n' * 1000)
+    toc = [('pyi-lazy-data', '', 0, 'o'),
+           ('stored.bin', str(data_file), COMPRESSION_STORED, 'x'),
+           ('sub/zlib.bin', str(data_file), COMPRESSION_ZLIB, 'x'),
+           ('lib.so', str(data_file), COMPRESSION_ZLIB, 'b')]
+    pkg = tmpdir.join('out.pkg')
+    CArchiveWriter(str(pkg), toc, pylib_name='libpython')
+    # Like a bootloader in front and a digital signature after the archive.
+    exe = tmpdir.join('app')
+    exe.write_binary(b'bootloader' + pkg.read_binary() + b'signature')
+
+    meipass = tmpdir.mkdir('meipass')
+    reader = CArchiveDataReader(str(exe), str(meipass))
+    assert reader.lazy
+    assert sorted(reader.contents()) == \
+        sorted(['stored.bin', os.path.join('sub', 'zlib.bin')])
+    assert reader.read('stored.bin') == data_file.read_binary()
+    path = reader.extract('sub/zlib.bin')
+    assert path == str(meipass.join('sub', 'zlib.bin'))
+    assert meipass.join('sub', 'zlib.bin').read_binary() == data_file.read_binary()
+    assert reader.extract('sub/zlib.bin') == path
+
+
+@pytest.mark.parametrize('with_index', [True, False])
+def test_ctoc_index(tmpdir, monkeypatch, with_index):
+    if not with_index:
+        # Like archives created before the name index was added.
+        monkeypatch.setattr(CTOC, 'index_tobinary', lambda self: b'')
+    data_file = tmpdir.join('data.bin')
+    data_file.write_binary(b'some data')
+    toc = [('file%03d' % i, str(data_file), 0, 'x') for i in (5, 1, 3, 2, 4)]
+    toc += [('dup', str(data_file), 0, 'b'), ('dup', str(data_file), 0, 'x')]
+    pkg = str(tmpdir.join('out.pkg'))
+    CArchiveWriter(pkg, toc, pylib_name='libpython')
+    reader = CArchiveReader(pkg)
+    assert (reader.toc._index is not None) == with_index
+    assert reader.toc.find('file003') == 2
+    assert reader.toc.get(reader.toc.find('dup'))[4] == 'b'
+    assert reader.toc.find('file006') == -1
+    assert reader.extract('file004') == (False, b'some data')
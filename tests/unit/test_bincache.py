@@ -0,0 +1,100 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the index of processed binaries in the cache.
+
+import glob
+import hashlib
+import os
+import sys
+from distutils.spawn import find_executable
+
+import pytest
+
+from PyInstaller.building import bincache
+from PyInstaller.compat import is_linux
+
+
+def _store(cache, name, data):
+    digest = hashlib.md5(data).hexdigest()
+    cache.store(name, digest, lambda fp: fp.write(data))
+    return digest
+
+
+def test_digest(tmpdir):
+    data = os.urandom(100000)
+    binary = tmpdir.join('binary.so')
+    binary.write_binary(data)
+    assert bincache.digest(str(binary), blocksize=4096) == \
+        hashlib.md5(data).hexdigest()
+
+
+def test_lookup(tmpdir):
+    cache = bincache.BinaryCache(str(tmpdir.join('bincache00')))
+    assert not cache.lookup('libfoo.so', 'digest')
+    digest = _store(cache, os.path.join('sub', 'libfoo.so'), b'foo')
+    cache.close()
+
+    cache = bincache.BinaryCache(str(tmpdir.join('bincache00')))
+    assert cache.lookup(os.path.join('sub', 'libfoo.so'), digest)
+    assert not cache.lookup(os.path.join('sub', 'libfoo.so'), 'other digest')
+    # The copy was removed behind the back of the index.
+    os.remove(cache.path(os.path.join('sub', 'libfoo.so')))
+    assert not cache.lookup(os.path.join('sub', 'libfoo.so'), digest)
+    cache.close()
+
+
+def test_prune(tmpdir):
+    cachedir = str(tmpdir)
+    first = bincache.open_cache(os.path.join(cachedir, 'bincache10'))
+    second = bincache.open_cache(os.path.join(cachedir, 'bincache01'))
+    digests = {}
+    for cache, name in [(first, 'a.so'), (second, 'b.so'), (first, 'c.so')]:
+        digests[name] = _store(cache, name, b'x' * 1000)
+    # 'a.so' is now used more recently than 'b.so'.
+    assert first.lookup('a.so', digests['a.so'])
+    tmpdir.join('bincache10', 'index.dat').write('{}')
+    first.write('d.exe.manifest', lambda fp: fp.write(b'<assembly/>'))
+
+    try:
+        assert bincache.prune(cachedir, 2500) == (1, 1000)
+        assert not os.path.exists(second.path('b.so'))
+        assert first.lookup('a.so', digests['a.so'])
+        assert first.lookup('c.so', digests['c.so'])
+        # Files missing in the index are removed, too.
+        assert not tmpdir.join('bincache10', 'index.dat').exists()
+        # Except for the manifests.
+        assert os.path.exists(first.path('d.exe.manifest'))
+
+        assert bincache.prune(cachedir, 0) == (2, 2000)
+        assert not first.entries() and not second.entries()
+    finally:
+        bincache.close_caches()
+
+
+@pytest.mark.skipif(not is_linux or not find_executable('strip'),
+                    reason='Needs strip and lib-dynload of Linux Pythons')
+def test_populate_cache(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    from PyInstaller.building.utils import checkCache, populateCache
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir))
+    binaries = [(pth, os.path.basename(pth)) for pth in sorted(glob.glob(
+        os.path.join(os.path.dirname(os.__file__), 'lib-dynload', '*.so')))]
+    # Another binary of the same name is left to checkCache().
+    binaries.append((sys.executable, binaries[0][1]))
+    try:
+        populateCache(binaries, strip=True, jobs=4)
+        first = binaries[0]
+        cache = bincache.open_cache(os.path.dirname(
+            checkCache(first[0], strip=True, dist_nm=first[1])))
+        assert len(cache.entries()) == len(binaries) - 1
+        for fnm, dist_nm in binaries[:-1]:
+            assert cache.lookup(dist_nm, bincache.digest(fnm))
+    finally:
+        bincache.close_caches()
@@ -0,0 +1,79 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the binary dependency closure.
+
+import glob
+import os
+import sys
+
+import pytest
+
+from PyInstaller.compat import is_linux
+from PyInstaller.depend import bindepend
+from PyInstaller.depend.depcache import BinaryDependencyCache
+
+
+def _binaries():
+    binaries = [('', os.path.realpath(sys.executable), 'BINARY')]
+    for pth in sorted(glob.glob(os.path.join(os.path.dirname(os.__file__),
+                                             'lib-dynload', '*.so')))[:20]:
+        binaries.append((os.path.basename(pth), pth, 'EXTENSION'))
+    return binaries
+
+
+@pytest.mark.skipif(not is_linux, reason='Uses lib-dynload of Linux Pythons')
+def test_dependencies_jobs():
+    expected = bindepend.Dependencies(_binaries(), jobs=1)
+    assert bindepend.Dependencies(_binaries(), jobs=4) == expected
+
+
+@pytest.mark.skipif(not is_linux, reason='Uses lib-dynload of Linux Pythons')
+def test_dependencies_seen():
+    seen = set()
+    binaries = bindepend.Dependencies(_binaries(), seen=seen, jobs=1)
+    assert len(binaries) > len(_binaries())
+    # The second pass over the same TOC finds nothing new.
+    assert bindepend.Dependencies(binaries, seen=seen, jobs=1) == binaries
+
+
+def test_dependency_cache(tmpdir, monkeypatch):
+    binary = tmpdir.join('binary.so')
+    binary.write('binary')
+    lib = tmpdir.join('libfoo.so')
+    lib.write('lib')
+    cache_file = str(tmpdir.join('cache', 'depcache.dat'))
+
+    cache = BinaryDependencyCache(cache_file, 'elf')
+    assert cache.get(str(binary)) is None
+    cache.put(str(binary), [str(lib), 'libnotfound.so'])
+    cache.save()
+
+    cache = BinaryDependencyCache(cache_file, 'elf')
+    assert cache.get(str(binary)) == [str(lib), 'libnotfound.so']
+    # Written for another backend.
+    assert BinaryDependencyCache(cache_file, 'ldd').get(str(binary)) is None
+    # Another library search path.
+    monkeypatch.setenv('LD_LIBRARY_PATH', str(tmpdir))
+    assert BinaryDependencyCache(cache_file, 'elf').get(str(binary)) is None
+    monkeypatch.undo()
+    # A dependency changed.
+    lib.write('modified lib')
+    assert cache.get(str(binary)) is None
+
+
+@pytest.mark.skipif(not is_linux, reason='Uses lib-dynload of Linux Pythons')
+def test_dependencies_cache(tmpdir):
+    expected = bindepend.Dependencies(_binaries(), jobs=1)
+    cache = BinaryDependencyCache(str(tmpdir.join('depcache.dat')),
+                                  bindepend.getImportsBackend())
+    assert bindepend.Dependencies(_binaries(), jobs=2, cache=cache) == expected
+    assert cache.misses and not cache.hits
+    assert bindepend.Dependencies(_binaries(), jobs=1, cache=cache) == expected
+    assert cache.hits
@@ -0,0 +1,62 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the persistent module code cache of PyiModuleGraph.
+
+import os
+
+from PyInstaller.depend.codecache import ModuleCodeCache
+
+
+IMPORTS = ((False, 'os', None, 0, (False, False, False, False)),
+           (True, 'sys', ('path',), 0, None))
+
+
+def _make_source(tmpdir):
+    source = tmpdir.join('mymod.py')
+    source.write('import os\n')
+    return str(source)
+
+
+def test_roundtrip(tmpdir):
+    source = _make_source(tmpdir)
+    cache_file = str(tmpdir.join('cache', 'modcache.dat'))
+    code = compile('import os\n', source, 'exec')
+
+    cache = ModuleCodeCache(cache_file)
+    assert cache.get(source) is None
+    cache.put(source, code, set(['os']), IMPORTS)
+    cache.save()
+
+    cache = ModuleCodeCache(cache_file)
+    co, globalnames, imports = cache.get(source)
+    assert co == code
+    assert globalnames == ('os',)
+    assert imports == IMPORTS
+    assert cache.hits == 1
+
+
+def test_modified_source(tmpdir):
+    source = _make_source(tmpdir)
+    cache_file = str(tmpdir.join('modcache.dat'))
+    cache = ModuleCodeCache(cache_file)
+    cache.put(source, compile('', source, 'exec'), (), ())
+    cache.save()
+
+    with open(source, 'a') as f:
+        f.write('import sys\n')
+    assert ModuleCodeCache(cache_file).get(source) is None
+
+
+def test_corrupted_cache(tmpdir):
+    source = _make_source(tmpdir)
+    cache_file = tmpdir.join('modcache.dat')
+    cache_file.write_binary(b'garbage')
+    cache = ModuleCodeCache(str(cache_file))
+    assert cache.get(source) is None
@@ -0,0 +1,78 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the incremental update of the output directory.
+
+import os
+
+import pytest
+
+from PyInstaller.building.distsync import DistSync
+
+
+def _sync(distdir, manifest, files):
+    sync = DistSync(str(distdir), str(manifest))
+    for inm, src in files:
+        sync.copy(str(src), inm)
+    sync.commit()
+    return sync
+
+
+def test_sync(tmpdir):
+    src = tmpdir.mkdir('src')
+    one = src.join('one.txt')
+    one.write('one')
+    two = src.join('two.txt')
+    two.write('two')
+    distdir = tmpdir.join('dist')
+    manifest = tmpdir.join('manifest.dat')
+
+    sync = _sync(distdir, manifest, [('one.txt', one), ('two.txt', two)])
+    assert (sync.copied, sync.linked) == (2, 0)
+    inode = distdir.join('one.txt').stat().ino
+
+    two.write('changed')
+    two.setmtime(two.mtime() + 10)
+    sync = _sync(distdir, manifest, [('one.txt', one), ('two.txt', two)])
+    assert (sync.copied, sync.linked) == (1, 1)
+    assert distdir.join('one.txt').stat().ino == inode
+    assert distdir.join('two.txt').read() == 'changed'
+
+    # Stale files are removed.
+    sync = _sync(distdir, manifest, [('one.txt', one)])
+    assert (sync.copied, sync.linked) == (0, 1)
+    assert distdir.listdir() == [distdir.join('one.txt')]
+    assert not tmpdir.join('dist.pyi-staging').check()
+    assert not tmpdir.join('dist.pyi-old').check()
+
+
+def test_abort(tmpdir):
+    src = tmpdir.join('one.txt')
+    src.write('one')
+    distdir = tmpdir.join('dist')
+    manifest = tmpdir.join('manifest.dat')
+    _sync(distdir, manifest, [('one.txt', src)])
+    sync = DistSync(str(distdir), str(manifest))
+    sync.copy(str(src), 'other.txt')
+    sync.abort()
+    assert distdir.listdir() == [distdir.join('one.txt')]
+    assert not tmpdir.join('dist.pyi-staging').check()
+
+
+def test_unknown_files(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    monkeypatch.setitem(CONF, 'noconfirm', False)
+    monkeypatch.setattr('sys.stdout.isatty', lambda: False, raising=False)
+    distdir = tmpdir.mkdir('dist')
+    distdir.join('precious.txt').write('keep me')
+    with pytest.raises(SystemExit):
+        DistSync(str(distdir), str(tmpdir.join('manifest.dat')))
+    monkeypatch.setitem(CONF, 'noconfirm', True)
+    _sync(distdir, tmpdir.join('manifest.dat'), [])
+    assert distdir.listdir() == []
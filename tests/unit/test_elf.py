@@ -0,0 +1,103 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the in-process reader of ELF dependencies.
+
+import glob
+import os
+import struct
+import sys
+
+import pytest
+
+from PyInstaller.compat import is_linux
+from PyInstaller.depend import bindepend, elf
+
+
+def _strings(*names):
+    table = b'\0'.join(name.encode('ascii') for name in names) + b'\0'
+    offsets = []
+    pos = 0
+    for name in names:
+        offsets.append(pos)
+        pos += len(name) + 1
+    return table, offsets
+
+
+def _new_cache(entries, hwcap=0):
+    header_len = 48 + len(entries) * 24
+    table, offsets = _strings(*[s for entry in entries for s in entry])
+    data = struct.pack('=20sII', b'glibc-ld.so.cache1.1', len(entries),
+                       len(table)) + b'\0' * 20
+    for i in range(len(entries)):
+        data += struct.pack('=iIIIQ', 0x303, header_len + offsets[2 * i],
+                            header_len + offsets[2 * i + 1], 0, hwcap)
+    return data + table
+
+
+def _old_cache(entries):
+    table, offsets = _strings(*[s for entry in entries for s in entry])
+    data = struct.pack('=12sI', b'ld.so-1.7.0', len(entries))
+    for i in range(len(entries)):
+        data += struct.pack('=iII', 0x303, offsets[2 * i], offsets[2 * i + 1])
+    return data + table
+
+
+ENTRIES = [('libz.so.1', '/lib/libz.so.1'), ('libm.so.6', '/lib/libm.so.6')]
+
+
+@pytest.mark.parametrize('fmt', ['old', 'new', 'combined'])
+def test_ld_so_cache(tmpdir, fmt):
+    if fmt == 'old':
+        data = _old_cache(ENTRIES)
+    elif fmt == 'new':
+        data = _new_cache(ENTRIES)
+    else:
+        # Old format without strings, the new format aligned after it.
+        data = struct.pack('=12sI', b'ld.so-1.7.0', 0)
+        data += _new_cache(ENTRIES)
+    cache = tmpdir.join('ld.so.cache')
+    cache.write_binary(data)
+    assert elf.read_ld_so_cache(str(cache)) == ENTRIES
+
+
+def test_ld_so_cache_skips_hwcaps(tmpdir):
+    cache = tmpdir.join('ld.so.cache')
+    cache.write_binary(_new_cache(ENTRIES, hwcap=1 << 62))
+    assert elf.read_ld_so_cache(str(cache)) == []
+
+
+# The cache is read again when it changed, e.g. between two builds.
+def test_ld_so_cache_changed(tmpdir, monkeypatch):
+    monkeypatch.setattr(elf, '_ld_so_cache', (None, None))
+    cache = tmpdir.join('ld.so.cache')
+    cache.write_binary(_new_cache(ENTRIES[:1]))
+    assert elf.get_ld_so_cache(str(cache)) == {'libz.so.1': ['/lib/libz.so.1']}
+    cache.write_binary(_new_cache(ENTRIES))
+    assert elf.get_ld_so_cache(str(cache)) == \
+        {'libz.so.1': ['/lib/libz.so.1'], 'libm.so.6': ['/lib/libm.so.6']}
+
+
+def test_not_elf(tmpdir):
+    text = tmpdir.join('text.so')
+    text.write('not an ELF file')
+    with pytest.raises(elf.ELFError):
+        elf.get_imports(str(text))
+
+
+@pytest.mark.skipif(not is_linux, reason='ELF and ldd are Linux only')
+def test_get_imports_like_ldd():
+    binaries = [os.path.realpath(sys.executable)]
+    binaries += glob.glob(os.path.join(os.path.dirname(os.__file__),
+                                       'lib-dynload', '*.so'))[:10]
+    for pth in binaries:
+        expected = set(os.path.realpath(lib)
+                       for lib in bindepend._getImports_ldd(pth))
+        assert set(os.path.realpath(lib)
+                   for lib in elf.get_imports(pth)) == expected
@@ -0,0 +1,98 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the .toc files storing the guts of Targets.
+
+import os
+
+import pytest
+
+from PyInstaller.building.datastruct import TOC, Target, _load_guts, _save_guts
+from PyInstaller.building.utils import _check_guts_toc
+from PyInstaller.depend.bindepend import BindingRedirect
+from PyInstaller.utils.misc import save_py_data_struct
+
+
+NAMES = ['name', 'toc', 'cdict', 'redirects', 'flag']
+
+GUTS = (
+    'out00-PKG.pkg',
+    TOC([('libz.so.1', '/lib/libz.so.1', 'BINARY'),
+         ('os', '/usr/lib/python/os.py', 'PYMODULE')]),
+    {'BINARY': 1, 'PYZ': 0},
+    [BindingRedirect('name', 'language', 'arch', '1.0', '2.0', 'token')],
+    False,
+)
+
+
+@pytest.mark.parametrize('save', [_save_guts, save_py_data_struct])
+def test_roundtrip(tmpdir, save):
+    filename = str(tmpdir.join('out00-PKG.toc'))
+    save(filename, GUTS)
+    data = _load_guts(filename, NAMES)
+    assert len(data) == len(NAMES)
+    for name, value in zip(NAMES, GUTS):
+        assert data[name] == value
+    # TOCs are read back as lists.
+    assert type(data['toc']) is list
+    assert data['redirects'][0].newVersion == '2.0'
+
+
+def test_truncated(tmpdir):
+    filename = str(tmpdir.join('out00-PKG.toc'))
+    _save_guts(filename, GUTS)
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    with open(filename, 'wb') as fp:
+        fp.write(data[:-1])
+    with pytest.raises(Exception):
+        _load_guts(filename, NAMES)
+
+
+class _Target(Target):
+    _GUTS = (('toc', _check_guts_toc),)
+
+    def __init__(self, toc):
+        Target.__init__(self)
+        # Every instance checks the same .toc file.
+        self.tocfilename = self.tocfilename[:-len('00-_Target.toc')] + '.toc'
+        self.toc = toc
+        self.built = False
+        self.__postinit__()
+
+    def assemble(self):
+        self.built = True
+
+
+@pytest.mark.parametrize('rebuild_check', ['mtime', 'content'])
+def test_rebuild_check(tmpdir, monkeypatch, rebuild_check):
+    from PyInstaller.config import CONF
+    monkeypatch.setitem(CONF, 'workpath', str(tmpdir.join('build')))
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir.join('cache')))
+    monkeypatch.setitem(CONF, 'rebuild_check', rebuild_check)
+    source = tmpdir.join('data.txt')
+    source.write('data')
+    toc = TOC([('data.txt', str(source), 'DATA')])
+
+    assert _Target(toc).built
+    assert not _Target(toc).built
+
+    def touch(content=None):
+        # Modify the file after the last build, which happened earlier.
+        past = source.mtime() - 100
+        if content is not None:
+            source.write(content)
+        source.setmtime(past + 50)
+        os.utime(str(tmpdir.join('build', 'out.toc')), (past, past))
+
+    # Touched, e.g. by a fresh checkout.
+    touch()
+    assert _Target(toc).built == (rebuild_check == 'mtime')
+    touch('new data')
+    assert _Target(toc).built
@@ -223,3 +223,57 @@ def test_collect_data_all_included(data_lists):
 def test_get_module_file_attribute_non_exist_module():
     with pytest.raises(ImportError):
         get_module_file_attribute('pyinst_nonexisting_module_name')
+
+
+# Statements run in a long-lived worker, which must not leak state between
+# them and must be replaced when a statement kills it.
+def test_exec_statement_worker():
+    from PyInstaller.utils.hooks import exec_statement
+    assert exec_statement("""
+        import sys
+        sys.path.append('pyinst-test-path')
+        print('pyinst-test-path' in sys.path)
+        """) == 'True'
+    assert exec_statement("""
+        import sys
+        print('pyinst-test-path' in sys.path)
+        """) == 'False'
+    assert exec_statement("import os, sys; print('x'); sys.stdout.flush(); "
+                          "os._exit(0)") == 'x'
+    assert exec_statement("print(1 + 1)") == '2'
+    assert exec_statement("print(1 + 1)", isolated=True) == '2'
+
+
+# Modules imported by a statement stay in the worker, but not in isolated ones.
+def test_exec_statement_isolated():
+    from PyInstaller.utils.hooks import exec_statement
+    exec_statement("import sys; sys.modules['pyi_test_leak'] = sys")
+    assert exec_statement(
+        "import sys; print('pyi_test_leak' in sys.modules)") == 'True'
+    assert exec_statement(
+        "import sys; print('pyi_test_leak' in sys.modules)",
+        isolated=True) == 'False'
+
+
+# Results of the utilities are kept across builds until the package changes.
+def test_collect_submodules_memo(tmpdir, monkeypatch):
+    import shutil
+    from PyInstaller.config import CONF
+    from PyInstaller.utils.hooks import memo
+    pkgdir = tmpdir.join('path', 'pyi_memo_pkg')
+    shutil.copytree(join(os.path.dirname(os.path.abspath(__file__)), TEST_MOD),
+                    str(pkgdir))
+    monkeypatch.syspath_prepend(str(tmpdir.join('path')))
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir.join('cache')))
+    monkeypatch.setattr(memo, '_stats', {'hits': 0, 'misses': 0})
+
+    mods = sorted(collect_submodules('pyi_memo_pkg'))
+    memo.save()
+    assert sorted(collect_submodules('pyi_memo_pkg')) == mods
+    assert memo._stats == {'hits': 1, 'misses': 0}
+
+    pkgdir.join('subpkg', 'fourteen.py').write('')
+    os.utime(str(pkgdir.join('subpkg')), (0, 0))
+    assert sorted(collect_submodules('pyi_memo_pkg')) == \
+        sorted(mods + ['pyi_memo_pkg.subpkg.fourteen'])
+    memo.save()
@@ -0,0 +1,47 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the scheduling of post-graph hooks.
+
+from PyInstaller import HOMEPATH
+from PyInstaller.building.imphook import AdditionalFilesCache, HooksCache, \
+    apply_post_graph_hooks
+from PyInstaller.depend.analysis import PyiModuleGraph
+from PyInstaller.depend.codecache import ModuleCodeCache
+
+
+def test_post_graph_hooks(tmpdir):
+    # Hook of 'mod_a' imports 'mod_b', whose hook is applied afterwards.
+    tmpdir.join('mod_a.py').write('\n')
+    tmpdir.join('mod_b.py').write('\n')
+    tmpdir.join('mod_c.py').write('\n')
+    hooks = tmpdir.mkdir('hooks')
+    log = tmpdir.join('log.txt')
+    hook = ('hiddenimports = %r\n'
+            'with open(%r, "a") as f:\n'
+            '    f.write(__name__ + "\\n")\n')
+    hooks.join('hook-mod_a.py').write(hook % (['mod_b'], str(log)))
+    hooks.join('hook-mod_b.py').write(hook % ([], str(log)))
+    # Never applied, 'mod_c' is not imported.
+    hooks.join('hook-mod_c.py').write(hook % ([], str(log)))
+
+    code_cache = ModuleCodeCache(str(tmpdir.join('modcache.dat')))
+    graph = PyiModuleGraph(HOMEPATH, code_cache=code_cache,
+                           path=[str(tmpdir)])
+    graph.import_hook('mod_a')
+    hooks_cache = HooksCache(str(hooks))
+    apply_post_graph_hooks(graph, hooks_cache, AdditionalFilesCache())
+
+    assert graph.findNode('mod_b') is not None
+    applied = log.read().splitlines()
+    assert len(applied) == 2
+    assert 'mod_a' in applied[0] and 'mod_b' in applied[1]
+    assert list(hooks_cache) == ['mod_c']
+    # The compiled hooks are cached.
+    assert str(hooks.join('hook-mod_a.py')) in code_cache
@@ -0,0 +1,58 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the copying of files into the output directories.
+
+import errno
+import os
+
+import pytest
+
+from PyInstaller.building import materialize
+
+
+def _failing(src_fd, dst_fd, size, offset):
+    os.write(dst_fd, b'garbage')
+    raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+
+@pytest.mark.parametrize('methods', ['native', 'failing', 'python'])
+def test_copy(tmpdir, monkeypatch, methods):
+    if methods == 'failing':
+        monkeypatch.setattr(materialize, '_METHODS', [('failing', _failing)])
+    elif methods == 'python':
+        monkeypatch.setattr(materialize, '_METHODS', [])
+    data = os.urandom(300000)
+    src = tmpdir.join('src.bin')
+    src.write_binary(data)
+    src.chmod(0o700)
+    dst = tmpdir.join('dst.bin')
+    method = materialize.copy(str(src), str(dst))
+    assert dst.read_binary() == data
+    assert dst.stat().mode == src.stat().mode
+    if methods != 'native':
+        assert method == 'copy'
+
+    with open(str(dst), 'wb') as fp:
+        fp.write(b'header')
+        materialize.append_file(str(src), fp)
+        materialize.append_file(str(src), fp)
+        fp.write(b'trailer')
+    assert dst.read_binary() == b'header' + data + data + b'trailer'
+
+
+def test_copy_link(tmpdir):
+    src = tmpdir.join('src.bin')
+    src.write_binary(b'binary')
+    dst = tmpdir.join('dst.bin')
+    dst.write_binary(b'old')
+    assert materialize.copy(str(src), str(dst), link=True) == 'hardlink'
+    assert dst.stat().ino == src.stat().ino
+    materialize.copy(str(src), str(tmpdir.join('copy.bin')))
+    assert tmpdir.join('copy.bin').stat().ino != src.stat().ino
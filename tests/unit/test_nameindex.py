@@ -0,0 +1,44 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the index of module names by package prefixes.
+
+from PyInstaller.depend.nameindex import ModuleNameIndex
+
+
+NAMES = ['io', 'iota', 'encodings', 'encodings.utf_8', 'encodings.idna',
+         'xml.dom.minidom', 'xml.etree']
+
+
+def test_subtree():
+    index = ModuleNameIndex(NAMES)
+    assert len(index) == len(NAMES)
+    assert sorted(index.subtree('encodings')) == \
+        ['encodings', 'encodings.idna', 'encodings.utf_8']
+    # Prefixes only match whole components.
+    assert index.subtree('io') == ['io']
+    # Packages not in the index themselves.
+    assert 'xml' not in index
+    assert sorted(index.subtree('xml')) == ['xml.dom.minidom', 'xml.etree']
+    assert index.subtree('missing') == []
+    assert index.subtree('io.missing') == []
+
+
+def test_remove():
+    index = ModuleNameIndex(NAMES)
+    index.remove('encodings')
+    index.remove('xml.dom.minidom')
+    index.remove('missing')
+    assert len(index) == len(NAMES) - 2
+    assert 'encodings' not in index
+    assert sorted(index.subtree('encodings')) == \
+        ['encodings.idna', 'encodings.utf_8']
+    assert index.subtree('xml') == ['xml.etree']
+    index.add('encodings')
+    assert 'encodings' in index
@@ -0,0 +1,41 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2005-2015, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+# This contains tests for the index of the module search path.
+
+import zipfile
+
+from PyInstaller.depend.pathindex import SearchPathIndex
+
+
+def test_directory(tmpdir):
+    tmpdir.join('mod.py').write('\n')
+    tmpdir.mkdir('pkg').join('__init__.py').write('\n')
+    tmpdir.mkdir('nspkg')
+    index = SearchPathIndex()
+    path = str(tmpdir)
+    for name in ('mod', 'pkg', 'nspkg'):
+        assert index.may_contain(path, name)
+    assert not index.may_contain(path, 'missing')
+    assert not index.may_contain(path, 'py')
+    assert index.filter([path, str(tmpdir.join('missing'))], 'mod') == [path]
+
+
+def test_zip_archive(tmpdir):
+    archive = str(tmpdir.join('lib.egg'))
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('zmod.pyc', b'')
+        zf.writestr('zpkg/__init__.py', b'')
+        zf.writestr('zpkg/sub.py', b'')
+    index = SearchPathIndex()
+    assert index.filter([archive, str(tmpdir)], 'zmod') == [archive]
+    assert index.may_contain(archive, 'zpkg')
+    assert not index.may_contain(archive, 'sub')
+    assert index.may_contain(archive + '/zpkg', 'sub')
+    assert not index.may_contain(archive + '/zpkg', 'zmod')